@@ -22,6 +22,7 @@ from pytype import abstract_utils
 from pytype import compat
 from pytype import datatypes
 from pytype import function
+from pytype import metrics
 from pytype import mixin
 from pytype import utils
 from pytype.pyc import opcodes
@@ -36,6 +37,10 @@ import six
 
 log = logging.getLogger(__name__)
 
+# How often InterpreterFunction.call reuses the result of an identical call.
+_call_cache_hits = metrics.Counter("call_cache_hits")
+_call_cache_misses = metrics.Counter("call_cache_misses")
+
 
 class AtomicAbstractValue(utils.VirtualMachineWeakrefMixin):
   """A single abstract value such as a type or function signature.
@@ -53,6 +58,9 @@ class AtomicAbstractValue(utils.VirtualMachineWeakrefMixin):
 
   formal = False  # is this type non-instantiable?
 
+  # (children maps, their changestamps, digest) from the last get_fullhash
+  _cached_fullhash = None
+
   def __init__(self, name, vm):
     """Basic initializer for all AtomicAbstractValues."""
     super(AtomicAbstractValue, self).__init__(vm)
@@ -102,8 +110,18 @@ class AtomicAbstractValue(utils.VirtualMachineWeakrefMixin):
 
   def get_fullhash(self):
     """Hash this value and all of its children."""
+    # The hash depends only on which values are reachable and on the
+    # changestamps of their children maps. If none of the maps that the last
+    # computation visited have changed, then neither have the reachable values.
+    if self._cached_fullhash:
+      maps, changestamps, digest = self._cached_fullhash
+      if all(mapping.changestamp == changestamp
+             for mapping, changestamp in zip(maps, changestamps)):
+        return digest
     m = hashlib.md5()
     seen_data = set()
+    maps = []
+    changestamps = []
     stack = [self]
     while stack:
       data = stack.pop()
@@ -113,9 +131,14 @@ class AtomicAbstractValue(utils.VirtualMachineWeakrefMixin):
       seen_data.add(data_hash)
       m.update(compat.bytestring(data_hash))
       for mapping in data.get_children_maps():
-        m.update(compat.bytestring(mapping.changestamp))
+        changestamp = mapping.changestamp
+        maps.append(mapping)
+        changestamps.append(changestamp)
+        m.update(compat.bytestring(changestamp))
         stack.extend(mapping.data)
-    return m.digest()
+    digest = m.digest()
+    self._cached_fullhash = (maps, changestamps, digest)
+    return digest
 
   def get_children_maps(self):
     """Get this value's dictionaries of children.
@@ -2928,6 +2951,9 @@ class InterpreterFunction(SignedFunction):
     self.closure = closure
     self._call_cache = {}
     self._call_records = []
+    # The names in self.code, as sets for computing call keys.
+    self._co_names = frozenset(code.co_names)
+    self._co_varnames = frozenset(code.co_varnames)
     # TODO(b/78034005): Combine this and PyTDFunction.signatures into a single
     # way to handle multiple signatures that SignedFunction can also use.
     self._overloads = overloads
@@ -3135,9 +3161,9 @@ class InterpreterFunction(SignedFunction):
     if self.vm.options.skip_repeat_calls:
       callkey = abstract_utils.hash_all_dicts(
           (callargs, None),
-          (frame.f_globals.members, set(self.code.co_names)),
+          (frame.f_globals.members, self._co_names),
           (frame.f_locals.members,
-           set(frame.f_locals.members) - set(self.code.co_varnames)))
+           set(frame.f_locals.members) - self._co_varnames))
     else:
       # Make the callkey the number of times this function has been called so
       # that no call has the same key as a previous one.
@@ -3157,11 +3183,14 @@ class InterpreterFunction(SignedFunction):
                  "remaining_depth = %d, old_remaining_depth = %d",
                  self.name, self.vm.remaining_depth(), old_remaining_depth)
       else:
+        _call_cache_hits.inc()
         ret = old_ret.AssignToNewVariable(node)
         if self._store_call_records:
           # Even if the call is cached, we might not have been recording it.
           self._call_records.append((sig, callargs, ret, node))
         return node, ret
+    if self.vm.options.skip_repeat_calls:
+      _call_cache_misses.inc()
     if self.code.has_generator():
       generator = Generator(frame, self.vm)
       # Run the generator right now, even though the program didn't call it,
@@ -3182,7 +3211,16 @@ class InterpreterFunction(SignedFunction):
       node2, _ = async_generator.run_generator(node)
       node_after_call, ret = node2, async_generator.to_variable(node2)
     else:
-      node2, ret = self.vm.run_frame(frame, node)
+      summaries = self.vm.function_summaries
+      summary_key = summaries and summaries.get_key(self, callargs, frame)
+      ret = summary_key and summaries.replay(summary_key, self.code, node)
+      if ret is None:
+        num_errors = len(self.vm.errorlog)
+        node2, ret = self.vm.run_frame(frame, node)
+        if summary_key:
+          summaries.record(summary_key, ret, self.vm.errorlog[num_errors:])
+      else:
+        node2 = node
       if self.is_coroutine():
         ret = Coroutine(self.vm, ret, node2).to_variable(node2)
       node_after_call = node2
@@ -3600,6 +3638,9 @@ class Module(Instance):
 
   def _convert_member(self, name, ty):
     """Called to convert the items in _member_map to cfg.Variable."""
+    ty = self.vm.convert.verify_pytd_member(ty)
+    if ty is None:
+      return self.vm.new_unsolvable(self.vm.root_cfg_node)
     var = self.vm.convert.constant_to_var(ty)
     for value in var.data:
       # Only do this if this is a class which isn't already part of a module, or
@@ -1130,6 +1130,20 @@ class AbstractTest(AbstractTestBase):
       mod.module = "other_mod"
     self.assertRaises(AssertionError, set_module)
 
+  def test_fullhash(self):
+    instance = abstract.Instance(self._vm.convert.list_type, self._vm)
+    other = abstract.Instance(self._vm.convert.list_type, self._vm)
+    instance.members["x"] = other.to_variable(self._node)
+    fullhash = instance.get_fullhash()
+    self.assertEqual(instance.get_fullhash(), fullhash)
+    # Changing a value that is reachable through a member changes the hash.
+    other.members["y"] = self._vm.convert.none.to_variable(self._node)
+    changed = instance.get_fullhash()
+    self.assertNotEqual(changed, fullhash)
+    # So does replacing a member with a variable of the same size.
+    instance.members["x"] = self._vm.convert.none.to_variable(self._node)
+    self.assertNotEqual(instance.get_fullhash(), changed)
+
   def test_call_type_parameter_instance(self):
     instance = abstract.Instance(self._vm.convert.list_type, self._vm)
     instance.merge_instance_type_parameter(
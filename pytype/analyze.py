@@ -9,6 +9,7 @@ from pytype import abstract
 from pytype import abstract_utils
 from pytype import convert_structural
 from pytype import debug
+from pytype import forking
 from pytype import function
 from pytype import metrics
 from pytype import output
@@ -23,6 +24,11 @@ from pytype.pytd.parse import builtins
 
 log = logging.getLogger(__name__)
 
+# How long each phase of the analysis takes, for --metrics.
+_run_program_timer = metrics.ReentrantStopWatch("run_program_time")
+_analyze_timer = metrics.ReentrantStopWatch("analyze_time")
+_compute_types_timer = metrics.ReentrantStopWatch("compute_types_time")
+
 # Most interpreter functions (including lambdas) need to be analyzed as
 # stand-alone functions. The exceptions are comprehensions and generators, which
 # have names like "<listcomp>" and "<genexpr>".
@@ -369,19 +375,98 @@ class CallTracer(vm.VirtualMachine):
             data.get_first_opcode() not in self._analyzed_functions and
             not _SKIP_FUNCTION_RE.match(data.name))
 
-  def analyze_toplevel(self, node, defs):
-    for name, var in sorted(defs.items()):  # sort, for determinicity
-      if name not in self._builtin_map:
-        for value in var.bindings:
-          if isinstance(value.data, abstract.InterpreterClass):
-            new_node = self.analyze_class(node, value)
-          elif (isinstance(value.data, abstract.INTERPRETER_FUNCTION_TYPES) and
-                not value.data.is_overload):
-            new_node = self.analyze_function(node, value)
-          else:
-            continue
-          if new_node is not node:
-            new_node.ConnectTo(node)
+  def _analyze_definition(self, node, var):
+    for value in var.bindings:
+      if isinstance(value.data, abstract.InterpreterClass):
+        new_node = self.analyze_class(node, value)
+      elif (isinstance(value.data, abstract.INTERPRETER_FUNCTION_TYPES) and
+            not value.data.is_overload):
+        new_node = self.analyze_function(node, value)
+      else:
+        continue
+      if new_node is not node:
+        new_node.ConnectTo(node)
+
+  def _analyze_partition(self, node, defs, names):
+    """Analyze some of the top-level definitions in a forked child.
+
+    Args:
+      node: The node to analyze the definitions at.
+      defs: All of the top-level definitions.
+      names: The names of the definitions to analyze.
+
+    Returns:
+      A tuple of the errors and of the indices of the classes and of the
+      functions in _interpreter_classes and _interpreter_functions that were
+      analyzed.
+    """
+    num_errors = len(self.errorlog)
+    num_classes = len(self._interpreter_classes)
+    num_functions = len(self._interpreter_functions)
+    for name in names:
+      self._analyze_definition(node, defs[name])
+    errors = [e.drop_bad_call() for e in self.errorlog[num_errors:]]
+    analyzed_classes = [
+        (i, j) for i, c in enumerate(self._interpreter_classes[:num_classes])
+        for j, value in enumerate(c.bindings)
+        if value.data in self._analyzed_classes]
+    analyzed_functions = [
+        (i, j)
+        for i, f in enumerate(self._interpreter_functions[:num_functions])
+        for j, value in enumerate(f.bindings)
+        if isinstance(value.data, abstract.InterpreterFunction) and
+        value.data.get_first_opcode() in self._analyzed_functions]
+    if self.function_summaries:
+      self.function_summaries.save()
+    return errors, analyzed_classes, analyzed_functions
+
+  def _analyze_in_children(self, node, defs, names, num_jobs):
+    """Analyze partitions of the top-level definitions in forked children."""
+    partitions = forking.partition(names, num_jobs)
+    results = forking.map_forked(
+        lambda partition: self._analyze_partition(node, defs, partition),
+        partitions)
+    for partition, result in zip(partitions, results):
+      if result is None:
+        log.warning("Analyzing %d definitions in the parent instead",
+                    len(partition))
+        for name in partition:
+          self._analyze_definition(node, defs[name])
+        continue
+      errors, analyzed_classes, analyzed_functions = result
+      self.errorlog.extend(errors)
+      # The children may have added bindings, so only the ones that existed
+      # before forking can be found here.
+      for i, j in analyzed_classes:
+        data = self._interpreter_classes[i].data
+        if j < len(data):
+          self._analyzed_classes.add(data[j])
+      for i, j in analyzed_functions:
+        data = self._interpreter_functions[i].data
+        if j < len(data):
+          self._analyzed_functions.add(data[j].get_first_opcode())
+
+  def analyze_toplevel(self, node, defs, fork=False):
+    """Analyze the top-level definitions.
+
+    Args:
+      node: The node to analyze the definitions at.
+      defs: The top-level definitions, a dict from name to cfg.Variable.
+      fork: Whether to analyze the definitions in children forked according to
+        --analyze-jobs. The children only report errors back, not the types
+        that they inferred, so this is only done when checking.
+
+    Returns:
+      The node after the analysis.
+    """
+    # sort, for determinicity
+    names = [name for name in sorted(defs) if name not in self._builtin_map]
+    num_jobs = min(self.options.analyze_jobs or 1, len(names)) if fork else 1
+    if num_jobs > 1 and not self.generate_unknowns and forking.can_fork():
+      self._analyze_in_children(node, defs, names, num_jobs)
+    else:
+      for name in names:
+        self._analyze_definition(node, defs[name])
     # Now go through all functions and classes we haven't analyzed yet.
     # These are typically hidden under a decorator.
     # Go through classes first so that the `is_attribute_of_class` will
@@ -397,12 +482,12 @@ class CallTracer(vm.VirtualMachine):
           node = self.analyze_function(node, value)
     return node
 
-  def analyze(self, node, defs, maximum_depth):
+  def analyze(self, node, defs, maximum_depth, fork=False):
     assert not self.frame
     self.maximum_depth = maximum_depth
     self._analyzing = True
     node = node.ConnectNew(name="Analyze")
-    return self.analyze_toplevel(node, defs)
+    return self.analyze_toplevel(node, defs, fork)
 
   def trace_module_member(self, module, name, member):
     if module is None or isinstance(module, typing_overlay.TypingOverlay):
@@ -582,7 +667,7 @@ class CallTracer(vm.VirtualMachine):
     ty = ty.Visit(optimize.CombineReturnsAndExceptions())
     ty = ty.Visit(optimize.PullInMethodClasses())
     ty = ty.Visit(visitors.DefaceUnresolved(
-        [ty, self.loader.concat_all()], "~unknown"))
+        [ty, self.loader.lookup_all()], "~unknown"))
     return ty.Visit(visitors.AdjustTypeParameters())
 
   def _check_return(self, node, actual, formal):
@@ -604,14 +689,18 @@ def check_types(src, filename, errorlog, options, loader,
   """Verify the Python code."""
   tracer = CallTracer(errorlog=errorlog, options=options,
                       generate_unknowns=False, loader=loader, **kwargs)
-  loc, defs = tracer.run_program(src, filename, init_maximum_depth)
+  with _run_program_timer:
+    loc, defs = tracer.run_program(src, filename, init_maximum_depth)
   snapshotter = metrics.get_metric("memory", metrics.Snapshot)
   snapshotter.take_snapshot("analyze:check_types:tracer")
   if deep:
     if maximum_depth is None:
       maximum_depth = (
           QUICK_CHECK_MAXIMUM_DEPTH if options.quick else MAXIMUM_DEPTH)
-    tracer.analyze(loc, defs, maximum_depth=maximum_depth)
+    with _analyze_timer:
+      tracer.analyze(loc, defs, maximum_depth=maximum_depth, fork=True)
+  if tracer.function_summaries:
+    tracer.function_summaries.save()
   snapshotter.take_snapshot("analyze:check_types:post")
   _maybe_output_debug(options, tracer.program)
 
@@ -649,7 +738,8 @@ def infer_types(src, errorlog, options, loader,
     tracer = CallTracer(errorlog=errorlog, options=options,
                         generate_unknowns=options.protocols,
                         store_all_calls=not deep, loader=loader, **kwargs)
-  loc, defs = tracer.run_program(src, filename, init_maximum_depth)
+  with _run_program_timer:
+    loc, defs = tracer.run_program(src, filename, init_maximum_depth)
   log.info("===Done running definitions and module-level code===")
   snapshotter = metrics.get_metric("memory", metrics.Snapshot)
   snapshotter.take_snapshot("analyze:infer_types:tracer")
@@ -663,11 +753,15 @@ def infer_types(src, errorlog, options, loader,
         maximum_depth = QUICK_CHECK_MAXIMUM_DEPTH
       else:
         maximum_depth = QUICK_INFER_MAXIMUM_DEPTH
-    tracer.exitpoint = tracer.analyze(loc, defs, maximum_depth)
+    with _analyze_timer:
+      tracer.exitpoint = tracer.analyze(loc, defs, maximum_depth)
   else:
     tracer.exitpoint = loc
+  if tracer.function_summaries:
+    tracer.function_summaries.save()
   snapshotter.take_snapshot("analyze:infer_types:post")
-  ast = tracer.compute_types(defs)
+  with _compute_types_timer:
+    ast = tracer.compute_types(defs)
   ast = tracer.loader.resolve_ast(ast)
   if tracer.has_unknown_wildcard_imports or any(
       a in defs for a in abstract_utils.DYNAMIC_ATTRIBUTE_MARKERS):
@@ -20,6 +20,25 @@ STORE_OPCODES = (
 CODE_LOADING_OPCODES = (opcodes.LOAD_CONST,)
 
 
+# An opcode, decoded once so that the VM's dispatch loop doesn't have to.
+#   op: The opcodes.Opcode.
+#   name: The opcode's name.
+#   handler: What get_handler returned for the opcode's class.
+#   is_import: Whether the opcode is one of the IMPORT_* opcodes.
+#   carry_on: Whether execution can continue with the next opcode.
+#   has_arg: Whether the opcode has an argument.
+#   line: The opcode's line number.
+Instruction = collections.namedtuple(
+    "Instruction",
+    ["op", "name", "handler", "is_import", "carry_on", "has_arg", "line"])
+
+
+def decode_instruction(op, handler):
+  cls = op.__class__
+  return Instruction(op, cls.__name__, handler, "IMPORT" in cls.__name__,
+                     cls.carry_on_to_next(), cls.has_arg(), op.line)
+
+
 class OrderedCode(object):
   """Code object which knows about instruction ordering.
 
@@ -60,6 +79,35 @@ class OrderedCode(object):
     self.co_code = bytecode
     for insn in bytecode:
       insn.code = self
+    self._instruction_tables = {}
+
+  def get_instruction_table(self, get_handler):
+    """Get the blocks with their decoded instructions.
+
+    The table is built once per get_handler and then reused.
+
+    Args:
+      get_handler: A function from an opcode class to its handler, e.g. the
+        VM's bytecode function. It may return None for unknown opcodes.
+
+    Returns:
+      A list of (block, tuple of Instruction) pairs, in the order of
+      self.order.
+    """
+    table = self._instruction_tables.get(get_handler)
+    if table is None:
+      handlers = {}
+      table = []
+      for block in self.order:
+        instructions = []
+        for op in block:
+          cls = op.__class__
+          if cls not in handlers:
+            handlers[cls] = get_handler(cls)
+          instructions.append(decode_instruction(op, handlers[cls]))
+        table.append((block, tuple(instructions)))
+      self._instruction_tables[get_handler] = table
+    return table
 
   def has_opcode(self, op_type):
     return any(isinstance(op, op_type)
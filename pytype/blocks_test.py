@@ -51,6 +51,43 @@ class OrderingTest(BaseBlocksTest):
     self.assertTrue(ordered_code.has_opcode(opcodes.RETURN_VALUE))
     self.assertFalse(ordered_code.has_opcode(opcodes.POP_TOP))
 
+  def test_instruction_table(self):
+    # Disassembled from:
+    # | import sys
+    o = test_utils.Py2Opcodes
+    co = self.make_code([
+        o.LOAD_CONST, 0, 0,
+        o.LOAD_CONST, 1, 0,
+        o.IMPORT_NAME, 0, 0,
+        o.STORE_NAME, 0, 0,
+        o.LOAD_CONST, 1, 0,
+        o.RETURN_VALUE,
+    ], name="import")
+    ordered_code = self._order_code(co)
+    lookups = []
+    def get_handler(cls):
+      lookups.append(cls)
+      return cls.__name__.lower()
+    table = ordered_code.get_instruction_table(get_handler)
+    self.assertEqual([block for block, _ in table], ordered_code.order)
+    for block, instructions in table:
+      self.assertEqual([insn.op for insn in instructions], block.code)
+    instructions = [insn for _, block_instructions in table
+                    for insn in block_instructions]
+    self.assertEqual([insn.handler for insn in instructions],
+                     ["load_const", "load_const", "import_name", "store_name",
+                      "load_const", "return_value"])
+    self.assertEqual([insn.is_import for insn in instructions],
+                     [False, False, True, False, False, False])
+    self.assertEqual([insn.carry_on for insn in instructions],
+                     [True, True, True, True, True, False])
+    self.assertTrue(instructions[0].has_arg)
+    self.assertFalse(instructions[-1].has_arg)
+    # Each opcode class is looked up once, and the table is built once.
+    self.assertEqual(len(lookups), 4)
+    self.assertIs(ordered_code.get_instruction_table(get_handler), table)
+    self.assertEqual(len(lookups), 4)
+
   def test_yield(self):
     # Disassembled from:
     # | yield 1
@@ -0,0 +1,357 @@
+"""Generate the precompiled builtins in parallel and incrementally.
+
+The serial --generate-builtins imports every typeshed module through one loader,
+which takes minutes per Python version. This generator instead imports the
+modules in a pool of processes, in dependency order: a module is imported once
+the modules that it depended on last time are done, by a loader that is seeded
+with their serialized asts, so that it only has to parse the module itself.
+
+Next to the output file, we record a hash of the source of every module that
+it contains, and of the pytype code that parses and serializes them. When the
+output is regenerated with the same code, a module's serialized ast is reused
+if its source and the sources of all of its transitive dependencies are
+unchanged. The output is written in the same format as the serial generator's.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import multiprocessing
+import traceback
+
+from pytype import __version__
+from pytype import load_pytd
+from pytype.pyi import parser
+from pytype.pytd import pytd
+from pytype.pytd import pytd_utils
+from pytype.pytd import serialize_ast
+from pytype.pytd import typeshed
+from pytype.pytd import visitors
+
+from six.moves import queue
+
+
+log = logging.getLogger(__name__)
+
+# The modules that every loader starts with.
+_BASE_MODULES = ("__builtin__", "typing")
+
+# The extension of the file with the hashes of the modules' sources.
+SOURCES_EXT = ".sources"
+
+# The pytype modules whose code decides what the serialized asts look like.
+_SERIALIZING_MODULES = (load_pytd, parser, parser.parser_ext, pytd,
+                        serialize_ast, visitors)
+
+# How often (in seconds) to check for failed imports and dead workers while
+# waiting for results.
+_POLL_INTERVAL = 1.0
+
+
+class GenerationError(Exception):
+  """An error while importing a module in a worker process."""
+
+
+def _sources_filename(filename):
+  return filename + SOURCES_EXT
+
+
+def _code_fingerprint():
+  """Hash the code of the modules that parse and serialize the asts."""
+  h = hashlib.sha256()
+  for module in _SERIALIZING_MODULES:
+    filename = module.__file__
+    if filename.endswith(".pyc"):
+      filename = filename[:-1]
+    try:
+      with open(filename, "rb") as f:
+        h.update(f.read())
+    except IOError:
+      # E.g. in a zipped installation, where only the version tells us that
+      # the code changed.
+      h.update(filename.encode("utf-8"))
+  return h.hexdigest()
+
+
+def _target_modules(python_version):
+  """The names of the modules that the builtins are generated from."""
+  t = typeshed.Typeshed()
+  blacklist = set(t.blacklisted_modules(python_version))
+  return set(_BASE_MODULES) | {
+      m for m in t.get_all_module_names(python_version) if m not in blacklist}
+
+
+def _load_previous(filename, python_version):
+  """Load the modules of a previously generated file.
+
+  Args:
+    filename: The output file.
+    python_version: The target Python version.
+
+  Returns:
+    A tuple of a dict from module name to (serialized ast, dependencies), and
+    a dict from module name to source hash. Both are empty if there is no
+    usable previous output.
+  """
+  try:
+    with open(_sources_filename(filename), "r") as f:
+      sources = json.load(f)
+    if (sources["version"] != __version__.__version__ or
+        sources["code"] != _code_fingerprint() or
+        tuple(sources["python_version"]) != tuple(python_version)):
+      return {}, {}
+    hashes = sources["modules"]
+    if not pytd_utils.IsIndexedPickles(filename):
+      return {}, {}
+    pickles = pytd_utils.IndexedPickles(filename)
+    # Read everything now, since the output file will be overwritten.
+    modules = {name: (pickles.read(name), pickles.dependencies(name))
+               for name in pickles.names()}
+  except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+    log.info("Not reusing %s: %s", filename, e)
+    return {}, {}
+  return modules, hashes
+
+
+def stale_modules(dependencies, old_hashes, new_hashes):
+  """Find the modules that have to be regenerated.
+
+  Args:
+    dependencies: A dict from module name to the names of the modules that it
+      depended on when it was last generated.
+    old_hashes: A dict from module name to the hash of its source when it was
+      last generated.
+    new_hashes: A function from module name to the hash of its current source.
+
+  Returns:
+    The set of the modules in dependencies whose source, or the source of one
+    of whose transitive dependencies, changed.
+  """
+  dependents = collections.defaultdict(set)
+  for name, deps in dependencies.items():
+    for dep in deps:
+      dependents[dep].add(name)
+  todo = [name for name in dependencies
+          if name not in old_hashes or old_hashes[name] != new_hashes(name)]
+  # Modules that depended on a module that no longer exists are stale, too.
+  todo.extend(dep for dep in dependents if dep not in dependencies)
+  stale = set()
+  while todo:
+    name = todo.pop()
+    if name not in stale:
+      stale.add(name)
+      todo.extend(dependents[name])
+  return stale & set(dependencies)
+
+
+def _wait_for_result(results, async_results, workers):
+  """Wait for the result of an import in a multiprocessing.Pool.
+
+  Args:
+    results: The queue that the pool's callback puts the results into.
+    async_results: A dict from module name to the AsyncResult of its import.
+    workers: The pool's worker processes.
+
+  Returns:
+    The result of _import_module for one of the modules.
+
+  Raises:
+    GenerationError: If a worker died, since its import never reports back.
+  """
+  while True:
+    try:
+      return results.get(timeout=_POLL_INTERVAL)
+    except queue.Empty:
+      pass
+    # Python 2's apply_async has no error_callback, so we look for imports
+    # that failed outside of _import_module, e.g. in pickling the result.
+    for name, async_result in sorted(async_results.items()):
+      if async_result.ready() and not async_result.successful():
+        try:
+          async_result.get()
+        except Exception as e:  # pylint: disable=broad-except
+          return name, None, "%s: %s" % (type(e).__name__, e)
+    # The pool replaces a worker that dies, but loses the job it was running.
+    if any(worker.exitcode is not None for worker in workers):
+      raise GenerationError("A worker died while importing %s" %
+                            ", ".join(sorted(async_results)))
+
+
+def _closure(names, dependencies):
+  """The names and their transitive dependencies that are in dependencies."""
+  seen = set()
+  todo = list(names)
+  while todo:
+    name = todo.pop()
+    if name not in seen and name in dependencies:
+      seen.add(name)
+      todo.extend(dependencies[name])
+  return seen
+
+
+def _import_module(args):
+  """Import a module in a worker process.
+
+  Args:
+    args: A tuple of the module name, the loader's keyword arguments, and a
+      dict from module name to serialized ast for the loader to start with.
+
+  Returns:
+    A tuple of the module name, the (name, serialized ast, dependencies) tuples
+    of the modules that the loader had to parse, and an error message.
+  """
+  module_name, loader_kwargs, seeds = args
+  try:
+    modules = {
+        name: load_pytd.Module(name, filename=None, ast=None, pickle=pickle,
+                               dirty=False)
+        for name, pickle in seeds.items()}
+    loader = load_pytd.PickledPyiLoader(modules=modules or None,
+                                        **loader_kwargs)
+    loader.import_name(module_name)
+    return (module_name, loader.serialize_modules(exclude=seeds),
+            None)
+  except Exception:  # pylint: disable=broad-except
+    return module_name, None, traceback.format_exc()
+
+
+class _Scheduler(object):
+  """Runs the imports, in dependency order as far as it is known."""
+
+  def __init__(self, loader_kwargs, targets, hints, done):
+    self._loader_kwargs = loader_kwargs
+    # module name -> (serialized ast, dependencies)
+    self.done = done
+    self._hints = hints
+    self._pending = set(targets) - set(done)
+    self._running = set()
+
+  def _is_ready(self, name):
+    if name in _BASE_MODULES:
+      return True
+    deps = set(self._hints.get(name, ())) | set(_BASE_MODULES)
+    return all(dep in self.done or
+               (dep not in self._pending and dep not in self._running)
+               for dep in deps if dep != name)
+
+  def _next_jobs(self):
+    """Get the arguments of the imports that can start now."""
+    ready = sorted(name for name in self._pending if self._is_ready(name))
+    if not ready and not self._running:
+      # A cycle: its modules get parsed by the loaders that import them.
+      ready = sorted(self._pending)
+    dependencies = {name: deps for name, (_, deps) in self.done.items()}
+    jobs = []
+    for name in ready:
+      self._pending.discard(name)
+      self._running.add(name)
+      seeds = _closure(set(self._hints.get(name, ())) | set(_BASE_MODULES),
+                       dependencies)
+      if not all(base in seeds for base in _BASE_MODULES):
+        seeds = set()
+      jobs.append((name, self._loader_kwargs,
+                   {seed: self.done[seed][0] for seed in seeds}))
+    return jobs
+
+  def _finish(self, result):
+    name, items, error = result
+    self._running.discard(name)
+    if error:
+      raise GenerationError("Couldn't import %s:\n%s" % (name, error))
+    for item_name, pickle, deps in items:
+      if item_name not in self.done:
+        self.done[item_name] = (pickle, deps)
+        self._pending.discard(item_name)
+
+  def run(self, num_workers):
+    """Import all of the modules."""
+    if num_workers <= 1:
+      while self._pending:
+        for job in self._next_jobs():
+          self._finish(_import_module(job))
+      return
+    results = queue.Queue()
+    pool = multiprocessing.Pool(num_workers)
+    workers = list(pool._pool)  # pylint: disable=protected-access
+    async_results = {}
+    try:
+      while self._pending or self._running:
+        for job in self._next_jobs():
+          async_results[job[0]] = pool.apply_async(
+              _import_module, (job,), callback=results.put)
+        result = _wait_for_result(results, async_results, workers)
+        del async_results[result[0]]
+        self._finish(result)
+    finally:
+      pool.terminate()
+      pool.join()
+
+
+def generate_serially(options, module_names=None):
+  """Generate options.generate_builtins by importing modules in one loader.
+
+  Args:
+    options: The config.Options.
+    module_names: Optionally, the modules to generate the builtins from,
+      instead of typeshed's.
+  """
+  loader = load_pytd.create_loader(options)
+  if module_names is None:
+    module_names = _target_modules(options.python_version)
+  for m in sorted(module_names):
+    loader.import_name(m)
+  loader.save_to_pickle(options.generate_builtins)
+
+
+def generate(options, num_workers, module_names=None):
+  """Generate the precompiled builtins file options.generate_builtins.
+
+  Args:
+    options: The config.Options.
+    num_workers: The number of worker processes.
+    module_names: Optionally, the modules to generate the builtins from,
+      instead of typeshed's.
+  """
+  filename = options.generate_builtins
+  python_version = options.python_version
+  loader_kwargs = {attr: getattr(options, opt)
+                   for attr, opt in
+                   load_pytd.LOADER_ATTR_TO_CONFIG_OPTION_MAP.items()}
+  if module_names is None:
+    targets = _target_modules(python_version)
+  else:
+    targets = set(_BASE_MODULES) | set(module_names)
+
+  hashes = {}
+  def cached_source_hash(name):
+    if name not in hashes:
+      hashes[name] = typeshed.source_hash(name, python_version)
+    return hashes[name]
+
+  previous, old_hashes = _load_previous(filename, python_version)
+  hints = {name: deps for name, (_, deps) in previous.items()}
+  stale = stale_modules(hints, old_hashes, cached_source_hash)
+  done = {name: item for name, item in previous.items() if name not in stale}
+  # Stale modules that the targets imported last time are regenerated, too.
+  to_import = targets | (_closure(targets, hints) & stale)
+  log.info("Reusing %d modules, importing %d",
+           len(set(done) & _closure(targets, hints)),
+           len(to_import - set(done)))
+
+  scheduler = _Scheduler(loader_kwargs, to_import, hints, done)
+  scheduler.run(num_workers)
+
+  dependencies = {name: deps for name, (_, deps) in scheduler.done.items()}
+  names = sorted(_closure(targets, dependencies))
+  items = [(name, scheduler.done[name][0], scheduler.done[name][1])
+           for name in names]
+  pytd_utils.SaveIndexedPickles(items, filename)
+  sources = {
+      "version": __version__.__version__,
+      "code": _code_fingerprint(),
+      "python_version": list(python_version),
+      "modules": {name: cached_source_hash(name) for name in names},
+  }
+  with open(_sources_filename(filename), "w") as f:
+    json.dump(sources, f, sort_keys=True)
@@ -0,0 +1,174 @@
+"""Tests for builtins_generator.py."""
+
+import json
+import os
+
+from pytype import builtins_generator
+from pytype import config
+from pytype import file_utils
+from pytype.pytd import pytd_utils
+
+import unittest
+
+
+class StaleModulesTest(unittest.TestCase):
+  """Test finding the modules to regenerate."""
+
+  DEPENDENCIES = {
+      "__builtin__": ["typing"],
+      "typing": ["__builtin__"],
+      "os": ["__builtin__", "posix"],
+      "posix": ["__builtin__"],
+      "json": ["__builtin__"],
+  }
+
+  def stale(self, new_hashes, old_hashes=None):
+    old_hashes = old_hashes or {name: "h" for name in self.DEPENDENCIES}
+    return builtins_generator.stale_modules(
+        self.DEPENDENCIES, old_hashes, lambda name: new_hashes.get(name, "h"))
+
+  def test_unchanged(self):
+    self.assertEqual(self.stale({}), set())
+
+  def test_changed_module(self):
+    self.assertEqual(self.stale({"json": "x"}), {"json"})
+
+  def test_changed_dependency(self):
+    self.assertEqual(self.stale({"posix": "x"}), {"os", "posix"})
+
+  def test_changed_builtins(self):
+    self.assertEqual(self.stale({"typing": "x"}), set(self.DEPENDENCIES))
+
+  def test_new_hash(self):
+    old_hashes = {name: "h" for name in self.DEPENDENCIES if name != "json"}
+    self.assertEqual(self.stale({}, old_hashes), {"json"})
+
+  def test_missing_dependency(self):
+    dependencies = {"os": ["posix"]}
+    self.assertEqual(builtins_generator.stale_modules(
+        dependencies, {"os": "h"}, lambda name: "h"), {"os"})
+
+
+class FakeImportMixin(object):
+  """Replaces the imports in worker processes with fake ones."""
+
+  DEPENDENCIES = {
+      "__builtin__": ["typing"],
+      "typing": ["__builtin__"],
+      "os": ["__builtin__", "posix"],
+      "posix": ["__builtin__"],
+  }
+
+  def setUp(self):
+    super(FakeImportMixin, self).setUp()
+    self.imported = []
+    self._import_module = builtins_generator._import_module  # pylint: disable=protected-access
+    builtins_generator._import_module = self.fake_import_module  # pylint: disable=protected-access
+
+  def tearDown(self):
+    super(FakeImportMixin, self).tearDown()
+    builtins_generator._import_module = self._import_module  # pylint: disable=protected-access
+
+  def fake_import_module(self, args):
+    module_name, _, seeds = args
+    self.imported.append((module_name, sorted(seeds)))
+    # Like a loader, return the module and the dependencies it had to parse.
+    names = builtins_generator._closure([module_name], self.DEPENDENCIES)  # pylint: disable=protected-access
+    items = [(name, name.encode("utf-8"), self.DEPENDENCIES[name])
+             for name in sorted(names) if name not in seeds]
+    return module_name, items, None
+
+
+
+class SchedulerTest(FakeImportMixin, unittest.TestCase):
+  """Test the order of the imports."""
+
+  def run_scheduler(self, targets, done=None):
+    scheduler = builtins_generator._Scheduler(  # pylint: disable=protected-access
+        {}, targets, self.DEPENDENCIES, done or {})
+    scheduler.run(num_workers=1)
+    return scheduler.done
+
+  def test_dependency_order(self):
+    done = self.run_scheduler(["os", "posix", "__builtin__", "typing"])
+    self.assertEqual(set(done), set(self.DEPENDENCIES))
+    # os is imported last, with everything it needs already serialized.
+    self.assertEqual(self.imported[-1],
+                     ("os", ["__builtin__", "posix", "typing"]))
+
+  def test_reuse(self):
+    done = {name: (b"old", deps) for name, deps in self.DEPENDENCIES.items()
+            if name != "os"}
+    done = self.run_scheduler(["os", "posix", "__builtin__", "typing"], done)
+    self.assertEqual(self.imported,
+                     [("os", ["__builtin__", "posix", "typing"])])
+    self.assertEqual(done["posix"][0], b"old")
+    self.assertEqual(done["os"][0], b"os")
+
+  def test_error(self):
+    builtins_generator._import_module = lambda args: (args[0], None, "oops")  # pylint: disable=protected-access
+    self.assertRaises(builtins_generator.GenerationError,
+                      self.run_scheduler, ["__builtin__"])
+
+
+class FakeOptions(object):
+  """Just enough of config.Options to run the generator."""
+
+  def __init__(self, generate_builtins):
+    self.generate_builtins = generate_builtins
+    self.python_version = (2, 7)
+    self.module_name = None
+    self.pythonpath = [""]
+    self.imports_map = None
+    self.typeshed = True
+    self.pyi_cache = None
+    self.directory_cache = None
+
+
+class IncrementalGenerateTest(FakeImportMixin, unittest.TestCase):
+  """Test generating and regenerating an output file."""
+
+  def test_regenerate(self):
+    with file_utils.Tempdir() as d:
+      options = FakeOptions(os.path.join(d.path, "builtins"))
+      builtins_generator.generate(options, 1, ["os"])
+      self.assertIn("os", [name for name, _ in self.imported])
+      with open(options.generate_builtins + builtins_generator.SOURCES_EXT,
+                "r") as f:
+        self.assertEqual(sorted(json.load(f)["modules"]),
+                         ["__builtin__", "os", "posix", "typing"])
+      # Nothing changed, so the previous output is reused.
+      self.imported = []
+      builtins_generator.generate(options, 1, ["os"])
+      self.assertEqual(self.imported, [])
+      pickles = pytd_utils.IndexedPickles(options.generate_builtins)
+      self.assertEqual(pickles.read("os"), b"os")
+
+
+class GenerateTest(unittest.TestCase):
+  """Test that the parallel generator matches the serial one."""
+
+  PYTHON_VERSION = (2, 7)
+  MODULES = ["collections", "json", "os"]
+
+  def generate(self, d, name, num_workers):
+    filename = os.path.join(d.path, name)
+    options = config.Options.create(python_version=self.PYTHON_VERSION)
+    options.tweak(generate_builtins=filename)
+    if num_workers:
+      builtins_generator.generate(options, num_workers, self.MODULES)
+    else:
+      builtins_generator.generate_serially(options, self.MODULES)
+    pickles = pytd_utils.IndexedPickles(filename)
+    return [(name, pickles.read(name)) for name in pickles.names()]
+
+  def test_matches_serial(self):
+    with file_utils.Tempdir() as d:
+      serial = self.generate(d, "serial", 0)
+      parallel = self.generate(d, "parallel", 2)
+      self.assertIn("os", dict(serial))
+      self.assertEqual(pytd_utils.DiffNamedPickles(serial, parallel), [])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -148,6 +148,12 @@ def add_subtools(o):
       "--generate-builtins", action="store",
       dest="generate_builtins", default=None,
       help="Precompile builtins pyi and write to the given file.")
+  o.add_argument(
+      "--generate-builtins-jobs", type=int, action="store",
+      dest="generate_builtins_jobs", default=None,
+      help=("Precompile the builtins in N processes, reusing the modules of "
+            "an earlier --generate-builtins output whose sources are "
+            "unchanged."))
   o.add_argument(
       "--parse-pyi", action="store_true",
       dest="parse_pyi", default=False,
@@ -217,6 +223,40 @@ def add_infrastructure_options(o):
             "then pytype should be invoked with $OUTDIR in "
             "--pythonpath. This option is incompatible with "
             "--imports_info and --generate_builtins.") % os.pathsep)
+  o.add_argument(
+      "--no-rewrite-unchanged", action="store_false",
+      dest="rewrite_unchanged", default=True,
+      help=("Don't rewrite the output pyi if its contents did not change, so "
+            "that its modification time only changes with its interface."))
+  o.add_argument(
+      "--result-cache", type=str, action="store",
+      dest="result_cache", default=None,
+      help=("Directory for caching results, keyed by the contents of the input "
+            "and of the files in --imports_info. Requires --imports_info."))
+  o.add_argument(
+      "--pyi-cache", type=str, action="store",
+      dest="pyi_cache", default=None,
+      help=("Directory for caching parsed pyi files, so that the stubs a "
+            "module imports don't have to be parsed again on the next run."))
+  o.add_argument(
+      "--directory-cache", type=str, action="store",
+      dest="directory_cache", default=None,
+      help=("File for caching the listings of the directories that are "
+            "searched for pyi files, so that the next run doesn't have to "
+            "stat them again."))
+  o.add_argument(
+      "--analyze-jobs", type=int, action="store",
+      dest="analyze_jobs", default=1,
+      help=("When checking, analyze the top-level classes and functions in N "
+            "processes that are forked after the module-level code has run. "
+            "Needs os.fork. Inferring a pyi is always done in one process, "
+            "since the children only report their errors, not their types."))
+  o.add_argument(
+      "--function-summary-cache", type=str, action="store",
+      dest="function_summary_cache", default=None,
+      help=("File for caching the return values and errors of calls of "
+            "simple functions, so that the next run doesn't have to analyze "
+            "them again if their code and argument types are unchanged."))
   o.add_argument(
       "--touch", type=str, action="store",
       dest="touch", default=None,
@@ -9,6 +9,7 @@ from pytype import blocks
 from pytype import compat
 from pytype import datatypes
 from pytype import function
+from pytype import load_pytd
 from pytype import mixin
 from pytype import output
 from pytype import special_builtins
@@ -18,6 +19,7 @@ from pytype.pyc import loadmarshal
 from pytype.pytd import mro
 from pytype.pytd import pytd
 from pytype.pytd import pytd_utils
+from pytype.pytd import visitors
 from pytype.typegraph import cfg
 
 
@@ -476,6 +478,23 @@ class Converter(utils.VirtualMachineWeakrefMixin):
         self._convert_cache[key] = value
       return value
 
+  def verify_pytd_member(self, pyval):
+    """Verify a top-level pytd node before converting it.
+
+    Args:
+      pyval: A top-level pytd node.
+
+    Returns:
+      The node to convert, or None if it failed verification, in which case a
+      pyi-error was logged.
+    """
+    try:
+      return self.vm.loader.verify_member(pyval)
+    except (load_pytd.BadDependencyError, visitors.ContainerError) as e:
+      module, _, _ = pyval.name.rpartition(".")
+      self.vm.errorlog.pyi_error(self.vm.frames, module, e)
+      return None
+
   def _load_late_type(self, late_type):
     """Resolve a late type, possibly by loading a module."""
     if late_type.name not in self._resolved_late_types:
@@ -584,6 +603,9 @@ class Converter(utils.VirtualMachineWeakrefMixin):
         # even though it is exported via types.pyi.
         return self.module_type
       else:
+        pyval = self.verify_pytd_member(pyval)
+        if pyval is None:
+          return self.unsolvable
         module, dot, base_name = pyval.name.rpartition(".")
         # typing.TypingContainer intentionally loads the underlying pytd types.
         if module != "typing" and module in self.vm.loaded_overlays:
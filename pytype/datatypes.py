@@ -2,6 +2,8 @@
 
 import itertools
 
+from pytype.typegraph import cfg
+
 
 class UnionFind(object):
   r"""A disjoint-set data structure for `AliasingDict`.
@@ -141,24 +143,63 @@ class AccessTrackingDict(dict):
     return super(AccessTrackingDict, self).__delitem__(k)
 
 
+class _ChangeCounter(list):
+  """A one-element list of a number of changes, for weak references."""
+
+  __slots__ = ("__weakref__",)
+
+
 class MonitorDict(dict):
   """A dictionary that monitors changes to its cfg.Variable values.
 
   This dictionary takes arbitrary objects as keys and cfg.Variable objects as
-  values. It increments a changestamp whenever a new value is added or more data
-  is merged into a value. The changestamp is unaffected by the addition of
-  another origin for existing data.
+  values. It increments a changestamp whenever a value is added or replaced or
+  more data is merged into a value. The changestamp is unaffected by the
+  addition of another origin for existing data.
+
+  The variables count the bindings added to them in the dictionary's change
+  counter, so reading the changestamp takes constant time. They only hold weak
+  references to the counter, and a variable that is replaced stops counting.
   """
 
+  def __init__(self, *args, **kwargs):
+    super(MonitorDict, self).__init__(*args, **kwargs)
+    # The number of changes, shared with the variables in this dictionary.
+    self._changes = _ChangeCounter([0])
+    for var in self.values():
+      self._monitor(var)
+
+  def _monitor(self, var):
+    if isinstance(var, cfg.Variable):
+      var.RegisterChangeCounter(self._changes)
+
+  def _unmonitor(self, var):
+    if isinstance(var, cfg.Variable):
+      var.UnregisterChangeCounter(self._changes)
+
   def __delitem__(self, name):
     raise NotImplementedError
 
   def __setitem__(self, name, var):
+    old_var = dict.get(self, name)
+    if old_var is not var:
+      self._changes[0] += 1
+      self._unmonitor(old_var)
+      self._monitor(var)
     super(MonitorDict, self).__setitem__(name, var)
 
+  def update(self, *args, **kwargs):
+    for name, var in dict(*args, **kwargs).items():
+      self[name] = var
+
+  def setdefault(self, name, var=None):
+    if name not in self:
+      self[name] = var
+    return self[name]
+
   @property
   def changestamp(self):
-    return len(self) + sum((len(var.bindings) for var in self.values()))
+    return self._changes[0]
 
   @property
   def data(self):
@@ -62,6 +62,43 @@ class DatatypesTest(unittest.TestCase):
     var.AddBinding("data")  # No change because this is duplicate data
     self.assertEqual(d.changestamp, changestamp)
     changestamp = d.changestamp
+    d["key"] = var  # No change because this is the same variable
+    self.assertEqual(d.changestamp, changestamp)
+    other_var = self.prog.NewVariable()
+    other_var.AddBinding("other data")
+    d["key"] = other_var
+    self.assertGreater(d.changestamp, changestamp)
+
+  def testMonitorDictSharedVariable(self):
+    var = self.prog.NewVariable()
+    d1 = datatypes.MonitorDict({"key": var})
+    d2 = datatypes.MonitorDict()
+    d2["key"] = var
+    d2["other"] = "not a variable"
+    changestamps = d1.changestamp, d2.changestamp
+    var.AddBinding("data")
+    self.assertGreater(d1.changestamp, changestamps[0])
+    self.assertGreater(d2.changestamp, changestamps[1])
+
+  def testMonitorDictReplacedVariable(self):
+    var = self.prog.NewVariable()
+    d = datatypes.MonitorDict({"key": var, "alias": var})
+    d["key"] = self.prog.NewVariable()
+    changestamp = d.changestamp
+    var.AddBinding("data")  # Still stored under "alias".
+    self.assertGreater(d.changestamp, changestamp)
+    d["alias"] = self.prog.NewVariable()
+    changestamp = d.changestamp
+    var.AddBinding("other data")
+    self.assertEqual(d.changestamp, changestamp)
+
+  def testMonitorDictManyDicts(self):
+    var = self.prog.NewVariable()
+    dicts = [datatypes.MonitorDict({"key": var}) for _ in range(3)]
+    changestamp = dicts[0].changestamp
+    del dicts[1:]
+    var.AddBinding("data")
+    self.assertEqual(dicts[0].changestamp, changestamp + 1)
 
   def testAliasingDict(self):
     d = datatypes.AliasingDict()
@@ -0,0 +1,136 @@
+"""A cache of directory listings for finding modules on the pythonpath.
+
+Looking for a module means checking, for every pythonpath entry, whether a
+package directory, an __init__.pyi or a .pyi file exists. That is several stat
+calls per entry and module, which adds up on long pythonpaths and on networked
+filesystems. Instead, we list each directory once and answer the checks from
+the listing.
+
+The listings can be saved to a file and reused by the next run. A saved
+listing is checked against its directory's mtime, which changes whenever an
+entry is added or removed, the first time it is used. Since mtimes have a
+limited resolution, a directory can change without its mtime changing if it was
+listed in the same tick, so listings that were taken that close to the last
+change aren't saved.
+"""
+
+import json
+import logging
+import os
+import time
+
+from pytype import file_utils
+from pytype import metrics
+
+
+log = logging.getLogger(__name__)
+
+# Filesystem calls made while searching for modules, for --metrics.
+_stat_counter = metrics.Counter("module_search_stat_count")
+
+# The coarsest mtime resolution (in seconds) of the filesystems we run on. FAT
+# has a resolution of 2 seconds, and other filesystems update mtimes from a
+# clock that may only tick every few milliseconds.
+_MTIME_RESOLUTION = 2.0
+
+
+def _mtime(directory):
+  _stat_counter.inc()
+  try:
+    return os.stat(directory).st_mtime
+  except OSError:
+    return None
+
+
+def _list(directory):
+  """Map the names in a directory to whether they are directories."""
+  _stat_counter.inc()
+  scandir = getattr(os, "scandir", None)
+  try:
+    if scandir:
+      return {entry.name: entry.is_dir() for entry in scandir(directory)}
+    names = os.listdir(directory)
+  except OSError:
+    return None
+  _stat_counter.inc(len(names))
+  return {name: os.path.isdir(os.path.join(directory, name))
+          for name in names}
+
+
+class DirectoryCache(object):
+  """Answers exists/isdir questions from cached directory listings."""
+
+  def __init__(self, filename=None):
+    self.filename = filename
+    # directory -> (mtime, {name: is_dir}), with None for missing directories
+    self._listings = {}
+    # Directories whose listing was made or validated by this process.
+    self._fresh = set()
+    # Directories that were listed within _MTIME_RESOLUTION of their mtime.
+    self._racy = set()
+    self._dirty = False
+
+  def load(self):
+    """Load the listings from self.filename, if it exists."""
+    try:
+      with open(self.filename, "r") as f:
+        listings = json.load(f)
+      self._listings = {directory: (mtime, names)
+                        for directory, (mtime, names) in listings.items()}
+    except (IOError, OSError, ValueError, TypeError, AttributeError):
+      self._listings = {}
+    self._fresh = set()
+    self._racy = set()
+    self._dirty = False
+    return self
+
+  def save(self):
+    """Save the listings to self.filename, if there is one and it's stale."""
+    if not self.filename or not self._dirty:
+      return
+    try:
+      # A racy listing may be missing changes that its mtime doesn't show.
+      listings = {directory: entry
+                  for directory, entry in self._listings.items()
+                  if directory not in self._racy}
+      with file_utils.replace_atomically(self.filename) as tmp:
+        with open(tmp, "w") as f:
+          json.dump(listings, f, sort_keys=True)
+    except (IOError, OSError) as e:
+      log.warning("Could not write directory cache %s: %s", self.filename, e)
+    self._dirty = False
+
+  def _get_listing(self, directory):
+    if directory in self._fresh:
+      return self._listings[directory][1]
+    path = directory or "."
+    mtime = _mtime(path)
+    entry = self._listings.get(directory)
+    if not entry or entry[0] != mtime:
+      listed_at = time.time()
+      entry = (mtime, _list(path) if mtime is not None else None)
+      self._listings[directory] = entry
+      self._dirty = True
+      if mtime is not None and listed_at - mtime <= _MTIME_RESOLUTION:
+        self._racy.add(directory)
+    self._fresh.add(directory)
+    return entry[1]
+
+  def _lookup(self, path):
+    directory, name = os.path.split(path)
+    if not name:
+      return None
+    listing = self._get_listing(directory)
+    return listing.get(name) if listing else None
+
+  def exists(self, path):
+    """Whether path is an existing file or directory."""
+    return self._lookup(path) is not None
+
+  def isdir(self, path):
+    """Whether path is an existing directory."""
+    return bool(self._lookup(path))
+
+  def isfile(self, path):
+    """Whether path exists and is not a directory."""
+    return self._lookup(path) is False
@@ -0,0 +1,93 @@
+"""Tests for directory_cache.py."""
+
+import os
+
+from pytype import directory_cache
+from pytype import metrics
+from pytype.tests import test_utils
+
+import unittest
+
+
+class DirectoryCacheTest(test_utils.TempdirMixin, unittest.TestCase):
+  """Test the directory cache."""
+
+  def setUp(self):
+    super(DirectoryCacheTest, self).setUp()
+    self.d.create_file("pkg/__init__.pyi")
+    self.d.create_file("pkg/foo.pyi")
+    self.cache_file = os.path.join(self.d.path, "directory_cache")
+    metrics._prepare_for_test()  # pylint: disable=protected-access
+
+  def tearDown(self):
+    super(DirectoryCacheTest, self).tearDown()
+    metrics._prepare_for_test(enabled=False)  # pylint: disable=protected-access
+
+  def stat_count(self):
+    # pylint: disable=protected-access
+    return directory_cache._stat_counter._total
+
+  def path(self, *parts):
+    return os.path.join(self.d.path, *parts)
+
+  def set_mtime(self, path, mtime):
+    os.utime(path, (mtime, mtime))
+
+  def test_lookup(self):
+    cache = directory_cache.DirectoryCache()
+    self.assertTrue(cache.isdir(self.path("pkg")))
+    self.assertTrue(cache.exists(self.path("pkg")))
+    self.assertFalse(cache.isfile(self.path("pkg")))
+    self.assertTrue(cache.isfile(self.path("pkg", "foo.pyi")))
+    self.assertFalse(cache.isdir(self.path("pkg", "foo.pyi")))
+    self.assertFalse(cache.exists(self.path("pkg", "bar.pyi")))
+    self.assertFalse(cache.exists(self.path("nonexistent", "foo.pyi")))
+
+  def test_list_once(self):
+    cache = directory_cache.DirectoryCache()
+    cache.isfile(self.path("pkg", "foo.pyi"))
+    count = self.stat_count()
+    for name in ("foo.pyi", "bar.pyi", "__init__.pyi", "baz"):
+      cache.exists(self.path("pkg", name))
+    self.assertEqual(self.stat_count(), count)
+
+  def test_save_and_load(self):
+    self.set_mtime(self.path("pkg"), os.path.getmtime(self.path("pkg")) - 10)
+    cache = directory_cache.DirectoryCache(self.cache_file)
+    cache.isfile(self.path("pkg", "foo.pyi"))
+    cache.save()
+    count = self.stat_count()
+    cache = directory_cache.DirectoryCache(self.cache_file).load()
+    self.assertTrue(cache.isfile(self.path("pkg", "foo.pyi")))
+    # Only the directory's mtime was checked.
+    self.assertEqual(self.stat_count(), count + 1)
+
+  def test_stale_listing(self):
+    cache = directory_cache.DirectoryCache(self.cache_file)
+    self.assertFalse(cache.exists(self.path("pkg", "bar.pyi")))
+    cache.save()
+    self.d.create_file("pkg/bar.pyi")
+    self.set_mtime(self.path("pkg"), os.path.getmtime(self.path("pkg")) + 10)
+    cache = directory_cache.DirectoryCache(self.cache_file).load()
+    self.assertTrue(cache.isfile(self.path("pkg", "bar.pyi")))
+
+  def test_change_in_same_tick(self):
+    mtime = os.path.getmtime(self.path("pkg"))
+    cache = directory_cache.DirectoryCache(self.cache_file)
+    self.assertFalse(cache.exists(self.path("pkg", "bar.pyi")))
+    cache.save()
+    # The directory changes so soon after it was listed that its mtime stays
+    # the same.
+    self.d.create_file("pkg/bar.pyi")
+    self.set_mtime(self.path("pkg"), mtime)
+    cache = directory_cache.DirectoryCache(self.cache_file).load()
+    self.assertTrue(cache.isfile(self.path("pkg", "bar.pyi")))
+
+  def test_load_bad_file(self):
+    cache_file = self.d.create_file("directory_cache", "[42]")
+    cache = directory_cache.DirectoryCache(cache_file).load()
+    self.assertTrue(cache.isdir(self.path("pkg")))
+
+
+if __name__ == "__main__":
+  unittest.main()
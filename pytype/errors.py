@@ -312,6 +312,20 @@ class Error(object):
       text += "\n" + self._traceback
     return text
 
+  def as_dict(self):
+    """Return the error as a JSON-serializable dict."""
+    return {
+        "filename": self._filename,
+        "lineno": self._lineno,
+        "name": self._name,
+        "severity": ("error" if self._severity == SEVERITY_ERROR
+                     else "warning"),
+        "message": self._message,
+        "details": self._details,
+        "methodname": self._methodname,
+        "traceback": self._traceback,
+    }
+
   def drop_traceback(self):
     with _CURRENT_ERROR_NAME.bind(self._name):
       return self.__class__(
@@ -324,6 +338,20 @@ class Error(object):
           keyword=self._keyword,
           traceback=None)
 
+  def drop_bad_call(self):
+    """Copy this error without its bad call, so that it can be pickled."""
+    with _CURRENT_ERROR_NAME.bind(self._name):
+      return self.__class__(
+          severity=self._severity,
+          message=self._message,
+          filename=self._filename,
+          lineno=self._lineno,
+          methodname=self._methodname,
+          details=self._details,
+          traceback=self._traceback,
+          keyword=self._keyword,
+          keyword_context=self._keyword_context)
+
 
 class ErrorLogBase(object):
   """A stream of errors."""
@@ -374,6 +402,11 @@ class ErrorLogBase(object):
         _log.debug(debug.stack_trace(limit=1).rstrip())
       self._errors.append(error)
 
+  def extend(self, errors):
+    """Add errors that were created earlier, e.g. for a function summary."""
+    for error in errors:
+      self._add(error)
+
   def warn(self, stack, message, *args):
     self._add(Error.with_stack(stack, SEVERITY_WARNING, message % args))
 
@@ -102,6 +102,33 @@ def cd(path):
     os.chdir(curdir)
 
 
+@contextlib.contextmanager
+def replace_atomically(filename):
+  """Context manager. Write a temporary file, and rename it to filename.
+
+  Concurrent readers of filename never see a partial file. If writing or
+  renaming fails, the temporary file is removed.
+
+  Example usage:
+    with replace_atomically("/path/file") as tmp:
+      with open(tmp, "w") as f:
+        ...
+
+  Arguments:
+    filename: The file to write.
+  Yields:
+    The name of the temporary file, in the same directory as filename.
+  """
+  fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)))
+  os.close(fd)
+  try:
+    yield tmp
+    os.rename(tmp, filename)
+  finally:
+    if os.path.exists(tmp):
+      os.remove(tmp)
+
+
 def is_pyi_directory_init(filename):
   """Checks if a pyi file is path/to/dir/__init__.pyi."""
   if filename is None:
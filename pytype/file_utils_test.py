@@ -71,6 +71,30 @@ class FileUtilsTest(unittest.TestCase):
     with file_utils.cd(""):
       self.assertEqual(os.getcwd(), d)
 
+  def testReplaceAtomically(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo", "old")
+      with file_utils.replace_atomically(filename) as tmp:
+        with open(tmp, "w") as f:
+          f.write("new")
+        with open(filename) as f:
+          self.assertEqual(f.read(), "old")
+      with open(filename) as f:
+        self.assertEqual(f.read(), "new")
+      self.assertEqual(os.listdir(d.path), ["foo"])
+
+  def testReplaceAtomicallyFailure(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo", "old")
+      with self.assertRaises(IOError):
+        with file_utils.replace_atomically(filename) as tmp:
+          with open(tmp, "w") as f:
+            f.write("new")
+          raise IOError()
+      with open(filename) as f:
+        self.assertEqual(f.read(), "old")
+      self.assertEqual(os.listdir(d.path), ["foo"])
+
 
 class TestPathExpansion(unittest.TestCase):
   """Tests for file_utils.expand_path(s?)."""
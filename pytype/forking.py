@@ -0,0 +1,115 @@
+"""Run work in child processes that are forked from the current one.
+
+A forked child starts with a copy-on-write copy of its parent's memory, so it
+can continue from any state the parent built up, e.g. a VM that has run a
+module's top-level code, without that state having to be pickled. Only the
+children's results are pickled and sent back. Needs os.fork, i.e. a POSIX
+system.
+"""
+
+import logging
+import os
+import signal
+import sys
+import tempfile
+import traceback
+
+from six.moves import cPickle
+
+
+log = logging.getLogger(__name__)
+
+
+def can_fork():
+  return hasattr(os, "fork")
+
+
+def partition(items, num_partitions):
+  """Split items into num_partitions lists of about the same length.
+
+  The items are dealt out round-robin, so that e.g. neighbouring definitions in
+  a sorted list, which tend to be similarly expensive, end up in different
+  partitions.
+
+  Args:
+    items: A sequence.
+    num_partitions: The number of partitions.
+
+  Returns:
+    A list of num_partitions lists, some of which may be empty.
+  """
+  return [list(items[i::num_partitions]) for i in range(num_partitions)]
+
+
+def _run_child(fn, arg, result_file):
+  """Run fn(arg) and write the pickled result to result_file. Never returns."""
+  status = 1
+  try:
+    result = fn(arg)
+    with open(result_file, "wb") as f:
+      cPickle.dump(result, f, protocol=cPickle.HIGHEST_PROTOCOL)
+    status = 0
+  except Exception:  # pylint: disable=broad-except
+    log.error("Uncaught exception in forked child:\n%s",
+              traceback.format_exc())
+  finally:
+    # Skip the parent's cleanup handlers, which would e.g. flush its buffers a
+    # second time.
+    os._exit(status)  # pylint: disable=protected-access
+
+
+def _read_result(result_file):
+  try:
+    with open(result_file, "rb") as f:
+      return cPickle.load(f)
+  except (IOError, OSError, EOFError, cPickle.UnpicklingError) as e:
+    log.error("Could not read the result of a forked child: %s", e)
+    return None
+  finally:
+    os.remove(result_file)
+
+
+def map_forked(fn, args):
+  """Run fn on each of args in a child process, all at the same time.
+
+  Args:
+    fn: A function of one argument whose result can be pickled.
+    args: The arguments.
+
+  Returns:
+    A list of the results, in the order of args, with None for each child that
+    failed.
+  """
+  # Flush now, so that the children don't print the parent's buffered output.
+  sys.stdout.flush()
+  sys.stderr.flush()
+  children = []
+  results = []
+  num_reaped = 0
+  try:
+    for arg in args:
+      fd, result_file = tempfile.mkstemp(prefix="pytype-fork-")
+      os.close(fd)
+      pid = os.fork()
+      if not pid:
+        _run_child(fn, arg, result_file)
+      children.append((pid, result_file))
+    for pid, result_file in children:
+      _, status = os.waitpid(pid, 0)
+      num_reaped += 1
+      if status:
+        log.error("Forked child %d failed with status %d", pid, status)
+        os.remove(result_file)
+        results.append(None)
+      else:
+        results.append(_read_result(result_file))
+  finally:
+    # If we were interrupted, e.g. by the --timeout alarm, don't leave the
+    # remaining children running.
+    for pid, _ in children[num_reaped:]:
+      os.kill(pid, signal.SIGKILL)
+      os.waitpid(pid, 0)
+    for _, result_file in children[len(results):]:
+      if os.path.exists(result_file):
+        os.remove(result_file)
+  return results
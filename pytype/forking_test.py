@@ -0,0 +1,80 @@
+"""Tests for forking.py."""
+
+import os
+import signal
+import time
+
+from pytype import file_utils
+from pytype import forking
+
+import unittest
+
+
+class PartitionTest(unittest.TestCase):
+  """Test splitting work into partitions."""
+
+  def test_round_robin(self):
+    self.assertEqual(forking.partition(["a", "b", "c", "d", "e"], 2),
+                     [["a", "c", "e"], ["b", "d"]])
+
+  def test_more_partitions_than_items(self):
+    self.assertEqual(forking.partition(["a"], 3), [["a"], [], []])
+
+
+@unittest.skipUnless(forking.can_fork(), "needs os.fork")
+class MapForkedTest(unittest.TestCase):
+  """Test running functions in forked children."""
+
+  def test_results(self):
+    state = {"x": 10}  # Built before forking, so the children can see it.
+    self.assertEqual(forking.map_forked(lambda n: state["x"] + n, [1, 2, 3]),
+                     [11, 12, 13])
+
+  def test_isolation(self):
+    state = []
+    forking.map_forked(state.append, [1, 2])
+    self.assertEqual(state, [])
+
+  def test_child_pid(self):
+    pids = forking.map_forked(lambda _: os.getpid(), [None, None])
+    self.assertNotIn(os.getpid(), pids)
+    self.assertEqual(len(set(pids)), 2)
+
+  def test_failure(self):
+    def fn(n):
+      if n == 2:
+        raise ValueError()
+      return n
+    self.assertEqual(forking.map_forked(fn, [1, 2, 3]), [1, None, 3])
+
+  def test_unpicklable_result(self):
+    self.assertEqual(forking.map_forked(lambda _: lambda: None, [1]), [None])
+
+  def test_interrupted(self):
+    def handler(signum, frame):
+      del signum, frame  # unused
+      raise KeyboardInterrupt()
+    def fn(filename):
+      with open(filename, "w") as f:
+        f.write(str(os.getpid()))
+      time.sleep(10)
+    old_handler = signal.signal(signal.SIGALRM, handler)
+    try:
+      with file_utils.Tempdir() as d:
+        filenames = [os.path.join(d.path, name) for name in ("a", "b")]
+        signal.alarm(1)
+        self.assertRaises(KeyboardInterrupt, forking.map_forked, fn, filenames)
+        pids = []
+        for filename in filenames:
+          with open(filename) as f:
+            pids.append(int(f.read()))
+    finally:
+      signal.alarm(0)
+      signal.signal(signal.SIGALRM, old_handler)
+    # The children were killed and reaped.
+    for pid in pids:
+      self.assertRaises(OSError, os.kill, pid, 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,363 @@
+"""A cache of function call summaries that persists across runs.
+
+When a module is checked again, e.g. by the next CI run, most of its functions
+are unchanged, and so are the types they are called with. For such calls, we
+can reuse the return value and the errors of the previous run instead of
+interpreting the function body again.
+
+Only calls whose result is fully determined by their key are summarized: the
+key is a hash of the function's bytecode, the types of its arguments, the types
+of the module-level values it references and the builtins stubs. The argument,
+global and return values must be Any, instances of builtin classes without type
+parameters, or simple constants, so everything that the body can reach is
+described by the builtins: it can call builtins and the methods of such
+values, and build and fill its own containers. It must not store attributes or
+globals, import, define functions or classes, or yield.
+
+Calls of the module's own functions aren't summarized, since a function value
+isn't part of a key: replaying the caller would skip the callee's call, which
+adds to the callee's call records, and so to its inferred signature.
+
+A replayed return value has no origins in the function body, which loses the
+path sensitivity of the interpreted call for callers that branch on it.
+"""
+
+import collections
+import hashlib
+import logging
+
+from pytype import __version__
+from pytype import abstract
+from pytype import abstract_utils
+from pytype import file_utils
+from pytype import metrics
+from pytype import state
+from pytype.pytd import pytd_utils
+from pytype.pytd import typeshed
+
+import six
+from six.moves import cPickle
+
+
+log = logging.getLogger(__name__)
+
+# Hits, misses and calls that can't be summarized, for --metrics. The hit rate
+# is hit / (hit + miss).
+_summary_counter = metrics.MapCounter("function_summary_cache")
+
+# The maximum number of summaries that are kept. The least recently used ones
+# are dropped first.
+MAX_ENTRIES = 20000
+
+# Options that change what a call returns or which errors it reports.
+_KEY_OPTIONS = (
+    "check",
+    "precise_return",
+    "protocols",
+    "python_version",
+    "quick",
+    "strict_import",
+    "typeshed",
+)
+
+# Opcodes with side effects that a summary doesn't capture, or that run code
+# that isn't covered by the key.
+_UNSUPPORTED_OPCODE_PREFIXES = (
+    "BEFORE_ASYNC_WITH",
+    "BUILD_CLASS",
+    "DELETE_",
+    "EXEC_STMT",
+    "GET_AITER",
+    "GET_ANEXT",
+    "GET_AWAITABLE",
+    "GET_YIELD_FROM_ITER",
+    "IMPORT_",
+    "LOAD_BUILD_CLASS",
+    "LOAD_CLASSDEREF",
+    "LOAD_LOCALS",
+    "LOAD_NAME",
+    "MAKE_",
+    "PRINT_",
+    "SETUP_ANNOTATIONS",
+    "SETUP_ASYNC_WITH",
+    "SETUP_WITH",
+    "STORE_",
+    "WITH_CLEANUP",
+    "YIELD_",
+)
+
+# STORE_FAST only writes the frame's own locals. STORE_SUBSCR can only change
+# the type parameters of a container, and the values in a key have none, so it
+# only fills containers that the body built.
+_SUPPORTED_STORES = ("STORE_FAST", "STORE_SUBSCR")
+
+# The types of the constants that can be part of a key or a summary.
+_CONSTANT_TYPES = six.integer_types + (
+    bool, float, complex, bytes, six.text_type, str, type(None))
+
+_BUILTIN_MODULES = ("__builtin__", "typing")
+
+# An error that a call added to the errorlog. It has the attributes that
+# ErrorLogBase.copy_from reads, so it can be replayed with a new stack.
+_ErrorSummary = collections.namedtuple(
+    "_ErrorSummary", ["name", "message", "details", "keyword",
+                      "keyword_context", "bad_call", "lineno"])
+
+
+def _is_supported_opcode(op):
+  name = op.__class__.__name__
+  if name in _SUPPORTED_STORES:
+    return True
+  return not (op.type_comment or name.startswith(_UNSUPPORTED_OPCODE_PREFIXES))
+
+
+def _hash_code(code):
+  """Hash a code object's bytecode, or return None if it can't be summarized."""
+  if code.co_freevars or code.co_cellvars:
+    return None
+  if not all(_is_supported_opcode(op) for op in code.co_code):
+    return None
+  h = hashlib.sha256()
+  for field in (code.co_filename, code.co_name, code.co_argcount,
+                getattr(code, "co_kwonlyargcount", 0), code.co_flags,
+                code.co_varnames):
+    h.update(repr(field).encode("utf-8"))
+  for op in code.co_code:
+    h.update(str(op).encode("utf-8"))
+  return h.hexdigest()
+
+
+def _options_key(options):
+  """Hash the options and the builtins that summaries depend on."""
+  h = hashlib.sha256()
+  h.update(repr([__version__.__version__] +
+                [getattr(options, name, None) for name in _KEY_OPTIONS]
+               ).encode("utf-8"))
+  # Summaries only contain instances of builtin classes, but what the calls
+  # return and report depends on the stubs of those classes.
+  for module in _BUILTIN_MODULES:
+    source_hash = typeshed.source_hash(module, options.python_version)
+    h.update(repr((module, source_hash)).encode("utf-8"))
+  if options.precompiled_builtins:
+    try:
+      with open(options.precompiled_builtins, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+          h.update(chunk)
+    except IOError:
+      h.update(b"<missing>")
+  return h.hexdigest()
+
+
+def _error_summary(error):
+  """Describe an error so that it can be replayed, or return None."""
+  fields = error.as_dict()
+  # Summarized code can't warn, and ErrorLogBase.copy_from only adds errors.
+  if fields["severity"] != "error":
+    return None
+  return _ErrorSummary(
+      fields["name"], fields["message"], fields["details"], error.keyword,
+      error.keyword_context, None, fields["lineno"])
+
+
+def _callee_frame(code, lineno):
+  """A placeholder for the frame of a replayed call, at the given line."""
+  opcode = next((op for op in code.co_code if op.line == lineno), None)
+  frame = state.SimpleFrame(opcode)
+  # Like the frame of an interpreted call, so that Error.with_stack gives the
+  # replayed error the same traceback.
+  frame.f_code = code
+  return frame
+
+
+def _value_summary(value):
+  """Describe an abstract value in a way that is stable across runs.
+
+  Args:
+    value: An abstract value.
+
+  Returns:
+    A tuple of a kind and an argument, or None if the value can't be part of a
+    summary.
+  """
+  if isinstance(value, abstract.Unsolvable):
+    return ("any", None)
+  if type(value) is abstract.AbstractOrConcreteValue:  # pylint: disable=unidiomatic-typecheck
+    if type(value.pyval) in _CONSTANT_TYPES:
+      return ("constant", value.pyval)
+    return None
+  if (type(value) is abstract.Instance and  # pylint: disable=unidiomatic-typecheck
+      isinstance(value.cls, abstract.PyTDClass) and
+      not value.cls.pytd_cls.template and not value.members):
+    name = value.cls.pytd_cls.name
+    if name.split(".", 1)[0] in _BUILTIN_MODULES:
+      return ("instance", name)
+  return None
+
+
+def _variable_summary(var):
+  summaries = set()
+  for value in var.data:
+    summary = _value_summary(value)
+    if summary is None:
+      return None
+    summaries.add((summary[0], type(summary[1]).__name__, summary[1]))
+  return tuple(sorted(summaries, key=repr))
+
+
+class SummaryCache(object):
+  """Stores the return values and the errors of function calls.
+
+  Attributes:
+    filename: The file that the summaries are loaded from and saved to.
+  """
+
+  def __init__(self, filename, vm=None, max_entries=MAX_ENTRIES):
+    self.filename = filename
+    self._vm = vm
+    self._max_entries = max_entries
+    # key -> (stamp, return values, errors). The stamp is the number of the
+    # run that last used the summary.
+    self._entries = {}
+    self._stamp = 1
+    self._dirty = False
+    # code -> hash of the code, or None if it can't be summarized
+    self._code_hashes = {}
+    self._options_key = vm and _options_key(vm.options)
+
+  def _read(self):
+    try:
+      stamp, entries = pytd_utils.LoadPickle(self.filename, compress=True)
+    except (IOError, OSError, EOFError, ValueError, TypeError,
+            AttributeError, ImportError, cPickle.UnpicklingError) as e:
+      log.info("Not using function summaries from %s: %s", self.filename, e)
+      return 0, {}
+    return stamp, entries
+
+  def load(self):
+    """Load the summaries from self.filename, if it exists."""
+    stamp, self._entries = self._read()
+    self._stamp = stamp + 1
+    self._dirty = False
+    return self
+
+  def save(self):
+    """Save the most recently used summaries, up to the maximum number."""
+    if not self.filename or not self._dirty:
+      return
+    # Keep the summaries that concurrent runs saved in the meantime.
+    stamp, entries = self._read()
+    entries.update(self._entries)
+    if len(entries) > self._max_entries:
+      keys = sorted(entries, key=lambda k: entries[k][0], reverse=True)
+      entries = {k: entries[k] for k in keys[:self._max_entries]}
+    try:
+      with file_utils.replace_atomically(self.filename) as tmp:
+        pytd_utils.SavePickle((max(stamp, self._stamp), entries), tmp,
+                              compress=True)
+    except (IOError, OSError) as e:
+      log.warning("Could not write function summaries %s: %s",
+                  self.filename, e)
+    self._entries = entries
+    self._dirty = False
+
+  def get(self, key):
+    """Get the (return values, errors) summary for a key, or None."""
+    entry = self._entries.get(key)
+    if entry is None:
+      _summary_counter.inc("miss")
+      return None
+    _summary_counter.inc("hit")
+    if entry[0] != self._stamp:
+      self._entries[key] = (self._stamp,) + entry[1:]
+      self._dirty = True
+    return entry[1:]
+
+  def put(self, key, values, errors):
+    self._entries[key] = (self._stamp, values, errors)
+    self._dirty = True
+
+  def get_key(self, func, callargs, frame):
+    """Compute the key of a call of an InterpreterFunction.
+
+    Args:
+      func: The abstract.InterpreterFunction.
+      callargs: The arguments, a dict from name to cfg.Variable.
+      frame: The frame that the call would run in.
+
+    Returns:
+      The key, or None if the call can't be summarized.
+    """
+    if func.closure or frame.allowed_returns is not None:
+      _summary_counter.inc("unsupported")
+      return None
+    code = func.code
+    if code not in self._code_hashes:
+      self._code_hashes[code] = _hash_code(code)
+    code_hash = self._code_hashes[code]
+    if code_hash is None:
+      _summary_counter.inc("unsupported")
+      return None
+    f_globals = frame.f_globals.members
+    variables = [("arg", name, callargs[name]) for name in sorted(callargs)]
+    variables.extend(("global", name, f_globals[name])
+                     for name in sorted(code.co_names) if name in f_globals)
+    parts = [self._options_key, code_hash]
+    for kind, name, var in variables:
+      summary = _variable_summary(var)
+      if summary is None:
+        _summary_counter.inc("unsupported")
+        return None
+      parts.append((kind, name, summary))
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+  def replay(self, key, code, node):
+    """Replay the summary of a call.
+
+    The errors are added as if the call had run on top of the current stack.
+
+    Args:
+      key: The key of the call.
+      code: The code of the called function.
+      node: The node of the call.
+
+    Returns:
+      The return value of the call, or None if there is no summary.
+    """
+    summary = self.get(key)
+    if summary is None:
+      return None
+    values, errors = summary
+    convert = self._vm.convert
+    ret = self._vm.program.NewVariable()
+    for kind, _, arg in values:
+      if kind == "any":
+        value = convert.unsolvable
+      elif kind == "constant":
+        value = convert.constant_to_value(arg, {}, node)
+      else:
+        value = convert.constant_to_value(
+            abstract_utils.AsInstance(self._vm.lookup_builtin(arg)), {}, node)
+      ret.AddBinding(value, [], node)
+    for error in errors:
+      stack = self._vm.frames + [_callee_frame(code, error.lineno)]
+      self._vm.errorlog.copy_from([error], stack)
+    return ret
+
+  def record(self, key, ret, errors):
+    """Record the summary of an interpreted call.
+
+    Args:
+      key: The key of the call.
+      ret: The return value, a cfg.Variable.
+      errors: The errors that the call added to the errorlog.
+    """
+    values = _variable_summary(ret)
+    if values is None:
+      return
+    error_summaries = []
+    for error in errors:
+      error_summary = _error_summary(error)
+      if error_summary is None:
+        return
+      error_summaries.append(error_summary)
+    self.put(key, values, error_summaries)
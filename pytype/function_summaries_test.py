@@ -0,0 +1,174 @@
+"""Tests for function_summaries.py."""
+
+import os
+
+from pytype import errors
+from pytype import function_summaries
+from pytype import metrics
+from pytype import state
+from pytype.pyc import opcodes
+from pytype.tests import test_utils
+
+import unittest
+
+
+class FakeCode(object):
+  """A fake code object with the attributes that are hashed."""
+
+  def __init__(self, ops, co_freevars=()):
+    self.co_code = ops
+    self.co_filename = "foo.py"
+    self.co_name = "f"
+    self.co_argcount = 1
+    self.co_flags = 0
+    self.co_varnames = ("x",)
+    self.co_freevars = co_freevars
+    self.co_cellvars = ()
+    for op in ops:
+      op.code = self
+
+  def get_arg_count(self):
+    return self.co_argcount
+
+
+class SummaryCacheTest(test_utils.TempdirMixin, unittest.TestCase):
+  """Test storing and loading summaries."""
+
+  def setUp(self):
+    super(SummaryCacheTest, self).setUp()
+    self.filename = os.path.join(self.d.path, "summaries")
+    metrics._prepare_for_test()  # pylint: disable=protected-access
+    function_summaries._summary_counter._reset()  # pylint: disable=protected-access
+
+  def tearDown(self):
+    super(SummaryCacheTest, self).tearDown()
+    metrics._prepare_for_test(enabled=False)  # pylint: disable=protected-access
+
+  def counts(self):
+    # pylint: disable=protected-access
+    return function_summaries._summary_counter._counts
+
+  def new_cache(self, max_entries=function_summaries.MAX_ENTRIES):
+    return function_summaries.SummaryCache(
+        self.filename, max_entries=max_entries).load()
+
+  def test_save_and_load(self):
+    error = errors.Error.for_test(errors.SEVERITY_ERROR, "oops", "name-error",
+                                  filename="foo.py", lineno=3)
+    cache = self.new_cache()
+    cache.put("k", (("instance", "str", "__builtin__.int"),), [error])
+    cache.save()
+    values, loaded_errors = self.new_cache().get("k")
+    self.assertEqual(values, (("instance", "str", "__builtin__.int"),))
+    self.assertEqual([str(e) for e in loaded_errors], [str(error)])
+    self.assertEqual(self.counts(), {"hit": 1})
+
+  def test_miss(self):
+    self.assertIsNone(self.new_cache().get("k"))
+    self.assertEqual(self.counts(), {"miss": 1})
+
+  def test_bad_file(self):
+    with open(self.filename, "w") as f:
+      f.write("garbage")
+    self.assertIsNone(self.new_cache().get("k"))
+
+  def test_budget(self):
+    cache = self.new_cache(max_entries=2)
+    cache.put("old", (), [])
+    cache.put("used", (), [])
+    cache.save()
+    # A second run uses one summary and adds another one.
+    cache = self.new_cache(max_entries=2)
+    cache.get("used")
+    cache.put("new", (), [])
+    cache.save()
+    cache = self.new_cache(max_entries=2)
+    self.assertIsNone(cache.get("old"))
+    self.assertIsNotNone(cache.get("used"))
+    self.assertIsNotNone(cache.get("new"))
+
+  def test_concurrent_runs(self):
+    cache1 = self.new_cache()
+    cache2 = self.new_cache()
+    cache1.put("k1", (), [])
+    cache1.save()
+    cache2.put("k2", (), [])
+    cache2.save()
+    cache = self.new_cache()
+    self.assertIsNotNone(cache.get("k1"))
+    self.assertIsNotNone(cache.get("k2"))
+
+
+class ReplayErrorTest(unittest.TestCase):
+  """Test replaying the errors of a summarized call."""
+
+  def test_replay(self):
+    caller = FakeCode([opcodes.CALL_FUNCTION(0, 10, 1, 1)])
+    caller.co_name = "g"
+    callee = FakeCode([opcodes.LOAD_FAST(0, 2, 0, 0), opcodes.BINARY_ADD(1, 3)])
+    error = errors.Error.for_test(
+        errors.SEVERITY_ERROR, "oops", "unsupported-operands", details="more",
+        filename="foo.py", lineno=3, methodname="f")
+    # pylint: disable=protected-access
+    summary = function_summaries._error_summary(error)
+    stack = [state.SimpleFrame(caller.co_code[0]),
+             function_summaries._callee_frame(callee, summary.lineno)]
+    # pylint: enable=protected-access
+    errorlog = errors.ErrorLog()
+    errorlog.copy_from([summary], stack)
+    self.assertEqual([str(e) for e in errorlog], [
+        "File \"foo.py\", line 3, in f: oops [unsupported-operands]\n"
+        "  more\n"
+        "Called from (traceback):\n"
+        "  line 10, in g"])
+
+  def test_warning(self):
+    warning = errors.Error.for_test(errors.SEVERITY_WARNING, "oops",
+                                    "bad-function-defaults")
+    self.assertIsNone(function_summaries._error_summary(warning))  # pylint: disable=protected-access
+
+
+class HashCodeTest(unittest.TestCase):
+  """Test which code can be summarized."""
+
+  def hash_code(self, *op_classes, **kwargs):
+    ops = []
+    for i, op_class in enumerate(op_classes):
+      if op_class.has_arg():
+        ops.append(op_class(i, 1, 0, 0))
+      else:
+        ops.append(op_class(i, 1))
+    return function_summaries._hash_code(FakeCode(ops, **kwargs))  # pylint: disable=protected-access
+
+  def test_simple(self):
+    h = self.hash_code(opcodes.LOAD_FAST, opcodes.BINARY_ADD,
+                       opcodes.STORE_FAST, opcodes.RETURN_VALUE)
+    self.assertIsNotNone(h)
+    self.assertEqual(h, self.hash_code(
+        opcodes.LOAD_FAST, opcodes.BINARY_ADD, opcodes.STORE_FAST,
+        opcodes.RETURN_VALUE))
+    self.assertNotEqual(h, self.hash_code(
+        opcodes.LOAD_FAST, opcodes.BINARY_SUBTRACT, opcodes.STORE_FAST,
+        opcodes.RETURN_VALUE))
+
+  def test_side_effects(self):
+    for op_class in (opcodes.STORE_ATTR, opcodes.STORE_GLOBAL,
+                     opcodes.DELETE_SUBSCR, opcodes.IMPORT_NAME,
+                     opcodes.YIELD_VALUE, opcodes.MAKE_FUNCTION):
+      self.assertIsNone(self.hash_code(opcodes.LOAD_FAST, op_class,
+                                       opcodes.RETURN_VALUE), op_class)
+
+  def test_calls(self):
+    for op_class in (opcodes.CALL_FUNCTION, opcodes.CALL_METHOD,
+                     opcodes.INPLACE_ADD, opcodes.STORE_SUBSCR,
+                     opcodes.LIST_APPEND):
+      self.assertIsNotNone(self.hash_code(opcodes.LOAD_FAST, op_class,
+                                          opcodes.RETURN_VALUE), op_class)
+
+  def test_closure(self):
+    self.assertIsNone(self.hash_code(opcodes.LOAD_FAST, opcodes.RETURN_VALUE,
+                                     co_freevars=("y",)))
+
+
+if __name__ == "__main__":
+  unittest.main()
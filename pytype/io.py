@@ -15,6 +15,8 @@ from pytype import config
 from pytype import directors
 from pytype import errors
 from pytype import load_pytd
+from pytype import metrics
+from pytype import result_cache
 from pytype import utils
 from pytype.pyc import pyc
 from pytype.pyi import parser
@@ -29,6 +31,8 @@ import six
 
 log = logging.getLogger(__name__)
 
+_optimize_timer = metrics.ReentrantStopWatch("optimize_time")
+
 
 # Webpage explaining the pytype error codes
 ERROR_DOC_URL = "https://google.github.io/pytype/errors.html"
@@ -112,13 +116,14 @@ def generate_pyi(input_filename, options=None, loader=None):
     errorlog, (mod, builtins) = _call(
         analyze.infer_types, input_filename, options, loader)
     mod.Visit(visitors.VerifyVisitor())
-    mod = optimize.Optimize(mod,
-                            builtins,
-                            # TODO(kramm): Add FLAGs for these
-                            lossy=False,
-                            use_abcs=False,
-                            max_union=7,
-                            remove_mutable=False)
+    with _optimize_timer:
+      mod = optimize.Optimize(mod,
+                              builtins,
+                              # TODO(kramm): Add FLAGs for these
+                              lossy=False,
+                              use_abcs=False,
+                              max_union=7,
+                              remove_mutable=False)
     mod = pytd_utils.CanonicalOrdering(mod, sort_signatures=True)
     result = pytd_utils.Print(mod)
     log.info("=========== pyi optimized =============")
@@ -180,10 +185,25 @@ def check_or_generate_pyi(options, loader=None):
   return (errorlog, None, None) if options.check else (errorlog, result, ast)
 
 
+def _is_unchanged(filename, contents):
+  """Whether the file already has the given contents."""
+  mode = "rb" if isinstance(contents, bytes) else "r"
+  try:
+    with open(filename, mode) as fi:
+      return fi.read() == contents
+  except IOError:
+    return False
+
+
 def _write_pyi_output(options, contents, filename):
   assert filename
   if filename == "-":
     sys.stdout.write(contents)
+  elif not options.rewrite_unchanged and _is_unchanged(filename, contents):
+    # The output is canonically ordered, so identical contents mean that the
+    # module's interface did not change. Leaving the file alone preserves its
+    # mtime, which lets build systems skip rebuilding dependents.
+    log.info("pyi %r unchanged => %r", options.input, filename)
   else:
     log.info("write pyi %r => %r", options.input, filename)
     with open(filename, "w") as fi:
@@ -191,23 +211,30 @@ def _write_pyi_output(options, contents, filename):
 
 
 @_set_verbosity_from(posarg=0)
-def process_one_file(options):
-  """Check a .py file or generate a .pyi for it, according to options.
+def check_and_write_outputs(options):
+  """Check a .py file or generate a .pyi for it, and write the outputs.
+
+  Unlike process_one_file, this leaves reporting the errors to the caller.
 
   Args:
     options: config.Options object.
 
   Returns:
-    An error code (0 means no error).
-  """
+    The errors.ErrorLog of the run.
 
-  log.info("Process %s => %s", options.input, options.output)
-  loader = load_pytd.create_loader(options)
-  try:
+  Raises:
+    utils.UsageError: If the options are invalid.
+  """
+  cache_key = options.result_cache and result_cache.compute_key(options)
+  cached = cache_key and result_cache.load(
+      options.result_cache, cache_key, options)
+  if cached:
+    errorlog, result, pickled = cached
+  else:
+    loader = load_pytd.create_loader(options)
     errorlog, result, ast = check_or_generate_pyi(options, loader)
-  except utils.UsageError as e:
-    logging.error("Usage error: %s\n", utils.message(e))
-    return 1
+    loader.directory_cache.save()
+    pickled = None
 
   if not options.check:
     if options.pickle_output:
@@ -220,7 +247,32 @@ def process_one_file(options):
     # Write out the pickle file.
     if options.pickle_output:
       log.info("write pickle %r => %r", options.input, options.output)
-      write_pickle(ast, options, loader)
+      if pickled is None:
+        # This verifies the pickle against the pyi that we just wrote.
+        pickled = _pickle_ast(ast, options, loader)
+      _write_pickled(pickled, options)
+  if cache_key and not cached:
+    result_cache.store(
+        options.result_cache, cache_key, options, errorlog, result, pickled)
+  return errorlog
+
+
+def process_one_file(options):
+  """Check a .py file or generate a .pyi for it, according to options.
+
+  Args:
+    options: config.Options object.
+
+  Returns:
+    An error code (0 means no error).
+  """
+
+  log.info("Process %s => %s", options.input, options.output)
+  try:
+    errorlog = check_and_write_outputs(options)
+  except utils.UsageError as e:
+    logging.error("Usage error: %s\n", utils.message(e))
+    return 1
   exit_status = handle_errors(errorlog, options)
 
   # If we have set return_success, set exit_status to 0 after the regular error
@@ -235,10 +287,8 @@ def process_one_file(options):
   return exit_status
 
 
-@_set_verbosity_from(posarg=1)
-def write_pickle(ast, options, loader=None):
-  """Dump a pickle of the ast to a file."""
-  loader = loader or load_pytd.create_loader(options)
+def _pickle_ast(ast, options, loader):
+  """Pickle the ast, after verifying it against options.verify_pickle."""
   try:
     ast = serialize_ast.PrepareForExport(options.module_name, ast, loader)
   except parser.ParseError as e:
@@ -256,7 +306,23 @@ def write_pickle(ast, options, loader=None):
     ast2 = ast2.Visit(visitors.ClearClassPointers())
     if not pytd_utils.ASTeq(ast1, ast2):
       raise AssertionError()
-  serialize_ast.StoreAst(ast, options.output)
+  return serialize_ast.StoreAst(ast)
+
+
+def _write_pickled(pickled, options):
+  if not options.rewrite_unchanged and _is_unchanged(options.output, pickled):
+    # Like _write_pyi_output: pickles of the same interface are identical.
+    log.info("pickle %r unchanged => %r", options.input, options.output)
+  else:
+    with open(options.output, "wb") as fi:
+      fi.write(pickled)
+
+
+@_set_verbosity_from(posarg=1)
+def write_pickle(ast, options, loader=None):
+  """Dump a pickle of the ast to a file."""
+  loader = loader or load_pytd.create_loader(options)
+  _write_pickled(_pickle_ast(ast, options, loader), options)
 
 
 def print_error_doc_url(errorlog):
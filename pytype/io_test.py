@@ -105,11 +105,34 @@ class IOTest(unittest.TestCase):
     self.assertIsNotNone(pyi_string)
     self.assertIsNotNone(pytd_ast)
 
+  def testProcessOneFileUnchangedOutput(self):
+    with self._tmpfile("x = 42") as f:
+      with self._tmpfile("") as out:
+        options = config.Options.create(
+            f.name, output=out.name, rewrite_unchanged=False)
+        io.process_one_file(options)
+        os.utime(out.name, (0, 0))
+        io.process_one_file(options)
+        self.assertEqual(os.path.getmtime(out.name), 0)
+        options.tweak(rewrite_unchanged=True)
+        io.process_one_file(options)
+        self.assertNotEqual(os.path.getmtime(out.name), 0)
+
   def testWritePickle(self):
     ast = pytd.TypeDeclUnit(None, (), (), (), (), ())
     options = config.Options.create(output="/dev/null")
     io.write_pickle(ast, options)  # just make sure we don't crash
 
+  def testWritePickleUnchanged(self):
+    ast = pytd.TypeDeclUnit(None, (), (), (), (), ())
+    with self._tmpfile("") as out:
+      options = config.Options.create(
+          output=out.name, rewrite_unchanged=False)
+      io.write_pickle(ast, options)
+      os.utime(out.name, (0, 0))
+      io.write_pickle(ast, options)
+      self.assertEqual(os.path.getmtime(out.name), 0)
+
 
 if __name__ == "__main__":
   unittest.main()
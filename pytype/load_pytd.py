@@ -4,8 +4,11 @@ import collections
 import logging
 import os
 
+from pytype import directory_cache as directory_cache_lib
 from pytype import file_utils
+from pytype import metrics
 from pytype import module_utils
+from pytype import pyi_cache
 from pytype import utils
 from pytype.pyi import parser
 from pytype.pytd import pytd
@@ -14,10 +17,14 @@ from pytype.pytd import serialize_ast
 from pytype.pytd import typeshed
 from pytype.pytd import visitors
 from pytype.pytd.parse import builtins
-from six.moves import cPickle
 
 log = logging.getLogger(__name__)
 
+# Time spent parsing and resolving pyi files, for --metrics.
+_load_timer = metrics.ReentrantStopWatch("load_pyi_time")
+# Time spent resolving references in pyi files to other modules' nodes.
+_resolve_timer = metrics.ReentrantStopWatch("resolve_pyi_time")
+
 
 LOADER_ATTR_TO_CONFIG_OPTION_MAP = {
     "base_module": "module_name",
@@ -25,16 +32,76 @@ LOADER_ATTR_TO_CONFIG_OPTION_MAP = {
     "pythonpath": "pythonpath",
     "imports_map": "imports_map",
     "use_typeshed": "typeshed",
+    "pyi_cache": "pyi_cache",
+    "directory_cache": "directory_cache",
 }
 
 
 PICKLE_EXT = ".pickled"
 
+# Modules with more top-level members than this are verified one member at a
+# time, when the member is first converted (see Loader.verify_member), instead
+# of all at once on import.
+LAZY_VERIFICATION_THRESHOLD = 500
+
 
 # Allow a file to be used as the designated default pyi for blacklisted files
 DEFAULT_PYI_PATH_SUFFIX = None
 
 
+# Parsed pyi files, shared across loaders. None (the default) disables the
+# cache; long-running processes such as the analyze_project daemon enable it so
+# that every job doesn't have to re-parse the same dependencies.
+_parsed_pyi_cache = None
+
+
+def enable_parsed_pyi_cache():
+  global _parsed_pyi_cache
+  if _parsed_pyi_cache is None:
+    _parsed_pyi_cache = {}
+
+
+def _parse_source(src, filename, module_name, python_version, cache_dir=None):
+  """Parse a pyi, reusing an earlier parse of the same contents if possible.
+
+  Args:
+    src: The contents of the pyi.
+    filename: The pyi's filename.
+    module_name: The module name to parse the pyi as.
+    python_version: The target Python version, as a tuple.
+    cache_dir: Optionally, the directory of an on-disk pyi_cache.
+
+  Returns:
+    The parsed pytd.TypeDeclUnit.
+  """
+  key = (filename, module_name, python_version)
+  if _parsed_pyi_cache is not None:
+    cached = _parsed_pyi_cache.get(key)
+    if cached and cached[0] == src:
+      # Parsing doesn't create any ClassType pointers, so the parsed ast can be
+      # safely shared: resolving it produces a new tree.
+      return cached[1]
+  ast = None
+  if cache_dir:
+    ast = pyi_cache.load(cache_dir, filename, module_name, python_version, src)
+  if ast is None:
+    ast = parser.parse_string(src, filename=filename, name=module_name,
+                              python_version=python_version)
+    if cache_dir:
+      pyi_cache.store(
+          cache_dir, filename, module_name, python_version, src, ast)
+  if _parsed_pyi_cache is not None:
+    _parsed_pyi_cache[key] = (src, ast)
+  return ast
+
+
+def _parse_file(filename, module_name, python_version, cache_dir=None):
+  """Parse a pyi file, reusing an earlier parse of the same contents."""
+  with open(filename, "r") as fi:
+    src = fi.read()
+  return _parse_source(src, filename, module_name, python_version, cache_dir)
+
+
 def is_pickle(filename):
   return os.path.splitext(filename)[1].startswith(PICKLE_EXT)
 
@@ -81,8 +148,8 @@ class Module(object):
       - "{filename}" for other pyi files.
     ast: The parsed PyTD. Internal references will be resolved, but
       NamedType nodes referencing other modules might still be unresolved.
-    pickle: The AST as a pickled string. As long as this field is not None, the
-      ast will be None.
+    pickle: The AST as a pickled string, or an _IndexedPickle to read it from.
+      As long as this field is not None, the ast will be None.
     dirty: The initial value of the dirty attribute.
   """
 
@@ -98,6 +165,96 @@ class Module(object):
     return bool(self.pickle)
 
 
+class _ConcatenatedModules(object):
+  """The definitions of all of a loader's modules, as one lookup table.
+
+  Modules are added to the table in place as they are loaded, instead of
+  copying every module's definitions into a new "<all>" pytd.TypeDeclUnit each
+  time. Lookup() works like pytd.TypeDeclUnit.Lookup(), and to_unit() builds
+  the unit only when it is asked for.
+  """
+
+  def __init__(self):
+    self.asts = {}  # module name -> ast
+    self._name2item = {}
+    self._unit = None
+
+  def includes(self, asts):
+    """Whether asts has the same ast for every module that was added."""
+    return all(asts.get(name) is ast for name, ast in self.asts.items())
+
+  def add(self, asts):
+    """Add the modules of a {module name: ast} dict that aren't included yet."""
+    for name, ast in sorted(asts.items()):
+      if name in self.asts:
+        continue
+      self.asts[name] = ast
+      for x in ast.type_params:
+        self._name2item[x.full_name] = x
+      for x in ast.constants + ast.functions + ast.classes + ast.aliases:
+        self._name2item[x.name] = x
+      self._unit = None
+
+  def Lookup(self, name):
+    return self._name2item[name]
+
+  def to_unit(self):
+    if self._unit is None:
+      self._unit = pytd_utils.Concat(
+          *(ast for _, ast in sorted(self.asts.items())), name="<all>")
+    return self._unit
+
+
+class _ModuleMap(object):
+  """A live, read-only {module name: ast} view of a loader's modules.
+
+  The visitors that resolve external and local references only look modules
+  up by name, so this index is maintained for the lifetime of the loader
+  instead of copying every loaded module into a new dict for each resolution.
+  Extra entries (e.g. "" for the module being resolved) are layered on top.
+  """
+
+  def __init__(self, modules, extra=None):
+    self._modules = modules
+    self._extra = extra or {}
+
+  def with_entries(self, **entries):
+    extra = dict(self._extra)
+    extra.update(entries)
+    return _ModuleMap(self._modules, extra)
+
+  def get(self, name, default=None):
+    if name in self._extra:
+      return self._extra[name]
+    module = self._modules.get(name)
+    if module is None or not module.ast:
+      return default
+    return module.ast
+
+  def __contains__(self, name):
+    return self.get(name) is not None
+
+  def __getitem__(self, name):
+    ast = self.get(name)
+    if ast is None:
+      raise KeyError(name)
+    return ast
+
+  def __setitem__(self, name, ast):
+    self._extra[name] = ast
+
+
+class _IndexedPickle(object):
+  """A module's pickle in a pytd_utils.IndexedPickles file, read on demand."""
+
+  def __init__(self, pickles, module_name):
+    self.pickles = pickles
+    self.module_name = module_name
+
+  def read(self):
+    return self.pickles.read(self.module_name)
+
+
 class BadDependencyError(Exception):
   """If we can't resolve a module referenced by the one we're trying to load."""
 
@@ -123,6 +280,10 @@ class Loader(object):
     pythonpath: The PYTHONPATH.
     imports_map: A short_path -> full_name mapping for imports.
     use_typeshed: Whether to use https://github.com/python/typeshed.
+    pyi_cache: Optionally, a directory for caching parsed pyi files.
+    directory_cache: A directory_cache.DirectoryCache of the listings of the
+      directories searched for modules. The constructor takes an optional
+      filename to load it from and save it to instead.
   """
 
   PREFIX = "pytd:"  # for pytd files that ship with pytype
@@ -133,12 +294,16 @@ class Loader(object):
                pythonpath=(),
                imports_map=None,
                use_typeshed=True,
-               modules=None):
-    self._modules = modules or self._base_modules(python_version)
-    if self._modules["__builtin__"].needs_unpickling():
-      self._unpickle_module(self._modules["__builtin__"])
-    if self._modules["typing"].needs_unpickling():
-      self._unpickle_module(self._modules["typing"])
+               modules=None,
+               pyi_cache=None,
+               directory_cache=None):
+    with _load_timer:
+      self._modules = modules or self._base_modules(python_version)
+      self._module_map = _ModuleMap(self._modules)
+      if self._modules["__builtin__"].needs_unpickling():
+        self._unpickle_module(self._modules["__builtin__"])
+      if self._modules["typing"].needs_unpickling():
+        self._unpickle_module(self._modules["typing"])
     self.builtins = self._modules["__builtin__"].ast
     self.typing = self._modules["typing"].ast
     self.base_module = base_module
@@ -146,7 +311,14 @@ class Loader(object):
     self.pythonpath = pythonpath
     self.imports_map = imports_map
     self.use_typeshed = use_typeshed
-    self._concatenated = None
+    self.pyi_cache = pyi_cache
+    self.directory_cache = directory_cache_lib.DirectoryCache(directory_cache)
+    if directory_cache:
+      self.directory_cache.load()
+    # module name -> {member name: verified member}, for the modules that are
+    # verified lazily
+    self._lazily_verified = {}
+    self._concatenated = _ConcatenatedModules()
     self._import_name_cache = {}  # performance cache
     self._aliases = {}
     self._prefixes = set()
@@ -154,19 +326,39 @@ class Loader(object):
     if imports_map is not None:
       assert pythonpath == [""], pythonpath
 
-  def save_to_pickle(self, filename):
-    """Save to a pickle. See PickledPyiLoader.load_from_pickle for reverse."""
+  def serialize_modules(self, exclude=()):
+    """Serialize the loaded modules.
+
+    This leaves the loader unusable, since serializing an ast clears its class
+    pointers.
+
+    Args:
+      exclude: The names of modules to skip.
+
+    Returns:
+      A sorted list of (name, serialized ast, dependencies) tuples.
+    """
     # We assume that the Loader is in a consistent state here. In particular, we
     # assume that for every module in _modules, all the transitive dependencies
     # have been loaded.
-    items = tuple((name, serialize_ast.StoreAst(module.ast))
-                  for name, module in sorted(self._modules.items()))
+    items = []
+    for name, module in sorted(self._modules.items()):
+      if name in exclude:
+        continue
+      deps = visitors.CollectDependencies()
+      module.ast.Visit(deps)
+      dependencies = sorted(d for d in deps.dependencies if d != name)
+      items.append((name, serialize_ast.StoreAst(module.ast), dependencies))
     # Preparing an ast for pickling clears its class pointers, making it
     # unsuitable for reuse, so we have to discard the builtins cache.
     builtins.InvalidateCache(self.python_version)
-    # Now pickle the pickles. We keep the "inner" modules as pickles as a
-    # performance optimization - unpickling is slow.
-    pytd_utils.SavePickle(items, filename, compress=True)
+    return items
+
+  def save_to_pickle(self, filename):
+    """Save to a pickle. See PickledPyiLoader.load_from_pickle for reverse."""
+    # We keep the modules as separate pickles, indexed by name, so that a
+    # loader unpickles only the modules that it uses - unpickling is slow.
+    pytd_utils.SaveIndexedPickles(self.serialize_modules(), filename)
 
   def _unpickle_module(self, module):
     raise NotImplementedError()  # overwritten in PickledPyiLoader
@@ -187,8 +379,8 @@ class Loader(object):
                                                    as_package=as_package)
     except IOError:
       return None
-    ast = parser.parse_string(src, filename=filename, name=module,
-                              python_version=self.python_version)
+    ast = _parse_source(src, filename, module, self.python_version,
+                        self.pyi_cache)
     assert ast.name == module
     return ast
 
@@ -208,7 +400,8 @@ class Loader(object):
     local_lookup = visitors.LookupLocalTypes()
     if ast:
       local_lookup.EnterTypeDeclUnit(ast)
-    pyval = pyval.Visit(local_lookup)
+    with _resolve_timer:
+      pyval = pyval.Visit(local_lookup)
     return pyval
 
   def _postprocess_pyi(self, pyval, ast):
@@ -231,15 +424,15 @@ class Loader(object):
 
   def load_file(self, module_name, filename, ast=None):
     """Load (or retrieve from cache) a module and resolve its dependencies."""
-    self._concatenated = None  # invalidate
     # Check for an existing ast first
     existing = self._get_existing_ast(module_name)
     if existing:
       return existing
-    if not ast:
-      ast = parser.parse_file(filename=filename, name=module_name,
-                              python_version=self.python_version)
-    return self._process_module(module_name, filename, ast)
+    with _load_timer:
+      if not ast:
+        ast = _parse_file(filename, module_name, self.python_version,
+                          self.pyi_cache)
+      return self._process_module(module_name, filename, ast)
 
   def _process_module(self, module_name, filename, ast):
     """Create a module from a loaded ast and save it to the loader cache.
@@ -343,17 +536,19 @@ class Loader(object):
   def _resolve_external_types(self, pyval, ast_name=None):
     name = ast_name or pyval.name
     try:
-      pyval = pyval.Visit(visitors.LookupExternalTypes(
-          self._get_module_map(), self_name=name,
-          module_alias_map=self._aliases))
+      with _resolve_timer:
+        pyval = pyval.Visit(visitors.LookupExternalTypes(
+            self._module_map, self_name=name,
+            module_alias_map=self._aliases))
     except KeyError as e:
       raise BadDependencyError(utils.message(e), name)
     return pyval
 
   def _finish_pyi(self, pyval, ast=None):
-    module_map = self._get_module_map()
-    module_map[""] = ast or pyval  # The module itself (local lookup)
-    pyval.Visit(visitors.FillInLocalPointers(module_map))
+    # The module itself is used for local lookups.
+    module_map = self._module_map.with_entries(**{"": ast or pyval})
+    with _resolve_timer:
+      pyval.Visit(visitors.FillInLocalPointers(module_map))
 
   def _verify_pyi(self, pyval, ast_name=None):
     try:
@@ -423,15 +618,68 @@ class Loader(object):
     # This method is used by convert.py for LateType, so memoize results early:
     if module_name in self._import_name_cache:
       return self._import_name_cache[module_name]
-    ast = self._import_name(module_name)
-    self._lookup_all_classes()
-    ast = self.finish_and_verify_ast(ast)
+    with _load_timer:
+      ast = self._import_name(module_name)
+      self._lookup_all_classes()
+      ast = self.finish_and_verify_ast(ast)
     self._import_name_cache[module_name] = ast
     return ast
 
+  def _verify_lazily(self, ast):
+    """Whether to defer the verification of an ast to verify_member."""
+    if ast.name in self._lazily_verified:
+      return True
+    if ast is self.builtins or ast is self.typing:
+      return False
+    num_members = (len(ast.constants) + len(ast.type_params) +
+                   len(ast.classes) + len(ast.functions) + len(ast.aliases))
+    if num_members <= LAZY_VERIFICATION_THRESHOLD:
+      return False
+    self._lazily_verified[ast.name] = {}
+    return True
+
+  def verify_member(self, pyval):
+    """Verify a member of a lazily verified module before it is used.
+
+    Large modules are not verified on import, so that the cost of an import
+    scales with the members a program uses rather than with the module's size.
+    Instead, the converter passes each top-level pytd node (class, function,
+    constant or alias) here before converting it.
+
+    Args:
+      pyval: A top-level pytd node of any module.
+
+    Returns:
+      The member to use, which differs from pyval only if a reference in it
+      had to be resolved again.
+
+    Raises:
+      BadDependencyError: If the member contains unresolvable references.
+      visitors.ContainerError: If the member contains a bad container.
+    """
+    if not self._lazily_verified:
+      return pyval
+    module_name = pyval.name
+    while "." in module_name:
+      module_name, _, _ = module_name.rpartition(".")
+      verified = self._lazily_verified.get(module_name)
+      if verified is not None:
+        break
+    else:
+      return pyval
+    if pyval.name not in verified:
+      try:
+        self._verify_pyi(pyval, module_name)
+      except BadDependencyError:
+        # See finish_and_verify_ast.
+        pyval = self._resolve_external_types(pyval, module_name)
+        self._verify_pyi(pyval, module_name)
+      verified[pyval.name] = pyval
+    return verified[pyval.name]
+
   def finish_and_verify_ast(self, ast):
     """Verify the ast, doing external type resolution first if necessary."""
-    if ast:
+    if ast and not self._verify_lazily(ast):
       try:
         self._verify_pyi(ast)
       except BadDependencyError:
@@ -467,10 +715,12 @@ class Loader(object):
 
   def _load_typeshed_builtin(self, subdir, module_name):
     """Load a pyi from typeshed."""
-    loaded = typeshed.parse_type_definition(
+    loaded = typeshed.get_type_definition(
         subdir, module_name, self.python_version)
     if loaded:
-      filename, mod = loaded
+      filename, src = loaded
+      mod = _parse_source(src, filename, module_name, self.python_version,
+                          self.pyi_cache)
       return self.load_file(filename=self.PREFIX + filename,
                             module_name=module_name, ast=mod)
     return None
@@ -557,7 +807,7 @@ class Loader(object):
       if init_ast is not None:
         log.debug("Found module %r with path %r", module_name, init_path)
         return init_ast, full_path
-      elif self.imports_map is None and os.path.isdir(path):
+      elif self.imports_map is None and self.directory_cache.isdir(path):
         # We allow directories to not have an __init__ file.
         # The module's empty, but you can still load submodules.
         log.debug("Created empty module %r with path %r",
@@ -587,28 +837,47 @@ class Loader(object):
         full_path = self.imports_map[path]
       else:
         return None, None
+      # We have /dev/null entries in the import_map - os.path.isfile() returns
+      # False for those. However, we *do* want to load them. Hence exists /
+      # isdir.
+      found = os.path.exists(full_path) and not os.path.isdir(full_path)
     else:
       full_path = path + ".pyi"
-
-    # We have /dev/null entries in the import_map - os.path.isfile() returns
-    # False for those. However, we *do* want to load them. Hence exists / isdir.
-    if os.path.exists(full_path) and not os.path.isdir(full_path):
+      found = self.directory_cache.isfile(full_path)
+    if found:
       ast = self.load_file(filename=full_path, module_name=module_name)
       return ast, full_path
     else:
       return None, None
 
-  def concat_all(self):
-    if not self._concatenated:
-      self._concatenated = pytd_utils.Concat(
-          *(module.ast for module in self._modules.values()
-            if module.ast),
-          name="<all>")
-    return self._concatenated
+  def lookup_all(self):
+    """Get a lookup table of the definitions of all loaded modules.
+
+    The table is kept between calls. Modules that were loaded since the last
+    call are added to it, and only when the ast of a module that it already
+    includes was replaced or removed is it rebuilt from scratch.
 
-  def _get_module_map(self):
-    return {name: module.ast for name, module in self._modules.items()
+    Returns:
+      An object with a Lookup() method, like the unit that concat_all()
+      returns.
+    """
+    asts = {name: module.ast for name, module in self._modules.items()
             if module.ast}
+    if not self._concatenated.includes(asts):
+      self._concatenated = _ConcatenatedModules()
+    self._concatenated.add(asts)
+    return self._concatenated
+
+  def concat_all(self):
+    """Concatenate the asts of all loaded modules into one "<all>" unit.
+
+    Only use this when the whole unit is needed. For looking up names, use
+    lookup_all(), which doesn't build a new unit when modules were loaded.
+
+    Returns:
+      A pytd.TypeDeclUnit.
+    """
+    return self.lookup_all().to_unit()
 
   def can_see(self, module):
     """Reports whether the Loader is allowed to use the module."""
@@ -637,7 +906,14 @@ class PickledPyiLoader(Loader):
 
   @classmethod
   def load_from_pickle(cls, filename, base_module, **kwargs):
-    items = pytd_utils.LoadPickle(filename, compress=True)
+    with _load_timer:
+      if pytd_utils.IsIndexedPickles(filename):
+        pickles = pytd_utils.IndexedPickles(filename)
+        items = [(name, _IndexedPickle(pickles, name))
+                 for name in pickles.names()]
+      else:
+        # The single gzipped pickle written by older versions of pytype.
+        items = pytd_utils.LoadPickle(filename, compress=True)
     modules = {
         name: Module(name, filename=None, ast=None, pickle=pickle, dirty=False)
         for name, pickle in items
@@ -658,7 +934,10 @@ class PickledPyiLoader(Loader):
         seen.add(m)
       if not m.pickle:
         continue
-      loaded_ast = cPickle.loads(m.pickle)
+      if isinstance(m.pickle, _IndexedPickle):
+        loaded_ast = pytd_utils.LoadPickleString(m.pickle.read())
+      else:
+        loaded_ast = pytd_utils.LoadPickleString(m.pickle)
       deps = [d for d, _ in loaded_ast.dependencies if d != loaded_ast.ast.name]
       loaded_ast = serialize_ast.EnsureAstName(loaded_ast, m.module_name)
       assert m.module_name in self._modules
@@ -666,10 +945,9 @@ class PickledPyiLoader(Loader):
       newly_loaded_asts.append(loaded_ast)
       m.ast = loaded_ast.ast
       m.pickle = None
-    module_map = self._get_module_map()
     for loaded_ast in newly_loaded_asts:
       unused_new_serialize_ast = serialize_ast.FillLocalReferences(
-          loaded_ast, module_map)
+          loaded_ast, self._module_map)
     assert module.ast
 
   def load_file(self, module_name, filename, ast=None):
@@ -680,7 +958,8 @@ class PickledPyiLoader(Loader):
     if existing:
       # TODO(kramm): When does this happen?
       return existing
-    loaded_ast = pytd_utils.LoadPickle(filename)
+    with _load_timer:
+      loaded_ast = pytd_utils.LoadPickle(filename)
     # At this point ast.name and module_name could be different.
     # They are later synced in ProcessAst.
     dependencies = {d: names for d, names in loaded_ast.dependencies
@@ -689,7 +968,8 @@ class PickledPyiLoader(Loader):
     self._modules[module_name] = Module(module_name, filename, loaded_ast.ast)
     self._load_ast_dependencies(dependencies, ast, module_name)
     try:
-      ast = serialize_ast.ProcessAst(loaded_ast, self._get_module_map())
+      with _load_timer:
+        ast = serialize_ast.ProcessAst(loaded_ast, self._module_map)
     except serialize_ast.UnrestorableDependencyError as e:
       del self._modules[module_name]
       raise BadDependencyError(utils.message(e), module_name)
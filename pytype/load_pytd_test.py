@@ -261,6 +261,67 @@ class ImportPathsTest(unittest.TestCase):
       self.assertEqual(module.filename, filename)
       self.assertEqual(module.ast, ast)
 
+  def testConcatAll(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "def f() -> int")
+      d.create_file("bar.pyi", "def g() -> str")
+      loader = load_pytd.Loader(None, self.PYTHON_VERSION, pythonpath=[d.path])
+      loader.import_name("foo")
+      all_ast = loader.concat_all()
+      self.assertTrue(all_ast.Lookup("foo.f"))
+      self.assertIs(loader.concat_all(), all_ast)
+      loader.import_name("bar")
+      new_all_ast = loader.concat_all()
+      self.assertTrue(new_all_ast.Lookup("foo.f"))
+      self.assertTrue(new_all_ast.Lookup("bar.g"))
+      self.assertIn(all_ast.Lookup("__builtin__.int"), new_all_ast.classes)
+
+  def testLookupAll(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "def f() -> int")
+      d.create_file("bar.pyi", "def g() -> str")
+      loader = load_pytd.Loader(None, self.PYTHON_VERSION, pythonpath=[d.path])
+      loader.import_name("foo")
+      lookup = loader.lookup_all()
+      self.assertTrue(lookup.Lookup("foo.f"))
+      loader.import_name("bar")
+      # The table is extended in place instead of being copied.
+      self.assertIs(loader.lookup_all(), lookup)
+      self.assertTrue(lookup.Lookup("bar.g"))
+      self.assertTrue(loader.concat_all().Lookup("bar.g"))
+
+  def testModuleMap(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "class X: ...")
+      loader = load_pytd.Loader(None, self.PYTHON_VERSION, pythonpath=[d.path])
+      module_map = loader._module_map  # pylint: disable=protected-access
+      self.assertNotIn("foo", module_map)
+      foo = loader.import_name("foo")
+      self.assertIs(module_map["foo"], foo)
+      local_map = module_map.with_entries(**{"": foo})
+      self.assertIs(local_map.get(""), foo)
+      self.assertIsNone(module_map.get(""))
+      self.assertRaises(KeyError, lambda: module_map["bar"])
+
+  def testLazyVerification(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+        class X: ...
+        def f() -> X: ...
+      """)
+      loader = load_pytd.Loader(None, self.PYTHON_VERSION, pythonpath=[d.path])
+      threshold = load_pytd.LAZY_VERIFICATION_THRESHOLD
+      load_pytd.LAZY_VERIFICATION_THRESHOLD = 1
+      try:
+        foo = loader.import_name("foo")
+      finally:
+        load_pytd.LAZY_VERIFICATION_THRESHOLD = threshold
+      x = foo.Lookup("foo.X")
+      self.assertIs(loader.verify_member(x), x)
+      bad = pytd.Constant("foo.y", pytd.NamedType("bar.Z"))
+      self.assertRaises(load_pytd.BadDependencyError,
+                        loader.verify_member, bad)
+
   def testCircularImport(self):
     with file_utils.Tempdir() as d:
       d.create_file("os2/__init__.pyi", """
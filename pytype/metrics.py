@@ -18,6 +18,7 @@ def bar(n):
   _my_counter.inc(n)  # calls to bar() count as n units.
 """
 
+import functools
 import math
 import re
 import sys
@@ -48,7 +49,9 @@ try:
   # pytype: enable=module-attr
 except AttributeError:
   dump = yaml.dump
-  load = yaml.load
+  # pyyaml 5.1+ requires an explicit Loader, and only the unsafe one can load
+  # our classes.
+  load = functools.partial(yaml.load, Loader=yaml.Loader)
 
 
 def _prepare_for_test(enabled=True):
@@ -132,6 +135,10 @@ class Metric(object):
     """Merge data from another metric of the same type."""
     raise NotImplementedError
 
+  def _reset(self):
+    """Discard the data collected so far."""
+    raise NotImplementedError
+
   def __str__(self):
     return "%s: %s" % (self._name, self._summary())
 
@@ -154,6 +161,9 @@ class Counter(Metric):
   def _summary(self):
     return str(self._total)
 
+  def _reset(self):
+    self._total = 0
+
   def _merge(self, other):
     # pylint: disable=protected-access
     self._total += other._total
@@ -169,6 +179,11 @@ class StopWatch(Metric):
     self._total = get_cpu_clock() - self._start_time
     del self._start_time
 
+  @property
+  def seconds(self):
+    """The time spent in the last "with" statement."""
+    return self._total
+
   def _summary(self):
     return "%f seconds" % self._total
 
@@ -176,6 +191,9 @@ class StopWatch(Metric):
     # pylint: disable=protected-access
     self._total += other._total
 
+  def _reset(self):
+    self._total = 0.0
+
 
 class ReentrantStopWatch(Metric):
   """A watch that supports being called multiple times and recursively."""
@@ -196,9 +214,17 @@ class ReentrantStopWatch(Metric):
       self._time += get_cpu_clock() - self._start_time
       del self._start_time
 
+  @property
+  def seconds(self):
+    """The total time spent below this StopWatch."""
+    return self._time
+
   def _merge(self, other):
     self._time += other._time  # pylint: disable=protected-access
 
+  def _reset(self):
+    self._time = 0
+
   def _summary(self):
     return "time spend below this StopWatch: %s" % self._time
 
@@ -239,6 +265,10 @@ class MapCounter(Metric):
       self._counts[key] = self._counts.get(key, 0) + count
       self._total += count
 
+  def _reset(self):
+    self._counts = {}
+    self._total = 0
+
 
 class Distribution(Metric):
   """A metric to track simple statistics from a distribution of values."""
@@ -299,6 +329,13 @@ class Distribution(Metric):
       self._min = min(self._min, other._min)
       self._max = max(self._max, other._max)
 
+  def _reset(self):
+    self._count = 0
+    self._total = 0.0
+    self._squared = 0.0
+    self._min = None
+    self._max = None
+
 
 class Snapshot(Metric):
   """A metric to track memory usage via tracemalloc snapshots."""
@@ -362,6 +399,9 @@ class Snapshot(Metric):
   def _summary(self):
     return "\n\n".join(self.snapshots)
 
+  def _reset(self):
+    self.snapshots = []
+
 
 class MetricsContext(object):
   """A context manager that configures metrics and writes their output."""
@@ -380,6 +420,11 @@ class MetricsContext(object):
     global _enabled
     self._old_enabled = _enabled
     _enabled = bool(self._output_path)
+    if _enabled:
+      # A process can run pytype more than once (e.g. a pytype-single worker),
+      # so discard what earlier runs recorded.
+      for metric in _registered_metrics.values():
+        metric._reset()  # pylint: disable=protected-access
 
   def __exit__(self, exc_type, exc_value, traceback):
     global _enabled
@@ -121,6 +121,7 @@ class StopWatchTest(unittest.TestCase):
     with c:
       pass
     self.assertGreaterEqual(c._total, 0)
+    self.assertEqual(c._total, c.seconds)
 
   def test_merge(self):
     c1 = metrics.StopWatch("foo")
@@ -304,6 +305,20 @@ class MetricsContextTest(unittest.TestCase):
       self._counter.inc()
     self.assertEqual(0, self._counter._total)
 
+  def test_reset(self):
+    watch = metrics.ReentrantStopWatch("watch")
+    with tempfile.NamedTemporaryFile() as out:
+      out.close()
+      for _ in range(2):
+        with metrics.MetricsContext(out.name):
+          self._counter.inc()
+          with watch:
+            pass
+      self.assertEqual(1, self._counter._total)
+      with open(out.name) as f:
+        dumped = {m.name: m for m in metrics.load(f)}
+      self.assertEqual(watch.seconds, dumped["watch"].seconds)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,85 @@
+"""An on-disk cache of parsed pyi files.
+
+Parsing the stubs that a module imports is a large part of the cost of
+analyzing it, and pytype-single processes repeat it for the same typeshed and
+third-party stubs over and over. Each pyi file gets one entry, keyed by its
+filename, its module name, the target Python version and the pytype version.
+The entry records a hash of the contents that were parsed, so an entry for a
+stub that has since changed is ignored and then replaced.
+
+Only the parser's output is cached. Resolving a module's references depends on
+the other modules that it imports, so the loader always redoes it.
+"""
+
+import hashlib
+import logging
+import os
+
+from pytype import __version__
+from pytype import file_utils
+from pytype.pytd import pytd_utils
+
+import six
+
+
+log = logging.getLogger(__name__)
+
+
+def _hash(*parts):
+  h = hashlib.sha256()
+  for part in parts:
+    # Sources that ship with pytype are read as bytes.
+    if isinstance(part, six.text_type):
+      part = part.encode("utf-8")
+    h.update(part)
+    h.update(b"\0")
+  return h.hexdigest()
+
+
+def _entry_path(cache_dir, filename, module_name, python_version):
+  key = _hash(__version__.__version__, filename, module_name or "",
+              "%d.%d" % tuple(python_version))
+  return os.path.join(cache_dir, key[:2], key)
+
+
+def load(cache_dir, filename, module_name, python_version, src):
+  """Load a parsed pyi from the cache.
+
+  Args:
+    cache_dir: The cache directory.
+    filename: The pyi's filename.
+    module_name: The module name that the pyi was parsed as.
+    python_version: The target Python version, as a tuple.
+    src: The pyi's current contents.
+
+  Returns:
+    The pytd.TypeDeclUnit, or None if there is no up-to-date entry.
+  """
+  path = _entry_path(cache_dir, filename, module_name, python_version)
+  try:
+    src_hash, ast = pytd_utils.LoadPickle(path)
+  except Exception:  # pylint: disable=broad-except
+    return None
+  if src_hash != _hash(src):
+    return None
+  return ast
+
+
+def store(cache_dir, filename, module_name, python_version, src, ast):
+  """Store a parsed pyi in the cache, replacing any older entry for the file.
+
+  Args:
+    cache_dir: The cache directory.
+    filename: The pyi's filename.
+    module_name: The module name that the pyi was parsed as.
+    python_version: The target Python version, as a tuple.
+    src: The contents that were parsed.
+    ast: The parsed pytd.TypeDeclUnit.
+  """
+  path = _entry_path(cache_dir, filename, module_name, python_version)
+  try:
+    file_utils.makedirs(os.path.dirname(path))
+    with file_utils.replace_atomically(path) as tmp:
+      pytd_utils.SavePickle((_hash(src), ast), tmp)
+  except (IOError, OSError) as e:
+    log.warning("Could not write to pyi cache %s: %s", cache_dir, e)
@@ -0,0 +1,62 @@
+"""Tests for pyi_cache.py."""
+
+import os
+
+from pytype import pyi_cache
+from pytype.pytd import pytd_utils
+from pytype.tests import test_utils
+
+import unittest
+
+
+class PyiCacheTest(test_utils.TempdirMixin, unittest.TestCase):
+  """Test the pyi cache."""
+
+  def setUp(self):
+    super(PyiCacheTest, self).setUp()
+    self.cache_dir = os.path.join(self.d.path, "cache")
+    self.ast = pytd_utils.CreateModule("foo")
+
+  def store(self, src="x: int", python_version=(3, 6)):
+    pyi_cache.store(
+        self.cache_dir, "foo.pyi", "foo", python_version, src, self.ast)
+
+  def load(self, src="x: int", filename="foo.pyi", python_version=(3, 6)):
+    return pyi_cache.load(
+        self.cache_dir, filename, "foo", python_version, src)
+
+  def assertLoads(self, ast):
+    self.assertIsNotNone(ast)
+    self.assertEqual(ast.name, self.ast.name)
+    self.assertTrue(pytd_utils.ASTeq(ast, self.ast))
+
+  def test_miss(self):
+    self.assertIsNone(self.load())
+
+  def test_store_and_load(self):
+    self.store()
+    self.assertLoads(self.load())
+    self.assertLoads(self.load(src=b"x: int"))
+
+  def test_changed_source(self):
+    self.store()
+    self.assertIsNone(self.load(src="x: str"))
+    # The new parse replaces the stale entry.
+    self.store(src="x: str")
+    self.assertIsNone(self.load())
+    self.assertLoads(self.load(src="x: str"))
+    self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+  def test_key(self):
+    self.store()
+    self.assertIsNone(self.load(filename="bar.pyi"))
+    self.assertIsNone(self.load(python_version=(2, 7)))
+
+  def test_unwritable(self):
+    self.cache_dir = self.d.create_file("cache")
+    self.store()
+    self.assertIsNone(self.load())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -38,7 +38,7 @@ _cached_builtins_pytd = {}
 
 
 def InvalidateCache(python_version):
-  del _cached_builtins_pytd[python_version]
+  _cached_builtins_pytd.pop(python_version, None)
 
 
 def GetBuiltinsAndTyping(python_version):  # Deprecated. Use load_pytd instead.
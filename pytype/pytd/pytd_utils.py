@@ -25,9 +25,11 @@ import collections
 import difflib
 import gzip
 import itertools
+import mmap
 import os
 import pickletools
 import re
+import struct
 import sys
 
 from pytype import pytype_source_utils
@@ -41,6 +43,10 @@ from six.moves import cPickle
 _PICKLE_PROTOCOL = cPickle.HIGHEST_PROTOCOL
 _PICKLE_RECURSION_LIMIT_AST = 40000
 
+# The start of a file written by SaveIndexedPickles.
+_INDEXED_PICKLES_MAGIC = b"PYTYPE_INDEXED_PICKLES_1\n"
+_INDEXED_PICKLES_INDEX_LENGTH = struct.Struct("<Q")
+
 
 ANON_PARAM = re.compile(r"_[0-9]+")
 
@@ -452,6 +458,10 @@ def LoadPickle(filename, compress=False):
       return cPickle.load(fi)
 
 
+def LoadPickleString(data):
+  return cPickle.loads(data)
+
+
 def SavePickle(data, filename=None, compress=False):
   """Pickle the data."""
   recursion_limit = sys.getrecursionlimit()
@@ -475,6 +485,73 @@ def SavePickle(data, filename=None, compress=False):
     sys.setrecursionlimit(recursion_limit)
 
 
+def SaveIndexedPickles(items, filename):
+  """Save named pickles to a file from which they can be read one at a time.
+
+  The file starts with a magic string and the length of the index, followed by
+  the index, a pickled list of (name, offset, length, dependencies) tuples, and
+  then the pickles themselves, uncompressed so that readers can mmap the file.
+  Offsets are relative to the end of the index.
+
+  Args:
+    items: A sequence of (name, pickle, dependencies) tuples. The dependencies
+      are the names of the other items that an item needs.
+    filename: The output file.
+  """
+  index = []
+  offset = 0
+  for name, data, dependencies in items:
+    index.append((name, offset, len(data), tuple(dependencies)))
+    offset += len(data)
+  header = cPickle.dumps(index, _PICKLE_PROTOCOL)
+  with open(filename, "wb") as fi:
+    fi.write(_INDEXED_PICKLES_MAGIC)
+    fi.write(_INDEXED_PICKLES_INDEX_LENGTH.pack(len(header)))
+    fi.write(header)
+    for _, data, _ in items:
+      fi.write(data)
+
+
+def IsIndexedPickles(filename):
+  """Whether the file was written by SaveIndexedPickles."""
+  with open(filename, "rb") as fi:
+    return fi.read(len(_INDEXED_PICKLES_MAGIC)) == _INDEXED_PICKLES_MAGIC
+
+
+class IndexedPickles(object):
+  """Read-only access to a file written by SaveIndexedPickles.
+
+  Only the index is read up front. The file is memory-mapped, so the pickles
+  that are never read cost neither time nor memory, and processes that open the
+  same file share its pages.
+  """
+
+  def __init__(self, filename):
+    with open(filename, "rb") as fi:
+      if fi.read(len(_INDEXED_PICKLES_MAGIC)) != _INDEXED_PICKLES_MAGIC:
+        raise ValueError("Not an indexed pickles file: %s" % filename)
+      length, = _INDEXED_PICKLES_INDEX_LENGTH.unpack(
+          fi.read(_INDEXED_PICKLES_INDEX_LENGTH.size))
+      index = cPickle.loads(fi.read(length))
+      self._start = fi.tell()
+      self._mmap = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+    self._names = [name for name, _, _, _ in index]
+    self._index = {name: (offset, length, dependencies)
+                   for name, offset, length, dependencies in index}
+
+  def names(self):
+    return list(self._names)
+
+  def dependencies(self, name):
+    return self._index[name][2]
+
+  def read(self, name):
+    """Read the pickle stored under the given name."""
+    offset, length, _ = self._index[name]
+    start = self._start + offset
+    return self._mmap[start:start + length]
+
+
 def ASTeq(ast1, ast2):
   return (ast1.constants == ast2.constants and
           ast1.type_params == ast2.type_params and
@@ -497,7 +574,7 @@ def DiffNamedPickles(named_pickles1, named_pickles2):
     if name1 != name2:
       diff.append("different ordering of pyi files: %s, %s" % (name1, name2))
     elif pickle1 != pickle2:
-      ast1, ast2 = cPickle.loads(pickle1), cPickle.loads(pickle2)
+      ast1, ast2 = LoadPickleString(pickle1), LoadPickleString(pickle2)
       if ASTeq(ast1.ast, ast2.ast):
         diff.append("asts match but pickles differ: %s" % name1)
         p1 = six.StringIO()
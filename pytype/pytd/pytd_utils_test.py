@@ -349,6 +349,26 @@ class TestUtils(parser_test_base.ParserTest):
       d2 = pytd_utils.LoadPickle(filename, compress=True)
     self.assertEqual(d1, d2)
 
+  def testIndexedPickles(self):
+    items = [("foo", pytd_utils.SavePickle({1, 2}), ["bar"]),
+             ("bar", pytd_utils.SavePickle("3"), [])]
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo.pickle")
+      pytd_utils.SaveIndexedPickles(items, filename)
+      self.assertTrue(pytd_utils.IsIndexedPickles(filename))
+      pickles = pytd_utils.IndexedPickles(filename)
+      self.assertEqual(pickles.names(), ["foo", "bar"])
+      self.assertEqual(pickles.dependencies("foo"), ("bar",))
+      self.assertEqual(six.moves.cPickle.loads(pickles.read("bar")), "3")
+      self.assertEqual(six.moves.cPickle.loads(pickles.read("foo")), {1, 2})
+
+  def testIsIndexedPickles(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo.pickle.gz")
+      pytd_utils.SavePickle({1}, filename, compress=True)
+      self.assertFalse(pytd_utils.IsIndexedPickles(filename))
+      self.assertRaises(ValueError, pytd_utils.IndexedPickles, filename)
+
   def testDiffSamePickle(self):
     ast = pytd.TypeDeclUnit("foo", (), (), (), (), ())
     with file_utils.Tempdir() as d:
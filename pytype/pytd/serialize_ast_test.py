@@ -1,5 +1,4 @@
 import os
-import pickle
 
 from pytype import file_utils
 from pytype import load_pytd
@@ -101,8 +100,7 @@ class SerializeAstTest(unittest.TestCase):
       result = serialize_ast.StoreAst(ast, pickled_ast_filename)
 
       self.assertIsNone(result)
-      with open(pickled_ast_filename, "rb") as fi:
-        serialized_ast = pickle.load(fi)
+      serialized_ast = pytd_utils.LoadPickle(pickled_ast_filename)
       self.assertTrue(serialized_ast.ast)
       six.assertCountEqual(self, dict(serialized_ast.dependencies),
                            ["__builtin__", "foo.bar.module1", "module2"])
@@ -1,11 +1,14 @@
 """Utilities for parsing typeshed files."""
 
+import hashlib
 import os
 
+from pytype import file_utils
 from pytype import module_utils
 from pytype import pytype_source_utils
 from pytype import utils
 from pytype.pyi import parser
+from pytype.pytd import pytd_utils
 from pytype.pytd.parse import builtins
 
 
@@ -215,8 +218,8 @@ def _get_typeshed():
   return _typeshed
 
 
-def parse_type_definition(pyi_subdir, module, python_version):
-  """Load and parse a *.pyi from typeshed.
+def get_type_definition(pyi_subdir, module, python_version):
+  """Load a *.pyi from typeshed.
 
   Args:
     pyi_subdir: the directory where the module should be found.
@@ -225,16 +228,72 @@ def parse_type_definition(pyi_subdir, module, python_version):
 
   Returns:
     None if the module doesn't have a definition.
-    Else a tuple of the filename and the AST of the module.
+    Else a tuple of the filename and the contents of the module.
   """
   assert python_version
   typeshed = _get_typeshed()
   try:
-    filename, src = typeshed.get_module_file(
-        pyi_subdir, module, python_version)
+    return typeshed.get_module_file(pyi_subdir, module, python_version)
   except IOError:
     return None
 
+
+def parse_type_definition(pyi_subdir, module, python_version):
+  """Load and parse a *.pyi from typeshed.
+
+  Args:
+    pyi_subdir: the directory where the module should be found.
+    module: the module name (without any file extension)
+    python_version: sys.version_info[:2]
+
+  Returns:
+    None if the module doesn't have a definition.
+    Else a tuple of the filename and the AST of the module.
+  """
+  loaded = get_type_definition(pyi_subdir, module, python_version)
+  if not loaded:
+    return None
+  filename, src = loaded
   ast = parser.parse_string(src, filename=filename, name=module,
                             python_version=python_version)
   return filename, ast
+
+
+def _find_source(module_name, python_version):
+  """Find the source of a module, the way Loader._import_name does.
+
+  Only the stubs that ship with pytype and typeshed are searched, as for the
+  builtins, which are loaded without a pythonpath.
+
+  Args:
+    module_name: The name of the module.
+    python_version: The target Python version.
+
+  Returns:
+    The source, or None if the module wasn't found.
+  """
+  for subdir in ("builtins", "stdlib"):
+    pytd_subdir = file_utils.get_versioned_path(subdir, python_version)
+    for as_package in (False, True):
+      try:
+        _, src = pytd_utils.GetPredefinedFile(
+            pytd_subdir, module_name, as_package=as_package)
+      except IOError:
+        pass
+      else:
+        return src
+    loaded = get_type_definition(subdir, module_name, python_version)
+    if loaded:
+      return loaded[1]
+  loaded = get_type_definition("third_party", module_name, python_version)
+  return loaded[1] if loaded else None
+
+
+def source_hash(module_name, python_version):
+  """Hash the stub that the loader would read for a module, or return None."""
+  src = _find_source(module_name, python_version)
+  if src is None:
+    return None
+  if not isinstance(src, bytes):
+    src = src.encode("utf-8")
+  return hashlib.sha256(src).hexdigest()
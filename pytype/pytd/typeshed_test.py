@@ -142,5 +142,16 @@ class TestTypeshedParsing(test_base.TargetPython27FeatureTest):
     self.assertTrue(self.loader.import_name("imp"))
 
 
+class TestSourceHash(unittest.TestCase):
+  """Test hashing the stubs that the loader reads."""
+
+  def test_source_hash(self):
+    h = typeshed.source_hash("__builtin__", (2, 7))
+    self.assertTrue(h)
+    self.assertEqual(h, typeshed.source_hash("__builtin__", (2, 7)))
+    self.assertNotEqual(h, typeshed.source_hash("typing", (2, 7)))
+    self.assertIsNone(typeshed.source_hash("nonexistent_module", (2, 7)))
+
+
 if __name__ == "__main__":
   unittest.main()
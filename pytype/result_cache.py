@@ -0,0 +1,171 @@
+"""A content-addressed cache of pytype-single results.
+
+Results are keyed by a hash of everything that can affect them: the source
+file, the contents of every pyi in the imports map, the pytype version and the
+options that influence analysis. Unlike mtimes, these keys are stable across
+checkouts and machines, so the cache directory can be shared.
+"""
+
+import hashlib
+import logging
+import os
+
+from pytype import __version__
+from pytype import errors
+from pytype import file_utils
+from pytype.pytd import pytd_utils
+
+
+log = logging.getLogger(__name__)
+
+
+# Options that change the pyi or the errors produced for a given input.
+_KEY_OPTIONS = (
+    "analyze_annotated",
+    "check",
+    "disable",
+    "main_only",
+    "module_name",
+    "pickle_output",
+    "precise_return",
+    "protocols",
+    "python_version",
+    "quick",
+    "report_errors",
+    "skip_repeat_calls",
+    "strict_import",
+    "typeshed",
+)
+
+
+def _hash_file(path, h=None):
+  h = h or hashlib.sha256()
+  try:
+    with open(path, "rb") as f:
+      for chunk in iter(lambda: f.read(1 << 16), b""):
+        h.update(chunk)
+  except IOError:
+    h.update(b"<missing>")
+  return h
+
+
+def compute_key(options):
+  """Compute the cache key for a pytype-single invocation.
+
+  Args:
+    options: config.Options object.
+
+  Returns:
+    A hex digest, or None if the result can't be cached.
+  """
+  # Without an imports map we don't know which pyi files the result depends
+  # on.
+  if options.imports_map is None:
+    return None
+  h = hashlib.sha256()
+  def add(s):
+    h.update(s.encode("utf-8"))
+    h.update(b"\0")
+  add(__version__.__version__)
+  for name in _KEY_OPTIONS:
+    add(repr(getattr(options, name, None)))
+  _hash_file(options.input, h)
+  add("")
+  if options.precompiled_builtins:
+    _hash_file(options.precompiled_builtins, h)
+    add("")
+  for short_path, path in sorted(options.imports_map.items()):
+    add(short_path)
+    add(_hash_file(path).hexdigest())
+  return h.hexdigest()
+
+
+def _entry_path(cache_dir, key):
+  return os.path.join(cache_dir, key[:2], key)
+
+
+def store(cache_dir, key, options, errorlog, result, pickled=None):
+  """Store a result in the cache.
+
+  Args:
+    cache_dir: The cache directory.
+    key: The key returned by compute_key.
+    options: config.Options object.
+    errorlog: The errors.ErrorLog of the run.
+    result: The pyi as a string, or None in check mode.
+    pickled: With --pickle-output, the pickled ast as bytes.
+  """
+  path = _entry_path(cache_dir, key)
+  # Bad calls reference abstract values, which we can neither pickle nor use
+  # outside of the analysis that produced them.
+  entry = (options.input, [e.drop_bad_call() for e in errorlog], result,
+           pickled)
+  try:
+    file_utils.makedirs(os.path.dirname(path))
+    with file_utils.replace_atomically(path) as tmp:
+      pytd_utils.SavePickle(entry, tmp, compress=True)
+  except (IOError, OSError) as e:
+    log.warning("Could not write to result cache %s: %s", cache_dir, e)
+
+
+def load(cache_dir, key, options):
+  """Load a result from the cache.
+
+  Args:
+    cache_dir: The cache directory.
+    key: The key returned by compute_key.
+    options: config.Options object.
+
+  Returns:
+    An (errors.ErrorLog, result, pickled) tuple, or None on a cache miss.
+  """
+  path = _entry_path(cache_dir, key)
+  try:
+    input_filename, errs, result, pickled = pytd_utils.LoadPickle(
+        path, compress=True)
+    # Mark the entry as recently used, for eviction.
+    os.utime(path, None)
+  except Exception:  # pylint: disable=broad-except
+    return None
+  errorlog = errors.ErrorLog()
+  for error in errs:
+    # The same source may live at a different path in another checkout.
+    # pylint: disable=protected-access
+    if error._filename == input_filename:
+      error._filename = options.input
+    errorlog._errors.append(error)
+  log.info("Loaded result for %s from cache", options.input)
+  return errorlog, result, pickled
+
+
+def evict(cache_dir, max_size):
+  """Delete the least recently used entries until the cache fits in max_size.
+
+  Args:
+    cache_dir: The cache directory.
+    max_size: The maximum size of the cache, in bytes.
+
+  Returns:
+    The number of deleted entries.
+  """
+  entries = []
+  for root, _, files in os.walk(cache_dir):
+    for f in files:
+      path = os.path.join(root, f)
+      try:
+        st = os.stat(path)
+      except OSError:
+        continue
+      entries.append((st.st_mtime, st.st_size, path))
+  total = sum(size for _, size, _ in entries)
+  deleted = 0
+  for _, size, path in sorted(entries):
+    if total <= max_size:
+      break
+    try:
+      os.remove(path)
+    except OSError:
+      continue
+    total -= size
+    deleted += 1
+  return deleted
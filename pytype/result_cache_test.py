@@ -0,0 +1,98 @@
+"""Tests for result_cache.py."""
+
+import os
+
+from pytype import datatypes
+from pytype import errors
+from pytype import result_cache
+from pytype.tests import test_utils
+
+import unittest
+
+
+class ResultCacheTest(test_utils.TempdirMixin, unittest.TestCase):
+  """Test the result cache."""
+
+  def setUp(self):
+    super(ResultCacheTest, self).setUp()
+    self.cache_dir = os.path.join(self.d.path, "cache")
+    self.dep = self.d.create_file("dep.pyi", "x: int")
+
+  def make_options(self, src="x = 42", filename="foo.py", **kwargs):
+    options = datatypes.SimpleNamespace(
+        input=self.d.create_file(filename, src),
+        imports_map={"dep": self.dep},
+        pickle_output=False,
+        precompiled_builtins=None,
+        python_version=(3, 6),
+        disable=[])
+    for k, v in kwargs.items():
+      setattr(options, k, v)
+    return options
+
+  def test_key(self):
+    key = result_cache.compute_key(self.make_options())
+    self.assertEqual(key, result_cache.compute_key(self.make_options()))
+    self.assertNotEqual(
+        key, result_cache.compute_key(self.make_options(src="x = 0")))
+    self.assertNotEqual(
+        key, result_cache.compute_key(self.make_options(disable=["x"])))
+    self.d.create_file("dep.pyi", "x: str")
+    self.assertNotEqual(key, result_cache.compute_key(self.make_options()))
+
+  def test_key_is_independent_of_location(self):
+    self.assertEqual(
+        result_cache.compute_key(self.make_options(filename="foo.py")),
+        result_cache.compute_key(self.make_options(filename="bar/foo.py")))
+
+  def test_no_key(self):
+    self.assertIsNone(
+        result_cache.compute_key(self.make_options(imports_map=None)))
+
+  def test_pickle_output_key(self):
+    self.assertNotEqual(
+        result_cache.compute_key(self.make_options()),
+        result_cache.compute_key(self.make_options(pickle_output=True)))
+
+  def test_store_and_load(self):
+    options = self.make_options()
+    key = result_cache.compute_key(options)
+    self.assertIsNone(result_cache.load(self.cache_dir, key, options))
+    errorlog = errors.ErrorLog()
+    errorlog._add(errors.Error.for_test(  # pylint: disable=protected-access
+        errors.SEVERITY_ERROR, "msg", "name-error", filename=options.input,
+        lineno=1))
+    result_cache.store(self.cache_dir, key, options, errorlog, "x: int\n")
+    other_options = self.make_options(filename="bar/foo.py")
+    loaded_errorlog, result, pickled = result_cache.load(
+        self.cache_dir, key, other_options)
+    self.assertEqual(result, "x: int\n")
+    self.assertIsNone(pickled)
+    error, = loaded_errorlog
+    self.assertEqual(error.filename, other_options.input)
+    self.assertEqual(error.name, "name-error")
+    self.assertTrue(loaded_errorlog.has_error())
+
+  def test_store_and_load_pickled(self):
+    options = self.make_options(pickle_output=True)
+    key = result_cache.compute_key(options)
+    result_cache.store(self.cache_dir, key, options, errors.ErrorLog(),
+                       "x: int\n", b"pickled")
+    _, _, pickled = result_cache.load(self.cache_dir, key, options)
+    self.assertEqual(pickled, b"pickled")
+
+  def test_evict(self):
+    options = self.make_options()
+    for i in range(3):
+      result_cache.store(self.cache_dir, "%02d" % i, options,
+                         errors.ErrorLog(), "x" * 1000)
+      path = os.path.join(self.cache_dir, "%02d" % i, "%02d" % i)
+      os.utime(path, (i, i))
+    size = os.path.getsize(path)
+    self.assertEqual(result_cache.evict(self.cache_dir, 2 * size), 1)
+    self.assertIsNone(result_cache.load(self.cache_dir, "00", options))
+    self.assertIsNotNone(result_cache.load(self.cache_dir, "01", options))
+
+
+if __name__ == "__main__":
+  unittest.main()
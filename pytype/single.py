@@ -14,12 +14,11 @@ import logging
 import signal
 import sys
 
+from pytype import builtins_generator
 from pytype import config
 from pytype import io
-from pytype import load_pytd
 from pytype import metrics
 from pytype import utils
-from pytype.pytd import typeshed
 from pytype.pytd.parse import node
 
 
@@ -51,14 +50,10 @@ class _ProfileContext(object):
 
 def _generate_builtins_pickle(options):
   """Create a pickled file with the standard library (typeshed + builtins)."""
-  loader = load_pytd.create_loader(options)
-  t = typeshed.Typeshed()
-  module_names = t.get_all_module_names(options.python_version)
-  blacklist = set(t.blacklisted_modules(options.python_version))
-  for m in sorted(module_names):
-    if m not in blacklist:
-      loader.import_name(m)
-  loader.save_to_pickle(options.generate_builtins)
+  if options.generate_builtins_jobs:
+    builtins_generator.generate(options, options.generate_builtins_jobs)
+  else:
+    builtins_generator.generate_serially(options)
 
 
 def main():
@@ -17,6 +17,114 @@ log = logging.getLogger(__name__)
 UNSATISFIABLE = object()
 
 
+# Data stacks up to this deep are kept as tuples, which are the cheapest to
+# copy while they are small. Deeper ones are kept as DataStacks, whose push and
+# pop don't get slower with depth.
+_MAX_TUPLE_STACK_DEPTH = 64
+
+
+class DataStack(object):
+  """An immutable stack of values.
+
+  A stack is a chain of entries, each holding one value and the stack below it,
+  so pushing or popping a value is O(1) and creates a new stack that shares all
+  of its other entries with the old one. The stacks of the states in a frame
+  therefore share their common bottom part instead of each being a copy.
+
+  FrameState only switches to a DataStack once its stack outgrows
+  _MAX_TUPLE_STACK_DEPTH, so the two support the same reads: len(), iteration
+  from oldest to newest, peek() and topn().
+  """
+
+  __slots__ = ["_top", "_rest", "_len"]
+
+  def __init__(self, top=None, rest=None, length=0):
+    # Use DataStack() for an empty stack and push() for everything else.
+    self._top = top
+    self._rest = rest
+    self._len = length
+
+  def __len__(self):
+    return self._len
+
+  def __iter__(self):
+    """Iterate over the values, oldest first."""
+    return iter(self._topn(self._len))
+
+  def __repr__(self):
+    return repr(tuple(self))
+
+  def _topn(self, n):
+    values = [None] * n
+    stack = self
+    for i in range(n - 1, -1, -1):
+      values[i] = stack._top
+      stack = stack._rest
+    return values
+
+  def push(self, value):
+    return DataStack(value, self, self._len + 1)
+
+  def pushn(self, values):
+    stack = self
+    for value in values:
+      stack = DataStack(value, stack, stack._len + 1)
+    return stack
+
+  def peek(self, n):
+    """Get the value n entries down, with the top being entry 1."""
+    if not 0 < n <= self._len:
+      raise IndexError("Trying to peek at %d values down a stack of size %d" %
+                       (n, self._len))
+    stack = self
+    for _ in range(n - 1):
+      stack = stack._rest
+    return stack._top
+
+  def topn(self, n):
+    """Get the top n values, oldest first, as a tuple."""
+    if n > self._len:
+      raise IndexError("Trying to get %d values from stack of size %d" %
+                       (n, self._len))
+    return tuple(self._topn(n)) if n > 0 else ()
+
+  def popn(self, n):
+    """Return the stack without its top n values, and the values."""
+    values = self.topn(n)
+    stack = self
+    for _ in range(n):
+      stack = stack._rest
+    return stack, values
+
+
+def _push(stack, values):
+  """Push values onto a tuple or DataStack stack."""
+  if isinstance(stack, tuple):
+    if len(stack) + len(values) <= _MAX_TUPLE_STACK_DEPTH:
+      return stack + values
+    stack = DataStack().pushn(stack)
+  return stack.pushn(values)
+
+
+def _peek(stack, n):
+  if isinstance(stack, tuple):
+    return stack[-n]
+  return stack.peek(n)
+
+
+def _topn(stack, n):
+  if isinstance(stack, tuple):
+    return stack[len(stack) - n:]
+  return stack.topn(n)
+
+
+def _popn(stack, n):
+  """Return a tuple or DataStack stack without its top n values, and them."""
+  if isinstance(stack, tuple):
+    return stack[:len(stack) - n], stack[len(stack) - n:]
+  return stack.popn(n)
+
+
 class FrameState(utils.VirtualMachineWeakrefMixin):
   """Immutable state object, for attaching to opcodes."""
 
@@ -47,7 +155,7 @@ class FrameState(utils.VirtualMachineWeakrefMixin):
 
   def push(self, *values):
     """Push value(s) onto the value stack."""
-    return FrameState(self.data_stack + tuple(values),
+    return FrameState(_push(self.data_stack, values),
                       self.block_stack,
                       self.node,
                       self.vm,
@@ -56,21 +164,18 @@ class FrameState(utils.VirtualMachineWeakrefMixin):
 
   def peek(self, n):
     """Get a value `n` entries down in the stack, without changing the stack."""
-    return self.data_stack[-n]
+    return _peek(self.data_stack, n)
 
   def top(self):
-    return self.data_stack[-1]
+    return _peek(self.data_stack, 1)
 
   def topn(self, n):
-    if n > 0:
-      return self.data_stack[-n:]
-    else:
-      return ()
+    return _topn(self.data_stack, min(n, len(self.data_stack)))
 
   def pop(self):
     """Pop a value from the value stack."""
-    value = self.data_stack[-1]
-    return FrameState(self.data_stack[:-1],
+    data_stack, (value,) = _popn(self.data_stack, 1)
+    return FrameState(data_stack,
                       self.block_stack,
                       self.node,
                       self.vm,
@@ -79,7 +184,8 @@ class FrameState(utils.VirtualMachineWeakrefMixin):
 
   def pop_and_discard(self):
     """Pop a value from the value stack and discard it."""
-    return FrameState(self.data_stack[:-1],
+    data_stack, _ = _popn(self.data_stack, 1)
+    return FrameState(data_stack,
                       self.block_stack,
                       self.node,
                       self.vm,
@@ -94,8 +200,8 @@ class FrameState(utils.VirtualMachineWeakrefMixin):
     if len(self.data_stack) < n:
       raise IndexError("Trying to pop %d values from stack of size %d" %
                        (n, len(self.data_stack)))
-    values = self.data_stack[-n:]
-    return FrameState(self.data_stack[:-n],
+    data_stack, values = _popn(self.data_stack, n)
+    return FrameState(data_stack,
                       self.block_stack,
                       self.node,
                       self.vm,
@@ -162,7 +268,9 @@ class FrameState(utils.VirtualMachineWeakrefMixin):
     node = other.node
     if self.node is not node:
       self.node.ConnectTo(node)
-    both = list(zip(self.data_stack, other.data_stack))
+    both = []
+    if self.data_stack is not other.data_stack:
+      both = list(zip(self.data_stack, other.data_stack))
     if any(v1 is not v2 for v1, v2 in both):
       for v, o in both:
         o.PasteVariable(v, None)
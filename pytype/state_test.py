@@ -39,6 +39,58 @@ def fake_compatible_with(value, logical_value):
   return value.compatible[logical_value]
 
 
+class DataStackTest(unittest.TestCase):
+  """Test the persistent data stack."""
+
+  def test_push_and_pop(self):
+    empty = state.DataStack()
+    stack = empty.push(1).push(2).pushn([3, 4])
+    self.assertEqual(len(stack), 4)
+    self.assertEqual(tuple(stack), (1, 2, 3, 4))
+    rest, values = stack.popn(3)
+    self.assertEqual(values, (2, 3, 4))
+    self.assertEqual(tuple(rest), (1,))
+    self.assertEqual(tuple(empty), ())
+    self.assertEqual(empty.popn(0), (empty, ()))
+
+  def test_peek(self):
+    stack = state.DataStack().pushn("abc")
+    self.assertEqual(stack.peek(1), "c")
+    self.assertEqual(stack.peek(3), "a")
+    self.assertEqual(stack.topn(2), ("b", "c"))
+    self.assertRaises(IndexError, stack.peek, 4)
+    self.assertRaises(IndexError, stack.topn, 4)
+    self.assertRaises(IndexError, state.DataStack().popn, 1)
+
+  def test_immutable(self):
+    stack = state.DataStack().pushn([1, 2])
+    pushed = stack.push(3)
+    popped, _ = stack.popn(1)
+    self.assertEqual(tuple(stack), (1, 2))
+    self.assertEqual(tuple(pushed), (1, 2, 3))
+    self.assertEqual(tuple(popped), (1,))
+
+  def test_sharing(self):
+    stack = state.DataStack().pushn(range(1000))
+    # Popping and pushing a value leaves the rest of the stack shared.
+    rest, _ = stack.popn(1)
+    self.assertIs(rest.push(0).popn(1)[0], rest)
+
+  def test_tuple_stack(self):
+    # pylint: disable=protected-access
+    depth = state._MAX_TUPLE_STACK_DEPTH
+    stack = state._push((), tuple(range(depth)))
+    self.assertIsInstance(stack, tuple)
+    deep = state._push(stack, ("x",))
+    self.assertIsInstance(deep, state.DataStack)
+    self.assertEqual(tuple(deep), tuple(range(depth)) + ("x",))
+    self.assertEqual(state._peek(deep, 2), depth - 1)
+    self.assertEqual(state._topn(stack, 2), (depth - 2, depth - 1))
+    rest, values = state._popn(deep, 2)
+    self.assertEqual(values, (depth - 1, "x"))
+    self.assertEqual(tuple(rest), tuple(range(depth - 1)))
+
+
 class ConditionTestBase(unittest.TestCase):
 
   def setUp(self):
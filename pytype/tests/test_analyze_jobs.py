@@ -0,0 +1,66 @@
+"""Tests for --analyze-jobs."""
+
+from pytype.pytd import pytd_utils
+from pytype.tests import test_base
+
+
+_CODE = """
+  import collections
+  import functools
+  Point = collections.namedtuple("Point", ["x", "y"])
+  COUNT = 0
+  def decorate(f):
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+      return f(*args, **kwargs)
+    return wrapper
+  class Base(object):
+    def get(self):
+      return 42
+  class Child(Base):
+    def get(self):
+      return str(super(Child, self).get())
+  @decorate
+  def make_point(x):
+    return Point(x, x)
+  def bump():
+    global COUNT
+    COUNT = "many"
+  def reset():
+    global COUNT
+    COUNT = None
+  def add_str(x):
+    return x + "suffix"
+  def use_add_str():
+    return add_str(1)
+  def distance(p):
+    return p.x + p.y
+"""
+
+
+class AnalyzeJobsTest(test_base.TargetIndependentTest):
+  """Tests that forked analysis gives the same results as serial analysis."""
+
+  def _Check(self, analyze_jobs):
+    self.ConfigureOptions(analyze_jobs=analyze_jobs)
+    return [str(e) for e in self.CheckWithErrors(_CODE)]
+
+  def _Infer(self, analyze_jobs):
+    self.ConfigureOptions(analyze_jobs=analyze_jobs)
+    ty, errorlog = self.InferWithErrors(_CODE)
+    return pytd_utils.Print(ty), [str(e) for e in errorlog]
+
+  def testCheckMatchesSerial(self):
+    serial = self._Check(analyze_jobs=1)
+    forked = self._Check(analyze_jobs=2)
+    self.assertEqual(serial, forked)
+    self.assertTrue(any("unsupported-operands" in e for e in serial))
+
+  def testInferIsSerial(self):
+    serial = self._Infer(analyze_jobs=1)
+    self.assertEqual(serial, self._Infer(analyze_jobs=2))
+    pyi, _ = serial
+    self.assertIn("COUNT", pyi)
+
+
+test_base.main(globals(), __name__ == "__main__")
@@ -0,0 +1,65 @@
+"""Tests for --function-summary-cache."""
+
+import os
+
+from pytype import file_utils
+from pytype import function_summaries
+from pytype import metrics
+from pytype.pytd import pytd_utils
+from pytype.tests import test_base
+
+
+class FunctionSummaryTest(test_base.TargetIndependentTest):
+  """Tests that a warm run gives the same results as a cold one."""
+
+  def setUp(self):
+    super(FunctionSummaryTest, self).setUp()
+    metrics._prepare_for_test()  # pylint: disable=protected-access
+    function_summaries._summary_counter._reset()  # pylint: disable=protected-access
+
+  def tearDown(self):
+    super(FunctionSummaryTest, self).tearDown()
+    metrics._prepare_for_test(enabled=False)  # pylint: disable=protected-access
+
+  def _Infer(self, code):
+    ty, errorlog = self.InferWithErrors(code)
+    return pytd_utils.Print(ty), [str(e) for e in errorlog]
+
+  def testColdAndWarm(self):
+    code = """
+      def add_str(x):
+        return x + "suffix"
+      def double(x):
+        y = x * 2
+        return y
+      def call_add_str(x):
+        return add_str(x)
+      def count_words(s):
+        words = []
+        for w in s.split():
+          words.append(w.strip())
+        return len(words)
+      def length(x):
+        return len(x)
+      a = add_str(1)
+      b = call_add_str(2)
+      c = double(3)
+      d = double("x")
+      e = count_words("a b")
+      f = length(3)
+    """
+    with file_utils.Tempdir() as d:
+      self.ConfigureOptions(
+          function_summary_cache=os.path.join(d.path, "summaries"))
+      cold = self._Infer(code)
+      hits = function_summaries._summary_counter._counts.get("hit", 0)  # pylint: disable=protected-access
+      warm = self._Infer(code)
+      warm_hits = function_summaries._summary_counter._counts.get("hit", 0)  # pylint: disable=protected-access
+    self.assertGreater(warm_hits, hits)
+    self.assertEqual(cold, warm)
+    _, errors = cold
+    self.assertTrue(any("unsupported-operands" in e for e in errors))
+    self.assertTrue(any("wrong-arg-types" in e for e in errors))
+
+
+test_base.main(globals(), __name__ == "__main__")
@@ -4,11 +4,11 @@ import textwrap
 
 from pytype import file_utils
 from pytype.pyi import parser
+from pytype.pytd import pytd_utils
 from pytype.pytd import visitors
 from pytype.tests import test_base
 
 import six
-from six.moves import cPickle
 
 
 class PickleTest(test_base.TargetIndependentTest):
@@ -23,7 +23,7 @@ class PickleTest(test_base.TargetIndependentTest):
 
   def _verifyDeps(self, module, immediate_deps, late_deps):
     if isinstance(module, bytes):
-      data = cPickle.loads(module)
+      data = pytd_utils.LoadPickleString(module)
       six.assertCountEqual(self, dict(data.dependencies), immediate_deps)
       six.assertCountEqual(self, dict(data.late_dependencies), late_deps)
     else:
@@ -7,6 +7,7 @@ import tokenize
 
 from pytype import compat
 from pytype import errors
+from pytype import file_utils
 from pytype import state as frame_state
 from pytype.pyc import loadmarshal
 
@@ -40,6 +41,16 @@ def fake_stack(length):
           for i in range(length)]
 
 
+class TempdirMixin(object):
+  """Mixin providing a temporary directory, self.d, to each test."""
+
+  def setUp(self):
+    super(TempdirMixin, self).setUp()
+    tempdir = file_utils.Tempdir()
+    self.d = tempdir.__enter__()
+    self.addCleanup(tempdir.__exit__, None, None, None)
+
+
 class OperatorsTestMixin(object):
   """Mixin providing utilities for operators tests."""
 
@@ -49,8 +49,53 @@ ITEMS = {
     'jobs': Item(
         1, '4', None,
         'Run N jobs in parallel.'),
+    'executor': Item(
+        'worker', 'worker', None,
+        'How to run the analysis jobs: "worker" (a pool of long-lived worker '
+        'processes), "fork" (a process per module, forked from a warmed-up '
+        'server; POSIX only), "process" (a new pytype-single process per '
+        'module) or "ninja" (the build.ninja file in the output directory, '
+        'with the ninja build tool).'),
+    'job_timeout': Item(
+        0, '0', None,
+        'Kill the analysis of a module after this many seconds, unless the '
+        'executor is ninja. 0 for no timeout.'),
+    'max_jobs_per_worker': Item(
+        100, '100', None,
+        'If the executor is worker, replace a worker with a new process after '
+        'it has analyzed this many modules, so that the memory it holds on to '
+        'between modules is released. 0 for no limit.'),
     'output': Item(
         '.pytype', '.pytype', None, 'All pytype output goes here.'),
+    'pickle_output': Item(
+        False, 'False', None,
+        'Pass the inferred interfaces of modules to their dependents as '
+        'pickled ASTs, which are faster to load than pyi files. The outputs '
+        'are written as .pyi.pickled files instead of .pyi files.'),
+    'perf_report': Item(
+        False, 'False', None,
+        'Time the phases of each module\'s analysis, and write a report of the '
+        'slowest modules and phases to perf_report.json and perf_report.html '
+        'in the output directory.'),
+    'max_cycle_passes': Item(
+        3, '3', None,
+        'Unless the executor is ninja, the maximum number of passes over an '
+        'import cycle. Passes stop early once the inferred interfaces stop '
+        'changing.'),
+    'pyi_cache': Item(
+        '', '~/.cache/pytype/pyi', None,
+        'Directory for a cache of parsed pyi files, so that the stubs a module '
+        'imports aren\'t parsed again by every job and run. Empty to '
+        'disable.'),
+    'result_cache': Item(
+        '', '~/.cache/pytype', None,
+        'Directory for a cache of analysis results that is keyed by file '
+        'contents, so it survives checkouts and can be shared. Empty to '
+        'disable.'),
+    'result_cache_size': Item(
+        1024, '1024', None,
+        'Maximum size of the result cache in megabytes. The least recently '
+        'used results are evicted after each run.'),
     'pythonpath': Item(
         '', '.', None,
         'Paths to source code directories, separated by %r.' % os.pathsep),
@@ -101,7 +146,15 @@ def make_converters(cwd=None):
       'keep_going': string_to_bool,
       'inputs': lambda v: file_utils.expand_source_files(v, cwd),
       'output': lambda v: file_utils.expand_path(v, cwd),
+      'perf_report': string_to_bool,
+      'pickle_output': string_to_bool,
       'python_version': get_python_version,
+      'pyi_cache': lambda v: file_utils.expand_path(v, cwd) if v else v,
+      'result_cache': lambda v: file_utils.expand_path(v, cwd) if v else v,
+      'result_cache_size': int,
+      'max_cycle_passes': int,
+      'job_timeout': float,
+      'max_jobs_per_worker': int,
       'pythonpath': lambda v: file_utils.expand_pythonpath(v, cwd),
       'disable': concat_disabled_rules,
   }
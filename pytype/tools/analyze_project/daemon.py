@@ -0,0 +1,173 @@
+"""A long-running pytype server for editors and pre-commit hooks.
+
+The daemon keeps the import graph, the builtins and the parsed pyi files of the
+project in memory, and re-analyzes only what has changed since the last
+request. Clients connect to a Unix socket and send one JSON request, terminated
+by a newline. The daemon answers with one JSON response and closes the
+connection. Requests:
+
+  {"command": "check", "files": [...]}
+      Analyze the files and the modules they depend on. The response has an
+      exit "status", the "errors" found in each file as a list of dicts, and
+      the modules that were "analyzed" to bring the files up to date.
+  {"command": "reload"}
+      Recompute the import graph, e.g. after imports were added or removed.
+  {"command": "shutdown"}
+      Stop the daemon.
+
+Malformed requests get a response with an "error" message.
+"""
+
+from __future__ import print_function
+
+import json
+import logging
+import os
+import socket
+import sys
+import traceback
+
+from pytype.tools.analyze_project import incremental
+
+
+# Requests and responses are small, so we read and write them in one go.
+_BUFFER_SIZE = 1 << 16
+
+
+def _recv_line(conn):
+  chunks = []
+  while True:
+    chunk = conn.recv(_BUFFER_SIZE)
+    if not chunk:
+      break
+    chunks.append(chunk)
+    if chunk.endswith(b'\n'):
+      break
+  return b''.join(chunks).decode('utf-8')
+
+
+def _send_line(conn, message):
+  conn.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+class Daemon(object):
+  """Answers check requests for a project."""
+
+  def __init__(self, socket_path, checker, make_runner):
+    """Constructor.
+
+    Args:
+      socket_path: The Unix socket to listen on.
+      checker: An incremental.IncrementalChecker. It is set up on the first
+        request, so that clients can connect while the daemon warms up.
+      make_runner: A function that recomputes the import graph and returns a
+        new pytype_runner.PytypeRunner, for reload requests.
+    """
+    self.socket_path = socket_path
+    self.checker = checker
+    self.make_runner = make_runner
+    self._is_set_up = False
+    self._running = False
+
+  def handle(self, request):
+    """Handle a request.
+
+    Args:
+      request: The decoded request.
+
+    Returns:
+      The response, as a JSON-serializable dict.
+    """
+    if not isinstance(request, dict):
+      return {'error': 'Request must be a JSON object'}
+    command = request.get('command')
+    if command == 'shutdown':
+      self._running = False
+      return {}
+    if command == 'reload':
+      self.checker.reload(self.make_runner())
+      self._is_set_up = True
+      return {}
+    if command != 'check':
+      return {'error': 'Unknown command: %r' % command}
+    files = request.get('files')
+    if not isinstance(files, list):
+      return {'error': 'Check requests need a list of files'}
+    if not self._is_set_up:
+      self.checker.setup()
+      self._is_set_up = True
+    files = [os.path.abspath(f) for f in files]
+    unknown = [f for f in files if not self.checker.has_source(f)]
+    if unknown:
+      return {'error': 'Not in the project inputs: %s' % ', '.join(unknown)}
+    status, errors = self.checker.check(files)
+    return {'status': status, 'errors': errors,
+            'analyzed': self.checker.analyzed}
+
+  def _serve_one(self, conn):
+    try:
+      request = json.loads(_recv_line(conn))
+    except ValueError as e:
+      response = {'error': 'Invalid request: %s' % e}
+    else:
+      try:
+        response = self.handle(request)
+      except Exception:  # pylint: disable=broad-except
+        message = traceback.format_exc()
+        logging.error('Error while handling %r:\n%s', request, message)
+        response = {'error': message}
+    _send_line(conn, response)
+
+  def serve_forever(self):
+    """Listen for requests until a shutdown request arrives."""
+    if os.path.exists(self.socket_path):
+      # Left behind by a daemon that didn't shut down cleanly.
+      os.remove(self.socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      server.bind(self.socket_path)
+      server.listen(5)
+      print('Listening on %s' % self.socket_path)
+      self._running = True
+      while self._running:
+        conn, _ = server.accept()
+        try:
+          self._serve_one(conn)
+        except socket.error as e:
+          logging.warning('Lost connection to client: %s', e)
+        finally:
+          conn.close()
+    finally:
+      server.close()
+      os.remove(self.socket_path)
+    return 0
+
+
+def request(socket_path, message):
+  """Send a request to a daemon and return its response."""
+  conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    conn.connect(socket_path)
+    _send_line(conn, message)
+    return json.loads(_recv_line(conn))
+  finally:
+    conn.close()
+
+
+def main():
+  """A minimal client: check the given files and print their errors."""
+  if len(sys.argv) < 3:
+    print('Usage: %s socket file [file ...]' % sys.argv[0], file=sys.stderr)
+    return 2
+  response = request(sys.argv[1], {'command': 'check', 'files': sys.argv[2:]})
+  if 'error' in response:
+    print(response['error'], file=sys.stderr)
+    return 2
+  for filename in sorted(response['errors']):
+    for error in response['errors'][filename]:
+      print(incremental.format_error(error, filename))
+  return response['status']
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,60 @@
+"""Tests for daemon.py."""
+
+import os
+import threading
+
+from pytype.tools.analyze_project import daemon
+from pytype.tools.analyze_project import test_utils
+import unittest
+
+
+class TestDaemon(test_utils.TempdirMixin, unittest.TestCase):
+  """Test Daemon."""
+
+  def setUp(self):
+    super(TestDaemon, self).setUp()
+    self.source = self.d.create_file('foo.py')
+    self.checker = test_utils.FakeChecker({self.source})
+    self.daemon = daemon.Daemon(os.path.join(self.d.path, 'daemon.sock'),
+                                self.checker, lambda: 'runner')
+
+  def test_check(self):
+    response = self.daemon.handle({'command': 'check', 'files': [self.source]})
+    self.assertEqual(response, {'status': 0, 'errors': {self.source: []},
+                                'analyzed': ['foo.py']})
+    self.daemon.handle({'command': 'check', 'files': [self.source]})
+    self.assertEqual(self.checker.setups, 1)
+
+  def test_unknown_file(self):
+    response = self.daemon.handle({'command': 'check', 'files': ['/bar.py']})
+    self.assertIn('/bar.py', response['error'])
+
+  def test_reload(self):
+    self.assertEqual(self.daemon.handle({'command': 'reload'}), {})
+    self.assertEqual(self.checker.runner, 'runner')
+
+  def test_bad_requests(self):
+    self.assertIn('error', self.daemon.handle([]))
+    self.assertIn('error', self.daemon.handle({'command': 'frobnicate'}))
+    self.assertIn('error', self.daemon.handle({'command': 'check'}))
+
+  def test_serve(self):
+    thread = threading.Thread(target=self.daemon.serve_forever)
+    thread.start()
+    try:
+      # Wait for the daemon to start listening.
+      for _ in range(100):
+        if os.path.exists(self.daemon.socket_path):
+          break
+        threading.Event().wait(0.05)
+      response = daemon.request(self.daemon.socket_path,
+                                {'command': 'check', 'files': [self.source]})
+      self.assertEqual(response['status'], 0)
+    finally:
+      daemon.request(self.daemon.socket_path, {'command': 'shutdown'})
+      thread.join()
+    self.assertFalse(os.path.exists(self.daemon.socket_path))
+
+
+if __name__ == '__main__':
+  unittest.main()
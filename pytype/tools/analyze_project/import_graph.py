@@ -0,0 +1,172 @@
+"""An importlab import graph that reuses the imports of unchanged files.
+
+Finding a file's imports means parsing it, usually in a subprocess running the
+target Python version, which dominates the cost of building the graph. We keep
+every file's imports in a cache, which can be saved to the output directory and
+reused by the next run. Resolving the imports is cheap, so we redo it every
+time: a new file can change what an unchanged import resolves to.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import importlab.graph
+import importlab.parsepy
+import importlab.resolve
+
+
+def _hash_file(filename):
+  with open(filename, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+
+class ImportCache(object):
+  """The imports of source files, validated against their mtimes and sizes.
+
+  When a file's mtime or size changes, we compare content hashes before
+  parsing it again, so that e.g. switching git branches back and forth doesn't
+  invalidate the cache.
+  """
+
+  def __init__(self, filename=None):
+    self.filename = filename
+    # filename -> (python_version, mtime, size, content hash, imports)
+    self._entries = {}
+    self._dirty = False
+
+  def load(self):
+    """Load the cache from self.filename, if it exists."""
+    try:
+      with open(self.filename, 'r') as f:
+        entries = json.load(f)
+      self._entries = {
+          filename: (tuple(version), mtime, size, digest,
+                     [importlab.parsepy.ImportStatement(*imp)
+                      for imp in imports])
+          for filename, (version, mtime, size, digest, imports)
+          in entries.items()}
+    except (IOError, ValueError, TypeError):
+      self._entries = {}
+    self._dirty = False
+    return self
+
+  def save(self):
+    """Save the cache to self.filename, if anything changed."""
+    if not self._dirty:
+      return
+    self._entries = {f: entry for f, entry in self._entries.items()
+                     if os.path.exists(f)}
+    try:
+      with open(self.filename, 'w') as f:
+        json.dump(self._entries, f, indent=0, sort_keys=True)
+    except IOError:
+      logging.warning('Could not write imports cache: %s', self.filename)
+    self._dirty = False
+
+  def _stat(self, filename):
+    st = os.stat(filename)
+    return st.st_mtime, st.st_size
+
+  def _parse(self, filename, python_version):
+    return importlab.parsepy.get_imports(filename, python_version)
+
+  def get_imports(self, filename, python_version):
+    """Get a file's imports, parsing the file only if it changed.
+
+    Args:
+      filename: The file.
+      python_version: The target Python version, as a tuple.
+
+    Returns:
+      A list of importlab.parsepy.ImportStatement.
+
+    Raises:
+      importlab.parsepy.ParseError: If the file could not be parsed.
+    """
+    python_version = tuple(python_version)
+    try:
+      stat = self._stat(filename)
+    except OSError:
+      stat = None
+    entry = self._entries.get(filename)
+    if stat and entry and entry[0] == python_version:
+      if entry[1:3] == stat:
+        return entry[4]
+      digest = _hash_file(filename)
+      if entry[3] == digest:
+        self._entries[filename] = (python_version,) + stat + entry[3:]
+        self._dirty = True
+        return entry[4]
+    imports = self._parse(filename, python_version)
+    if stat:
+      self._entries[filename] = (
+          (python_version,) + stat + (_hash_file(filename), imports))
+      self._dirty = True
+    return imports
+
+  def update(self, filename, python_version):
+    """Refresh a file's imports.
+
+    Args:
+      filename: The file.
+      python_version: The target Python version, as a tuple.
+
+    Returns:
+      True if the file's imports changed or can no longer be determined, in
+      which case the import graph needs to be rebuilt.
+    """
+    entry = self._entries.get(filename)
+    try:
+      imports = self.get_imports(filename, python_version)
+    except (importlab.parsepy.ParseError, IOError, OSError):
+      self._entries.pop(filename, None)
+      return True
+    return entry is None or entry[4] != imports
+
+
+class ImportGraph(importlab.graph.ImportGraph):
+  """An import graph that gets the imports of files from an ImportCache."""
+
+  def __init__(self, env, cache):
+    super(ImportGraph, self).__init__(env)
+    self.cache = cache
+
+  @classmethod
+  def create(cls, env, filenames, cache, trim=False):
+    """Create and return a final graph.
+
+    Args:
+      env: An importlab.environment.Environment object.
+      filenames: A list of filenames.
+      cache: An ImportCache.
+      trim: Whether to trim the dependencies of builtin and system files.
+
+    Returns:
+      An immutable ImportGraph with the recursive dependencies of all the
+      files in filenames.
+    """
+    import_graph = cls(env, cache)
+    for filename in filenames:
+      import_graph.add_file_recursive(os.path.abspath(filename), trim)
+    import_graph.build()
+    return import_graph
+
+  def get_file_deps(self, filename):
+    # Same as importlab.graph.ImportGraph.get_file_deps, except for the cache.
+    resolved = []
+    unresolved = []
+    parent = self.provenance[filename]
+    r = importlab.resolve.Resolver(self.path, parent)
+    for imp in self.cache.get_imports(filename, self.env.python_version):
+      try:
+        f = r.resolve_import(imp)
+        if isinstance(f, importlab.resolve.Builtin):
+          continue
+        full_path = os.path.abspath(f.path)
+        resolved.append(full_path)
+        self.provenance[full_path] = f
+      except importlab.resolve.ImportException:
+        unresolved.append(imp)
+    return (resolved, unresolved)
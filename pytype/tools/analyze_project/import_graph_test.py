@@ -0,0 +1,121 @@
+"""Tests for import_graph.py."""
+
+import os
+import sys
+
+import importlab.environment
+import importlab.fs
+import importlab.parsepy
+
+from pytype.tools.analyze_project import import_graph
+from pytype.tools.analyze_project import test_utils
+import unittest
+
+
+class CountingImportCache(import_graph.ImportCache):
+  """An ImportCache that counts how many files it parses."""
+
+  def __init__(self, filename=None):
+    super(CountingImportCache, self).__init__(filename)
+    self.parsed = []
+
+  def _parse(self, filename, python_version):
+    self.parsed.append(os.path.basename(filename))
+    return super(CountingImportCache, self)._parse(filename, python_version)
+
+
+class TestImportCache(test_utils.TempdirMixin, unittest.TestCase):
+  """Test ImportCache."""
+
+  def setUp(self):
+    super(TestImportCache, self).setUp()
+    self.python_version = sys.version_info[:2]
+
+  def test_get_imports(self):
+    path = self.d.create_file('foo.py', 'import os')
+    cache = import_graph.ImportCache()
+    imports = cache.get_imports(path, self.python_version)
+    self.assertEqual([imp.name for imp in imports], ['os'])
+    self.assertIs(cache.get_imports(path, self.python_version), imports)
+
+  def test_update(self):
+    path = self.d.create_file('foo.py', 'import os')
+    cache = import_graph.ImportCache()
+    cache.get_imports(path, self.python_version)
+    self.d.create_file('foo.py', 'import os\nx = 0')
+    self.assertFalse(cache.update(path, self.python_version))
+    self.d.create_file('foo.py', 'import sys')
+    self.assertTrue(cache.update(path, self.python_version))
+    self.assertEqual(
+        [imp.name for imp in cache.get_imports(path, self.python_version)],
+        ['sys'])
+
+  def test_update_unparsable(self):
+    path = self.d.create_file('foo.py', 'import os')
+    cache = import_graph.ImportCache()
+    cache.get_imports(path, self.python_version)
+    self.d.create_file('foo.py', 'import')
+    self.assertTrue(cache.update(path, self.python_version))
+
+  def test_touch(self):
+    path = self.d.create_file('foo.py', 'import os')
+    cache = CountingImportCache()
+    cache.get_imports(path, self.python_version)
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    cache.get_imports(path, self.python_version)
+    self.assertEqual(cache.parsed, ['foo.py'])
+
+  def test_python_version(self):
+    path = self.d.create_file('foo.py', 'import os')
+    cache = CountingImportCache()
+    cache.get_imports(path, self.python_version)
+    # pylint: disable=protected-access
+    cache._entries[path] = ((2, 7),) + cache._entries[path][1:]
+    cache.get_imports(path, self.python_version)
+    self.assertEqual(cache.parsed, ['foo.py', 'foo.py'])
+
+  def test_save_and_load(self):
+    path = self.d.create_file('foo.py', 'from os import path')
+    cache_file = os.path.join(self.d.path, '.imports_cache')
+    cache = import_graph.ImportCache(cache_file)
+    imports = cache.get_imports(path, self.python_version)
+    cache.save()
+    cache = CountingImportCache(cache_file).load()
+    self.assertEqual(cache.get_imports(path, self.python_version), imports)
+    self.assertFalse(cache.parsed)
+
+  def test_load_bad_file(self):
+    cache_file = self.d.create_file('.imports_cache', '{"foo.py": 42}')
+    cache = CountingImportCache(cache_file).load()
+    cache.get_imports(self.d.create_file('foo.py'), self.python_version)
+    self.assertEqual(cache.parsed, ['foo.py'])
+
+  def test_save_drops_deleted_files(self):
+    path = self.d.create_file('foo.py', 'import os')
+    cache_file = os.path.join(self.d.path, '.imports_cache')
+    cache = import_graph.ImportCache(cache_file)
+    cache.get_imports(path, self.python_version)
+    os.remove(path)
+    cache.save()
+    with open(cache_file) as f:
+      self.assertNotIn(path, f.read())
+
+  def test_graph(self):
+    foo = self.d.create_file('foo.py', 'import bar')
+    self.d.create_file('bar.py')
+    path = importlab.fs.Path()
+    path.add_path(self.d.path, 'os')
+    env = importlab.environment.Environment(path, self.python_version)
+    cache = CountingImportCache()
+    graph = import_graph.ImportGraph.create(env, [foo], cache)
+    sources = [os.path.basename(f) for f, in graph.sorted_source_files()]
+    self.assertEqual(sources, ['bar.py', 'foo.py'])
+    self.assertEqual(sorted(cache.parsed), ['bar.py', 'foo.py'])
+    cache.parsed = []
+    import_graph.ImportGraph.create(env, [foo], cache)
+    self.assertFalse(cache.parsed)
+
+
+if __name__ == '__main__':
+  unittest.main()
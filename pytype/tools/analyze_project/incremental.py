@@ -0,0 +1,246 @@
+"""Re-check a project in one process, re-analyzing only what has changed.
+
+The result of analyzing a module depends only on its source and on the pyi
+files of its dependencies. We remember both for every module, so that after a
+change we analyze only the modules whose source changed and the dependents
+whose imported interfaces changed.
+"""
+
+import hashlib
+import logging
+import os
+import traceback
+
+from pytype import config as pytype_config
+from pytype import io
+from pytype import load_pytd
+from pytype import utils
+from pytype.pytd.parse import node
+from pytype.tools.analyze_project import worker_pool
+
+
+class _ModuleState(object):
+  """What a module's last analysis was based on, and what it found."""
+
+  def __init__(self, source_hash, dep_versions, status, errors):
+    self.source_hash = source_hash
+    # Maps the output of each dependency to its version at the time.
+    self.dep_versions = dep_versions
+    self.status = status
+    self.errors = errors
+
+
+def _hash_source(path):
+  try:
+    with open(path, 'rb') as f:
+      return hashlib.sha256(f.read()).hexdigest()
+  except IOError:
+    return None
+
+
+def _read_output(path):
+  try:
+    with open(path, 'rb') as f:
+      return f.read()
+  except IOError:
+    return None
+
+
+def _crash_error(filename, message):
+  return {'filename': filename, 'lineno': 0, 'name': 'pytype-error',
+          'severity': 'error', 'message': message, 'details': None,
+          'methodname': None, 'traceback': None}
+
+
+def run_statement(args, filename):
+  """Analyze a module in this process.
+
+  Args:
+    args: The pytype-single command-line arguments.
+    filename: The module's source file, for reporting crashes.
+
+  Returns:
+    A tuple of the exit status and a list of errors as dicts.
+  """
+  try:
+    options = pytype_config.Options(args)
+    node.SetCheckPreconditions(options.check_preconditions)
+    errorlog = io.check_and_write_outputs(options)
+  except utils.UsageError as e:
+    return 1, [_crash_error(filename, 'Usage error: %s' % utils.message(e))]
+  except SystemExit:
+    # Raised by the argument parser, which has already logged the problem.
+    return 1, [_crash_error(filename, 'Invalid pytype-single arguments')]
+  except Exception:  # pylint: disable=broad-except
+    message = traceback.format_exc()
+    logging.error('Uncaught exception while analyzing %s:\n%s',
+                  filename, message)
+    return 1, [_crash_error(filename, message)]
+  if not options.report_errors:
+    return 0, []
+  return (1 if errorlog.has_error() else 0,
+          [e.as_dict() for e in errorlog.unique_sorted_errors()])
+
+
+def format_error(error, filename):
+  """Format an error dict like pytype-single formats errors."""
+  return '%s:%d: %s: %s [%s]' % (
+      error['filename'] or filename, error['lineno'], error['severity'],
+      error['message'], error['name'])
+
+
+class IncrementalChecker(object):
+  """Keeps a project's analysis results up to date across source changes.
+
+  Attributes:
+    runner: The pytype_runner.PytypeRunner whose build statements we run.
+    analyzed: The modules analyzed by the last call to check(), in order.
+  """
+
+  def __init__(self, runner, run=run_statement):
+    self.runner = runner
+    self._run_statement = run
+    self.analyzed = []
+    self._nodes = []
+    self._producers = {}  # output -> index of the node producing it
+    self._sources = {}  # source file -> index of the node analyzing it
+    # Each output's version is bumped whenever its contents change.
+    self._versions = {}
+    self._contents = {}
+    self._states = {}  # output -> _ModuleState
+    # Dependencies' pyi files are mostly unchanged from one check to the next.
+    load_pytd.enable_parsed_pyi_cache()
+
+  def setup(self):
+    """Write out the imports files and collect the build statements."""
+    self.runner.build_statements = []
+    self.runner.setup_build()
+    self._nodes = list(self.runner.build_statements)
+    self._producers = {}
+    self._sources = {}
+    for i, n in enumerate(self._nodes):
+      for statement in self._get_statements(n):
+        self._producers[statement.output] = i
+        self._sources[statement.module.full_path] = i
+
+  def reload(self, runner):
+    """Switch to a new import graph, keeping the results that still apply."""
+    self.runner = runner
+    self.setup()
+
+  def has_source(self, filename):
+    return filename in self._sources
+
+  def sources(self):
+    return set(self._sources)
+
+  def _get_statements(self, n):
+    if isinstance(n, worker_pool.Cycle):
+      return n.statements
+    return (n,)
+
+  def _dependencies(self, i):
+    return {self._producers[d] for s in self._get_statements(self._nodes[i])
+            for d in s.deps if d in self._producers and self._producers[d] != i}
+
+  def _closure(self, indices):
+    """Get the given nodes and everything that they depend on."""
+    seen = set()
+    todo = list(indices)
+    while todo:
+      i = todo.pop()
+      if i not in seen:
+        seen.add(i)
+        todo.extend(self._dependencies(i))
+    return seen
+
+  def _dep_versions(self, statement, exclude=()):
+    return {d: self._versions.get(d, 0) for d in statement.deps
+            if d not in exclude}
+
+  def _is_stale(self, statement, exclude=()):
+    state = self._states.get(statement.output)
+    return (state is None or
+            state.source_hash != _hash_source(statement.module.full_path) or
+            state.dep_versions != self._dep_versions(statement, exclude) or
+            self._contents.get(statement.output) is None)
+
+  def _run(self, statement):
+    """Analyze a statement's module and note whether its output changed."""
+    status, errors = self._run_statement(
+        self.runner.get_pytype_args(statement), statement.module.full_path)
+    contents = _read_output(statement.output)
+    changed = contents != self._contents.get(statement.output)
+    if changed:
+      self._contents[statement.output] = contents
+      self._versions[statement.output] = (
+          self._versions.get(statement.output, 0) + 1)
+    return status, errors, changed
+
+  def _record(self, statement, status, errors, exclude=()):
+    self._states[statement.output] = _ModuleState(
+        _hash_source(statement.module.full_path),
+        self._dep_versions(statement, exclude), status, errors)
+
+  def _update(self, statement):
+    if not self._is_stale(statement):
+      return
+    self.analyzed.append(statement.module.name)
+    status, errors, _ = self._run(statement)
+    self._record(statement, status, errors)
+
+  def _update_cycle(self, cycle):
+    """Analyze an import cycle until its members' outputs stop changing."""
+    outputs = {s.output for s in cycle.statements}
+    if not any(self._is_stale(s, outputs) for s in cycle.statements):
+      return
+    if any(self._contents.get(s.output) is None for s in cycle.statements):
+      for statement in cycle.bootstrap_statements:
+        self._run(statement)
+    results = {}
+    for _ in range(max(self.runner.max_cycle_passes, 2)):
+      changed = False
+      for statement in cycle.statements:
+        self.analyzed.append(statement.module.name)
+        status, errors, member_changed = self._run(statement)
+        results[statement] = (status, errors)
+        changed |= member_changed
+      if not changed:
+        break
+    else:
+      logging.warning('Import cycle did not converge: %s',
+                      ', '.join(s.module.name for s in cycle.statements))
+    for statement, (status, errors) in results.items():
+      self._record(statement, status, errors, outputs)
+
+  def check(self, filenames):
+    """Bring the given files up to date and get their errors.
+
+    Only the files and their transitive dependencies are considered. Of those,
+    we analyze the ones whose source changed and the ones with a dependency
+    whose pyi changed since they were last analyzed.
+
+    Args:
+      filenames: A sequence of source files. Each must have a build statement.
+
+    Returns:
+      A tuple of the exit status and a map from filename to a list of errors
+      as dicts.
+    """
+    self.analyzed = []
+    filenames = [os.path.abspath(f) for f in filenames]
+    for i in sorted(self._closure(self._sources[f] for f in filenames)):
+      n = self._nodes[i]
+      if isinstance(n, worker_pool.Cycle):
+        self._update_cycle(n)
+      else:
+        self._update(n)
+    status = 0
+    errors = {}
+    for f in filenames:
+      for statement in self._get_statements(self._nodes[self._sources[f]]):
+        if statement.module.full_path == f:
+          state = self._states[statement.output]
+          status = status or state.status
+          errors[f] = state.errors
+    return status, errors
@@ -0,0 +1,125 @@
+"""Tests for incremental.py."""
+
+import os
+
+from pytype.tools.analyze_project import incremental
+from pytype.tools.analyze_project import test_utils
+from pytype.tools.analyze_project import worker_pool
+import unittest
+
+
+class FakeRunner(object):
+  """Just enough of the PytypeRunner interface to run tests."""
+
+  def __init__(self, statements, max_cycle_passes=3):
+    self.statements = statements
+    self.max_cycle_passes = max_cycle_passes
+    self.build_statements = []
+
+  def setup_build(self):
+    self.build_statements.extend(self.statements)
+
+  def get_pytype_args(self, statement):
+    return [statement.output, statement.imports, statement.module.full_path]
+
+
+class TestIncrementalChecker(test_utils.BuildStatementMixin,
+                             unittest.TestCase):
+  """Test IncrementalChecker."""
+
+  def setUp(self):
+    super(TestIncrementalChecker, self).setUp()
+    self.started = []
+    # Maps a source file to the interface its analysis produces.
+    self.interfaces = {}
+
+  def run_statement(self, args, filename):
+    output, _, source = args
+    self.started.append(os.path.basename(source))
+    with open(output, 'w') as f:
+      f.write(self.interfaces.get(source, ''))
+    with open(source) as f:
+      if 'error' in f.read():
+        return 1, [{'filename': filename, 'name': 'name-error'}]
+    return 0, []
+
+  def make_checker(self, statements):
+    checker = incremental.IncrementalChecker(
+        FakeRunner(statements), self.run_statement)
+    checker.setup()
+    return checker
+
+  def check(self, checker, *names):
+    self.started = []
+    return checker.check([os.path.join(self.d.path, name + '.py')
+                          for name in names])
+
+  def test_check(self):
+    checker = self.make_checker([
+        self.make_statement('a'), self.make_statement('b', ['a']),
+        self.make_statement('c')])
+    self.assertEqual(self.check(checker, 'b'),
+                     (0, {os.path.join(self.d.path, 'b.py'): []}))
+    self.assertEqual(self.started, ['a.py', 'b.py'])
+    self.assertEqual(checker.analyzed, ['a', 'b'])
+
+  def test_up_to_date(self):
+    checker = self.make_checker([
+        self.make_statement('a'), self.make_statement('b', ['a'])])
+    self.check(checker, 'b')
+    self.check(checker, 'b')
+    self.assertFalse(self.started)
+
+  def test_unchanged_interface(self):
+    checker = self.make_checker([
+        self.make_statement('a'), self.make_statement('b', ['a'])])
+    self.check(checker, 'b')
+    self.d.create_file('a.py', 'x = 0')
+    self.check(checker, 'b')
+    self.assertEqual(self.started, ['a.py'])
+
+  def test_changed_interface(self):
+    checker = self.make_checker([
+        self.make_statement('a'), self.make_statement('b', ['a']),
+        self.make_statement('c', ['b'])])
+    self.check(checker, 'c')
+    path = self.d.create_file('a.py', 'x = 0')
+    self.interfaces[path] = 'x: int'
+    self.check(checker, 'c')
+    # c only sees b's interface, which didn't change.
+    self.assertEqual(self.started, ['a.py', 'b.py'])
+
+  def test_errors(self):
+    checker = self.make_checker([self.make_statement('a')])
+    path = self.d.create_file('a.py', 'error')
+    self.assertEqual(self.check(checker, 'a'),
+                     (1, {path: [{'filename': path, 'name': 'name-error'}]}))
+    self.d.create_file('a.py', '')
+    self.assertEqual(self.check(checker, 'a'), (0, {path: []}))
+
+  def test_cycle(self):
+    statements = [self.make_statement('a', ['b']),
+                  self.make_statement('b', ['a'])]
+    bootstrap_statements = [s._replace(deps=()) for s in statements]
+    checker = self.make_checker([
+        worker_pool.Cycle(tuple(statements), tuple(bootstrap_statements)),
+        self.make_statement('c', ['a'])])
+    self.check(checker, 'c')
+    # A bootstrap pass, then a pass that changes nothing.
+    self.assertEqual(self.started, ['a.py', 'b.py', 'a.py', 'b.py', 'c.py'])
+    self.d.create_file('b.py', 'x = 0')
+    self.check(checker, 'c')
+    self.assertEqual(self.started, ['a.py', 'b.py'])
+
+  def test_reload(self):
+    a, b = self.make_statement('a'), self.make_statement('b')
+    checker = self.make_checker([a, b])
+    self.check(checker, 'a', 'b')
+    # b now imports a.
+    checker.reload(FakeRunner([a, self.make_statement('b', ['a'])]))
+    self.check(checker, 'a', 'b')
+    self.assertEqual(self.started, ['b.py'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -19,21 +19,25 @@
 from __future__ import print_function
 
 import logging
+import os
 import sys
 import tempfile
 
 import importlab.environment
 import importlab.fs
-import importlab.graph
 import importlab.output
 
 from pytype import io
 from pytype.tools import environment
 from pytype.tools import tool_utils
 from pytype.tools.analyze_project import config
+from pytype.tools.analyze_project import daemon
 from pytype.tools.analyze_project import environment as analyze_project_env
+from pytype.tools.analyze_project import import_graph as import_graph_lib
+from pytype.tools.analyze_project import incremental
 from pytype.tools.analyze_project import parse_args
 from pytype.tools.analyze_project import pytype_runner
+from pytype.tools.analyze_project import watch
 
 
 def main():
@@ -74,7 +78,10 @@ def main():
   typeshed = environment.initialize_typeshed_or_die()
   env = analyze_project_env.create_importlab_environment(conf, typeshed)
   print('Computing dependencies')
-  import_graph = importlab.graph.ImportGraph.create(env, conf.inputs, trim=True)
+  import_cache = import_graph_lib.ImportCache(
+      os.path.join(conf.output, '.imports_cache')).load()
+  import_graph = import_graph_lib.ImportGraph.create(
+      env, conf.inputs, import_cache, trim=True)
 
   if args.tree:
     print('Source tree:')
@@ -92,8 +99,27 @@ def main():
   logging.info('Source tree:\n%s',
                importlab.output.formatted_deps_list(import_graph))
   tool_utils.makedirs_or_die(conf.output, 'Could not create output directory')
+  import_cache.save()
   deps = pytype_runner.deps_from_import_graph(import_graph)
   runner = pytype_runner.PytypeRunner(conf, deps)
+
+  def make_runner():
+    # Only the files that changed since the last graph are parsed again.
+    import_graph = import_graph_lib.ImportGraph.create(
+        env, conf.inputs, import_cache, trim=True)
+    import_cache.save()
+    return pytype_runner.PytypeRunner(
+        conf, pytype_runner.deps_from_import_graph(import_graph))
+
+  if args.daemon:
+    server = daemon.Daemon(os.path.join(conf.output, 'daemon.sock'),
+                           incremental.IncrementalChecker(runner), make_runner)
+    return server.serve_forever()
+
+  if args.watch:
+    return watch.Watch(conf, incremental.IncrementalChecker(runner),
+                       make_runner, import_cache, watch.create_watcher()).run()
+
   return runner.run()
 
 
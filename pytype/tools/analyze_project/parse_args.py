@@ -5,6 +5,7 @@ import argparse
 from pytype import config as pytype_config
 from pytype.tools import arg_parser
 from pytype.tools.analyze_project import config
+from pytype.tools.analyze_project import pytype_runner
 
 
 _ARG_PREFIX = '--'
@@ -70,6 +71,13 @@ def make_parser():
   modes.add_argument(
       '--unresolved', dest='unresolved', action='store_true', default=False,
       help='Display unresolved dependencies.')
+  modes.add_argument(
+      '--daemon', dest='daemon', action='store_true', default=False,
+      help=('Keep running and answer check requests on a Unix socket in the '
+            'output directory.'))
+  modes.add_argument(
+      '--watch', dest='watch', action='store_true', default=False,
+      help='Keep running and re-check the inputs whenever a source changes.')
   modes.add_argument(
       '--generate-config', dest='generate_config', type=str, action='store',
       default='',
@@ -94,6 +102,15 @@ def make_parser():
       (('inputs',), {'metavar': 'input', 'nargs': '*', 'action': 'flatten'}),
       (('-k', '--keep-going'), {'action': 'store_true', 'type': None}),
       (('-j', '--jobs'), {'action': 'store', 'type': int, 'metavar': 'N'}),
+      (('--executor',), {'choices': pytype_runner.EXECUTORS}),
+      (('--job-timeout',), {'metavar': 'SECONDS'}),
+      (('--max-jobs-per-worker',), {'metavar': 'N'}),
+      (('--max-cycle-passes',), {'metavar': 'N'}),
+      (('--perf-report',), {'action': 'store_true', 'type': None}),
+      (('--pickle-output',), {'action': 'store_true', 'type': None}),
+      (('--pyi-cache',), {'metavar': 'DIR'}),
+      (('--result-cache',), {'metavar': 'DIR'}),
+      (('--result-cache-size',), {'metavar': 'MB'}),
       (('-P', '--pythonpath'),),
       (('-V', '--python-version'),)
   ]:
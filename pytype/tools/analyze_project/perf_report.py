@@ -0,0 +1,205 @@
+"""A performance profile of a whole project.
+
+With --perf-report, every pytype-single job writes its --metrics next to its
+output. This module collects them into one report that ranks the slowest
+modules, and for each phase of the analysis, the modules that spend the most
+time in it. The phases nest (e.g. pyi files are loaded while the module runs),
+so the times of a module's phases don't add up to its total.
+"""
+
+import json
+import logging
+from xml.sax import saxutils
+
+from pytype import metrics
+
+import yaml
+
+
+# The timed phases of a pytype-single run, as (metric name, description).
+PHASES = (
+    ('total_time', 'Total'),
+    ('load_pyi_time', 'Parsing and loading pyi files'),
+    ('resolve_pyi_time', 'Resolving references in pyi files'),
+    ('compile_time', 'Compiling to bytecode'),
+    ('run_program_time', 'Running the module-level code'),
+    ('analyze_time', 'Analyzing functions and classes'),
+    ('compute_types_time', 'Computing the inferred types'),
+    ('optimize_time', 'Optimizing the pyi'),
+)
+
+# How many modules to list per phase.
+_TOP_MODULES = 10
+
+METRICS_SUFFIX = '.metrics'
+
+
+def metrics_file(output):
+  """The file that the job producing the given output writes its metrics to."""
+  return output + METRICS_SUFFIX
+
+
+def read_timings(filename):
+  """Read the phase timings from a --metrics file.
+
+  Args:
+    filename: The metrics file.
+
+  Returns:
+    A dict from phase name to seconds, or None if the file couldn't be read.
+  """
+  try:
+    with open(filename, 'r') as f:
+      recorded = metrics.load(f)
+  except (IOError, OSError, yaml.YAMLError):
+    return None
+  phases = {name for name, _ in PHASES}
+  return {m.name: m.seconds for m in recorded or ()
+          if m.name in phases and hasattr(m, 'seconds')}
+
+
+def _read_peak_rss(results_file):
+  """Read each output's peak RSS from a worker_pool results file."""
+  if not results_file:
+    return {}
+  try:
+    with open(results_file, 'r') as f:
+      results = json.load(f)
+  except (IOError, OSError, ValueError):
+    return {}
+  return {r['output']: r.get('peak_rss_kib') for r in results}
+
+
+def collect(statements, results_file=None):
+  """Collect the timings of the modules that were analyzed.
+
+  Args:
+    statements: The build statements, as pytype_runner.BuildStatement or
+      worker_pool.Cycle objects. For a cycle, only the final pass is reported.
+    results_file: Optionally, the results file written by worker_pool.build,
+      for each module's peak memory use.
+
+  Returns:
+    A list of dicts, one per module with a metrics file.
+  """
+  peak_rss = _read_peak_rss(results_file)
+  modules = []
+  for n in statements:
+    for statement in getattr(n, 'statements', (n,)):
+      timings = read_timings(metrics_file(statement.output))
+      if timings is None:
+        continue
+      modules.append({
+          'module': statement.module.name,
+          'source': statement.module.full_path,
+          'action': statement.action,
+          'phases': timings,
+          'peak_rss_kib': peak_rss.get(statement.output),
+      })
+  return modules
+
+
+def make_report(modules):
+  """Rank the modules and phases.
+
+  Args:
+    modules: The modules, as returned by collect().
+
+  Returns:
+    A JSON-serializable dict with the modules ranked by total time, each phase
+    with its total time and slowest modules, and the modules with the highest
+    peak memory use.
+  """
+  def slowest(phase):
+    return sorted((m for m in modules if m['phases'].get(phase)),
+                  key=lambda m: m['phases'][phase], reverse=True)
+  phases = []
+  for name, description in PHASES:
+    ranked = slowest(name)
+    phases.append({
+        'phase': name,
+        'description': description,
+        'seconds': sum(m['phases'][name] for m in ranked),
+        'slowest': [{'module': m['module'], 'seconds': m['phases'][name]}
+                    for m in ranked[:_TOP_MODULES]],
+    })
+  # The most expensive phases are listed first, but the total stays first.
+  phases[1:] = sorted(phases[1:], key=lambda p: p['seconds'], reverse=True)
+  memory = sorted((m for m in modules if m['peak_rss_kib']),
+                  key=lambda m: m['peak_rss_kib'], reverse=True)
+  return {
+      'modules': slowest('total_time'),
+      'phases': phases,
+      'peak_memory': [{'module': m['module'], 'peak_rss_kib': m['peak_rss_kib']}
+                      for m in memory[:_TOP_MODULES]],
+  }
+
+
+def _html_table(headers, rows):
+  lines = ['<table>', '<tr>%s</tr>' % ''.join(
+      '<th>%s</th>' % saxutils.escape(h) for h in headers)]
+  for row in rows:
+    lines.append('<tr>%s</tr>' % ''.join(
+        '<td>%s</td>' % saxutils.escape(str(cell)) for cell in row))
+  lines.append('</table>')
+  return '\n'.join(lines)
+
+
+def _seconds(value):
+  return '' if value is None else '%.2f' % value
+
+
+def format_html(report):
+  """Format a report as a standalone HTML page."""
+  parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">',
+           '<title>pytype performance report</title>',
+           '<style>table{border-collapse:collapse;margin-bottom:2em}'
+           'td,th{border:1px solid #ccc;padding:2px 8px;text-align:left}'
+           '</style>',
+           '</head><body>', '<h1>pytype performance report</h1>']
+  parts.append('<h2>Phases</h2>')
+  parts.append(_html_table(
+      ['Phase', 'Seconds', 'Slowest modules'],
+      [(p['description'], _seconds(p['seconds']),
+        ', '.join('%s (%s)' % (m['module'], _seconds(m['seconds']))
+                  for m in p['slowest'][:3]))
+       for p in report['phases']]))
+  if report['peak_memory']:
+    parts.append('<h2>Peak memory</h2>')
+    parts.append(_html_table(
+        ['Module', 'Peak RSS (MiB)'],
+        [(m['module'], '%.1f' % (m['peak_rss_kib'] / 1024.0))
+         for m in report['peak_memory']]))
+  parts.append('<h2>Modules</h2>')
+  phase_names = [name for name, _ in PHASES]
+  parts.append(_html_table(
+      ['Module', 'Action'] + phase_names + ['Peak RSS (KiB)'],
+      [[m['module'], m['action']] +
+       [_seconds(m['phases'].get(name)) for name in phase_names] +
+       [m['peak_rss_kib'] or ''] for m in report['modules']]))
+  parts.append('</body></html>')
+  return '\n'.join(parts) + '\n'
+
+
+def write(statements, json_file, html_file, results_file=None):
+  """Collect the metrics of a build and write the report.
+
+  Args:
+    statements: The build statements.
+    json_file: Where to write the report as JSON.
+    html_file: Where to write the report as HTML.
+    results_file: Optionally, the results file written by worker_pool.build.
+
+  Returns:
+    The report, or None if no module has metrics.
+  """
+  modules = collect(statements, results_file)
+  if not modules:
+    logging.warning('No metrics found for the performance report')
+    return None
+  report = make_report(modules)
+  with open(json_file, 'w') as f:
+    json.dump(report, f, indent=2, sort_keys=True)
+  with open(html_file, 'w') as f:
+    f.write(format_html(report))
+  return report
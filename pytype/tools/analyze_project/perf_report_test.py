@@ -0,0 +1,89 @@
+"""Tests for perf_report.py."""
+
+import json
+import os
+
+from pytype import metrics
+from pytype import module_utils
+from pytype.tools.analyze_project import perf_report
+from pytype.tools.analyze_project import pytype_runner
+from pytype.tools.analyze_project import test_utils
+from pytype.tools.analyze_project import worker_pool
+import unittest
+
+
+class TestPerfReport(test_utils.BuildStatementMixin, unittest.TestCase):
+  """Test collecting and reporting metrics."""
+
+  def tearDown(self):
+    super(TestPerfReport, self).tearDown()
+    metrics._prepare_for_test(enabled=False)  # pylint: disable=protected-access
+
+  def make_timed_statement(self, name, times):
+    """Make a build statement whose job recorded the given phase times."""
+    output = os.path.join(self.d.path, name + '.pyi')
+    # pylint: disable=protected-access
+    metrics._prepare_for_test()
+    for phase, seconds in times.items():
+      metrics.ReentrantStopWatch(phase)._time = seconds
+    metrics.Counter('unrelated').inc()
+    with open(perf_report.metrics_file(output), 'w') as f:
+      metrics.dump(list(metrics._registered_metrics.values()), f)
+    return self.make_statement(name, imports=name + '.imports')
+
+  def test_read_timings(self):
+    statement = self.make_timed_statement('foo', {'total_time': 2.0})
+    self.assertEqual(
+        perf_report.read_timings(perf_report.metrics_file(statement.output)),
+        {'total_time': 2.0})
+
+  def test_read_missing_timings(self):
+    self.assertIsNone(perf_report.read_timings(
+        os.path.join(self.d.path, 'foo.pyi.metrics')))
+
+  def test_collect(self):
+    foo = self.make_timed_statement('foo', {'total_time': 1.0})
+    bar = self.make_timed_statement('bar', {'total_time': 3.0})
+    missing = pytype_runner.BuildStatement(
+        module_utils.Module(self.d.path, 'baz.py', 'baz'),
+        pytype_runner.Action.INFER, (), 'baz.imports',
+        os.path.join(self.d.path, 'baz.pyi'))
+    cycle = worker_pool.Cycle((bar,), ())
+    results_file = self.d.create_file('results.json', json.dumps(
+        [{'output': bar.output, 'peak_rss_kib': 2048}]))
+    modules = perf_report.collect([foo, missing, cycle], results_file)
+    self.assertEqual([m['module'] for m in modules], ['foo', 'bar'])
+    self.assertEqual([m['peak_rss_kib'] for m in modules], [None, 2048])
+
+  def test_report(self):
+    statements = [
+        self.make_timed_statement('foo', {'total_time': 1.0,
+                                          'analyze_time': 0.5,
+                                          'load_pyi_time': 0.1}),
+        self.make_timed_statement('bar', {'total_time': 3.0,
+                                          'analyze_time': 0.2,
+                                          'load_pyi_time': 2.0}),
+    ]
+    json_file = os.path.join(self.d.path, 'perf_report.json')
+    html_file = os.path.join(self.d.path, 'perf_report.html')
+    perf_report.write(statements, json_file, html_file)
+    with open(json_file) as f:
+      report = json.load(f)
+    self.assertEqual([m['module'] for m in report['modules']], ['bar', 'foo'])
+    phases = [p['phase'] for p in report['phases']]
+    self.assertEqual(phases[:3],
+                     ['total_time', 'load_pyi_time', 'analyze_time'])
+    analyze = report['phases'][2]
+    self.assertAlmostEqual(analyze['seconds'], 0.7)
+    self.assertEqual([m['module'] for m in analyze['slowest']], ['foo', 'bar'])
+    with open(html_file) as f:
+      self.assertIn('<td>bar</td>', f.read())
+
+  def test_no_metrics(self):
+    json_file = os.path.join(self.d.path, 'perf_report.json')
+    self.assertIsNone(perf_report.write([], json_file, json_file + '.html'))
+    self.assertFalse(os.path.exists(json_file))
+
+
+if __name__ == '__main__':
+  unittest.main()
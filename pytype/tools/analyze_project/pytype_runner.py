@@ -2,14 +2,21 @@
 
 from __future__ import print_function
 
+import collections
 import logging
 import os
+import re
 import subprocess
 import sys
 
 from pytype import file_utils
+from pytype import load_pytd
 from pytype import module_utils
+from pytype import result_cache
 from pytype.tools.analyze_project import config
+from pytype.tools.analyze_project import perf_report
+from pytype.tools.analyze_project import timings
+from pytype.tools.analyze_project import worker_pool
 import six
 
 
@@ -32,7 +39,29 @@ class Stage(object):
   SECOND_PASS = 'second pass'
 
 
+class Executor(object):
+  FORK = 'fork'
+  NINJA = 'ninja'
+  PROCESS = 'process'
+  WORKER = 'worker'
+
+
+EXECUTORS = (Executor.WORKER, Executor.FORK, Executor.PROCESS, Executor.NINJA)
+
+
 FIRST_PASS_SUFFIX = '-1'
+CYCLE_SUFFIX = '-cycle'
+
+
+# A single pytype-single invocation, as described by a ninja build statement.
+# Args:
+#   module: A module_utils.Module object.
+#   action: An Action object.
+#   deps: The outputs of the build statements that this one depends on.
+#   imports: The imports file.
+#   output: The output file.
+BuildStatement = collections.namedtuple(
+    'BuildStatement', ['module', 'action', 'deps', 'imports', 'output'])
 
 
 if sys.executable is not None:
@@ -133,11 +162,27 @@ class PytypeRunner(object):
     self.python_version = conf.python_version
     self.pyi_dir = os.path.join(conf.output, 'pyi')
     self.imports_dir = os.path.join(conf.output, 'imports')
+    self.default_output = os.path.join(self.imports_dir, 'default.pyi')
     self.ninja_file = os.path.join(conf.output, 'build.ninja')
     self.custom_options = [
         (k, getattr(conf, k)) for k in set(conf.__slots__) - set(config.ITEMS)]
     self.keep_going = conf.keep_going
     self.jobs = conf.jobs
+    self.executor = conf.executor
+    self.pyi_cache = conf.pyi_cache
+    self.result_cache = conf.result_cache
+    self.result_cache_size = conf.result_cache_size
+    self.max_cycle_passes = conf.max_cycle_passes
+    self.job_timeout = conf.job_timeout or None
+    self.max_jobs_per_worker = conf.max_jobs_per_worker or None
+    self.perf_report = conf.perf_report
+    self.pickle_output = conf.pickle_output
+    self.worker_log = os.path.join(conf.output, '.worker_log')
+    self.results_file = os.path.join(conf.output, 'results.json')
+    self.timings_file = os.path.join(conf.output, '.timings')
+    self.perf_report_json = os.path.join(conf.output, 'perf_report.json')
+    self.perf_report_html = os.path.join(conf.output, 'perf_report.html')
+    self.build_statements = []
 
   def set_custom_options(self, flags_with_values, binary_flags):
     """Merge self.custom_options into flags_with_values and binary_flags."""
@@ -166,7 +211,18 @@ class PytypeRunner(object):
         '--quick',
         '--analyze-annotated' if report_errors else '--no-report-errors',
         '--nofail',
+        # Leave a module's pyi untouched when its interface does not change, so
+        # that its dependents are not rebuilt.
+        '--no-rewrite-unchanged',
     }
+    if self.pyi_cache:
+      flags_with_values['--pyi-cache'] = self.pyi_cache
+    if self.result_cache:
+      flags_with_values['--result-cache'] = self.result_cache
+    if self.perf_report:
+      flags_with_values['--metrics'] = perf_report.metrics_file('$out')
+    if self.pickle_output:
+      binary_flags.update(('--pickle-output', '--use-pickled-files'))
     if report_errors:
       self.set_custom_options(flags_with_values, binary_flags)
     # Order the flags so that ninja recognizes commands across runs.
@@ -177,6 +233,22 @@ class PytypeRunner(object):
         ['$in']
     )
 
+  def get_pytype_args(self, statement):
+    """Get the pytype-single arguments for running a build statement."""
+    substitutions = {
+        'imports': statement.imports,
+        'out': statement.output,
+        'module': statement.module.name,
+        'in': statement.module.full_path,
+    }
+    def substitute(match):
+      return substitutions.get(match.group(1), match.group(0))
+    command = self.get_pytype_command_for_ninja(
+        report_errors=statement.action == Action.CHECK)
+    # Like ninja, substitute variables inside of arguments, too.
+    return [re.sub(r'\$(\w+)', substitute, arg)
+            for arg in command[len(PYTYPE_SINGLE):]]
+
   def make_imports_dir(self):
     try:
       file_utils.makedirs(self.imports_dir)
@@ -187,7 +259,7 @@ class PytypeRunner(object):
 
   def write_default_pyi(self):
     """Write a default pyi file."""
-    output = os.path.join(self.imports_dir, 'default.pyi')
+    output = self.default_output
     with open(output, 'w') as f:
       f.write(DEFAULT_PYI)
     return output
@@ -257,11 +329,13 @@ class PytypeRunner(object):
         command = ' '.join(
             self.get_pytype_command_for_ninja(report_errors=report_errors))
         logging.info('%s command: %s', action, command)
+        # restat tells ninja to check whether the output actually changed
+        # before rebuilding the statements that depend on it.
         f.write(
             'rule {action}\n'
             '  command = {command}\n'
-            '  description = {action} $module\n'.format(
-                action=action, command=command)
+            '  description = {action} $module\n'
+            '  restat = 1\n'.format(action=action, command=command)
         )
 
   def write_build_statement(self, module, action, deps, imports, suffix):
@@ -277,8 +351,9 @@ class PytypeRunner(object):
     Returns:
       The expected output of the build statement.
     """
+    ext = '.pyi' + load_pytd.PICKLE_EXT if self.pickle_output else '.pyi'
     output = os.path.join(self.pyi_dir,
-                          _module_to_output_path(module) + '.pyi' + suffix)
+                          _module_to_output_path(module) + ext + suffix)
     logging.info('%s %s\n  imports: %s\n  deps: %s\n  output: %s',
                  action, module.name, imports, deps, output)
     with open(self.ninja_file, 'a') as f:
@@ -296,6 +371,10 @@ class PytypeRunner(object):
   def setup_build(self):
     """Write out the full build.ninja file.
 
+    Also collects self.build_statements for the worker pool executor, which
+    analyzes import cycles until they reach a fixed point instead of running
+    the two ninja passes.
+
     Returns:
       All files with build statements.
     """
@@ -306,6 +385,8 @@ class PytypeRunner(object):
     files = set()
     module_to_imports_map = {}
     module_to_output = {}
+    first_pass = {}
+    cycle = []
     for module, action, deps, stage in self.yield_sorted_modules():
       if files >= self.filenames:
         logging.info('skipped: %s %s (%s)', action, module.name, stage)
@@ -313,6 +394,10 @@ class PytypeRunner(object):
       if action == Action.GENERATE_DEFAULT:
         module_to_output[module] = default_output
         continue
+      if cycle and stage != Stage.SECOND_PASS:
+        self.add_cycle(cycle, first_pass, module_to_imports_map,
+                       module_to_output)
+        cycle = []
       if stage == Stage.SINGLE_PASS:
         files.add(module.full_path)
         suffix = ''
@@ -322,6 +407,7 @@ class PytypeRunner(object):
         assert stage == Stage.SECOND_PASS
         files.add(module.full_path)
         suffix = ''
+        cycle.append((module, action, deps))
       imports_map = module_to_imports_map[module] = get_imports_map(
           deps, module_to_imports_map, module_to_output)
       imports = self.write_imports(module.name, imports_map, suffix)
@@ -330,9 +416,78 @@ class PytypeRunner(object):
                    if module_to_output[m] != default_output)
       module_to_output[module] = self.write_build_statement(
           module, action, deps, imports, suffix)
+      statement = BuildStatement(
+          module, action, deps, imports, module_to_output[module])
+      if stage == Stage.SINGLE_PASS:
+        self.build_statements.append(statement)
+      elif stage == Stage.FIRST_PASS:
+        first_pass[module] = statement
+    if cycle:
+      self.add_cycle(cycle, first_pass, module_to_imports_map, module_to_output)
     return files
 
+  def add_cycle(self, members, first_pass, module_to_imports_map,
+                module_to_output):
+    """Add an import cycle to self.build_statements.
+
+    Args:
+      members: A sequence of (module, action, deps) of the cycle's members, as
+        yielded for the second pass. The deps include the members.
+      first_pass: A map from module to its first pass build statement.
+      module_to_imports_map: A map from module to its imports map.
+      module_to_output: A map from module to its final output.
+    """
+    statements = []
+    bootstrap_statements = []
+    for module, action, deps in members:
+      output = module_to_output[module]
+      imports_map = get_imports_map(
+          deps, module_to_imports_map, module_to_output)
+      imports = self.write_imports(module.name, imports_map, CYCLE_SUFFIX)
+      deps = tuple(module_to_output[m] for m in deps
+                   if module_to_output[m] not in (output, self.default_output))
+      statements.append(BuildStatement(module, action, deps, imports, output))
+      bootstrap_statements.append(first_pass[module]._replace(
+          action=Action.INFER, output=output))
+    self.build_statements.append(
+        worker_pool.Cycle(tuple(statements), tuple(bootstrap_statements)))
+
   def build(self):
+    """Execute the build statements."""
+    if self.executor == Executor.NINJA:
+      return self.build_with_ninja()
+    if self.executor == Executor.PROCESS:
+      pool = worker_pool.SubprocessPool(
+          self.jobs, PYTYPE_SINGLE, self.job_timeout)
+    elif self.executor == Executor.FORK:
+      pool = worker_pool.ForkServerPool(
+          self.jobs, self.python_version, self.job_timeout)
+    else:
+      pool = worker_pool.WorkerPool(
+          self.jobs, self.python_version, self.job_timeout,
+          self.max_jobs_per_worker)
+    return self.build_with_pool(pool)
+
+  def build_with_pool(self, pool):
+    """Execute the build statements with a pool from worker_pool.
+
+    Unlike ninja, this also writes the result of each statement to
+    self.results_file.
+
+    Args:
+      pool: The pool.
+
+    Returns:
+      0 if all jobs succeeded, else 1.
+    """
+    module_timings = timings.Timings(self.timings_file).load()
+    with pool:
+      return worker_pool.build(
+          self.build_statements, self.get_pytype_args, pool,
+          self.keep_going, self.worker_log, module_timings,
+          self.max_cycle_passes, self.results_file)
+
+  def build_with_ninja(self):
     """Execute the build.ninja file."""
     # -k N     keep going until N jobs fail (0 means infinity)
     # -C DIR   change to DIR before doing anything else
@@ -343,7 +498,21 @@ class PytypeRunner(object):
     command = ['ninja', '-k', k, '-C', c, '-j', str(self.jobs)]
     if logging.getLogger().isEnabledFor(logging.INFO):
       command.append('-v')
-    return subprocess.call(command)
+    try:
+      return subprocess.call(command)
+    except OSError:
+      logging.error('Could not run ninja. Install it, or choose another '
+                    'executor with --executor.')
+      return 1
+
+  def write_perf_report(self):
+    """Write a report of the slowest modules and phases of the build."""
+    # Only the native executors record peak memory use.
+    results_file = (
+        None if self.executor == Executor.NINJA else self.results_file)
+    if perf_report.write(self.build_statements, self.perf_report_json,
+                         self.perf_report_html, results_file):
+      print('Wrote performance report to %s' % self.perf_report_html)
 
   def run(self):
     """Run pytype over the project."""
@@ -355,4 +524,10 @@ class PytypeRunner(object):
     ret = self.build()
     if not ret:
       print('Success: no errors found')
+    if self.perf_report:
+      self.write_perf_report()
+    if self.result_cache:
+      evicted = result_cache.evict(
+          self.result_cache, self.result_cache_size * 1024 * 1024)
+      logging.info('Evicted %d entries from the result cache', evicted)
     return ret
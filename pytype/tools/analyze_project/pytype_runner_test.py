@@ -5,9 +5,11 @@ import os
 
 from pytype import config as pytype_config
 from pytype import file_utils
+from pytype import load_pytd
 from pytype import module_utils
 from pytype.tools.analyze_project import parse_args
 from pytype.tools.analyze_project import pytype_runner
+from pytype.tools.analyze_project import worker_pool
 import unittest
 
 
@@ -29,7 +31,7 @@ ExpectedBuildStatement = collections.namedtuple(
 
 
 # number of lines in the build.ninja preamble
-_PREAMBLE_LENGTH = 6
+_PREAMBLE_LENGTH = 8
 
 
 class FakeImportGraph(object):
@@ -240,6 +242,9 @@ class TestGetRunCmd(TestBase):
   def test_module_name(self):
     self.assertEqual(self.get_basic_options().module_name, '$module')
 
+  def test_no_rewrite_unchanged(self):
+    self.assertFalse(self.get_basic_options().rewrite_unchanged)
+
   def test_error_reporting(self):
     # Disable error reporting
     options = self.get_basic_options(report_errors=False)
@@ -250,6 +255,41 @@ class TestGetRunCmd(TestBase):
     self.assertTrue(options.report_errors)
     self.assertTrue(options.analyze_annotated)
 
+  def test_result_cache(self):
+    custom_conf = self.parser.config_from_defaults()
+    custom_conf.result_cache = '/tmp/cache'
+    self.runner = make_runner([], [], custom_conf)
+    self.assertEqual(self.get_basic_options().result_cache, '/tmp/cache')
+
+  def test_no_result_cache(self):
+    self.assertIsNone(self.get_basic_options().result_cache)
+
+  def test_perf_report(self):
+    custom_conf = self.parser.config_from_defaults()
+    custom_conf.perf_report = True
+    self.runner = make_runner([], [], custom_conf)
+    args = self.runner.get_pytype_command_for_ninja(report_errors=False)
+    self.assertEqual(args[args.index('--metrics') + 1], '$out.metrics')
+
+  def test_pyi_cache(self):
+    custom_conf = self.parser.config_from_defaults()
+    custom_conf.pyi_cache = '/tmp/pyi'
+    self.runner = make_runner([], [], custom_conf)
+    args = self.runner.get_pytype_command_for_ninja(report_errors=False)
+    self.assertEqual(args[args.index('--pyi-cache') + 1], '/tmp/pyi')
+
+  def test_pickle_output(self):
+    custom_conf = self.parser.config_from_defaults()
+    custom_conf.pickle_output = True
+    self.runner = make_runner([], [], custom_conf)
+    args = self.runner.get_pytype_command_for_ninja(report_errors=False)
+    self.assertIn('--pickle-output', args)
+    self.assertIn('--use-pickled-files', args)
+
+  def test_no_perf_report(self):
+    args = self.runner.get_pytype_command_for_ninja(report_errors=False)
+    self.assertNotIn('--metrics', args)
+
   def test_custom_option(self):
     custom_conf = self.parser.config_from_defaults()
     custom_conf.disable = ['import-error', 'name-error']
@@ -259,6 +299,35 @@ class TestGetRunCmd(TestBase):
     self.assertEqual(options.disable, ['import-error', 'name-error'])
 
 
+class TestGetPytypeArgs(TestBase):
+  """Test PytypeRunner.get_pytype_args()."""
+
+  def test_substitutions(self):
+    runner = make_runner([], [], self.parser.config_from_defaults())
+    statement = pytype_runner.BuildStatement(
+        Module('', 'foo.py', 'foo'), Action.CHECK, (), 'foo.imports',
+        'foo.pyi')
+    args = runner.get_pytype_args(statement)
+    self.assertFalse([arg for arg in args if arg.startswith('$')])
+    self.assertEqual(args[-1], 'foo.py')
+    self.assertEqual(args[args.index('--imports_info') + 1], 'foo.imports')
+    options = pytype_config.Options(
+        [arg for arg in args if arg not in ('--imports_info', 'foo.imports')])
+    self.assertEqual(options.output, 'foo.pyi')
+    self.assertEqual(options.module_name, 'foo')
+    self.assertTrue(options.report_errors)
+
+  def test_substitute_inside_arg(self):
+    conf = self.parser.config_from_defaults()
+    conf.perf_report = True
+    runner = make_runner([], [], conf)
+    statement = pytype_runner.BuildStatement(
+        Module('', 'foo.py', 'foo'), Action.INFER, (), 'foo.imports',
+        'foo.pyi')
+    args = runner.get_pytype_args(statement)
+    self.assertEqual(args[args.index('--metrics') + 1], 'foo.pyi.metrics')
+
+
 class TestGetModuleAction(TestBase):
   """Tests for PytypeRunner.get_module_action."""
 
@@ -368,20 +437,23 @@ class TestNinjaPreamble(TestBase):
       with open(runner.ninja_file, 'r') as f:
         preamble = f.read().splitlines()
     self.assertEqual(len(preamble), _PREAMBLE_LENGTH)
-    # The preamble consists of triples of lines of the format:
+    # The preamble consists of groups of lines of the format:
     # rule {name}
     #   command = pytype-single {args} $in
     #   description = {name} $module
+    #   restat = 1
     # Check that the lines cycle through these patterns.
     for i, line in enumerate(preamble):
-      if not i % 3:
+      if not i % 4:
         self.assertRegexpMatches(line, r'rule \w*')
-      elif i % 3 == 1:
+      elif i % 4 == 1:
         expected = r'  command = {} .* \$in'.format(
             ' '.join(pytype_runner.PYTYPE_SINGLE))
         self.assertRegexpMatches(line, expected)
-      else:
+      elif i % 4 == 2:
         self.assertRegexpMatches(line, r'  description = \w* \$module')
+      else:
+        self.assertEqual(line, '  restat = 1')
 
 
 class TestNinjaBuildStatement(TestBase):
@@ -389,6 +461,7 @@ class TestNinjaBuildStatement(TestBase):
 
   def write_build_statement(self, *args, **kwargs):
     conf = self.parser.config_from_defaults()
+    conf.pickle_output = kwargs.pop('pickle_output', False)
     with file_utils.Tempdir() as d:
       conf.output = d.path
       runner = make_runner([], [], conf)
@@ -433,6 +506,14 @@ class TestNinjaBuildStatement(TestBase):
         Module('', 'foo.py', 'foo'), Action.CHECK, set(), 'imports', '-1')
     self.assertEqual(os.path.join(runner.pyi_dir, 'foo.pyi-1'), output)
 
+  def test_pickle_output(self):
+    runner, output, _ = self.write_build_statement(
+        Module('', 'foo.py', 'foo'), Action.CHECK, set(), 'imports', '-1',
+        pickle_output=True)
+    self.assertEqual(
+        os.path.join(runner.pyi_dir, 'foo.pyi.pickled-1'), output)
+    self.assertTrue(load_pytd.is_pickle(output))
+
   def test_hidden_dir(self):
     self.assertOutputMatches(Module('', '.foo/bar.py', '.foo.bar'),
                              os.path.join('.foo', 'bar.pyi'))
@@ -495,6 +576,10 @@ class TestNinjaBody(TestBase):
         deps=' | ' + os.path.join(runner.pyi_dir, 'bar.pyi'),
         imports=os.path.join(runner.imports_dir, 'foo.imports'),
         module='foo'))
+    self.assertEqual(
+        [(s.module, s.action, s.deps) for s in runner.build_statements],
+        [(dep, Action.INFER, ()),
+         (src, Action.CHECK, (os.path.join(runner.pyi_dir, 'bar.pyi'),))])
 
   def test_generate_default(self):
     src = Module('', 'foo.py', 'foo')
@@ -529,6 +614,24 @@ class TestNinjaBody(TestBase):
       runner.setup_build()
       with open(runner.ninja_file, 'r') as f:
         body = f.read().splitlines()[_PREAMBLE_LENGTH:]
+      with open(os.path.join(runner.imports_dir, 'foo.imports-cycle')) as f:
+        cycle_imports = sorted(f.read().splitlines())
+    cycle, = runner.build_statements
+    self.assertEqual(
+        [(s.module, s.action, s.output) for s in cycle.statements],
+        [(dep, Action.INFER, os.path.join(runner.pyi_dir, 'bar.pyi')),
+         (src, Action.CHECK, os.path.join(runner.pyi_dir, 'foo.pyi'))])
+    self.assertEqual(cycle.statements[1].deps,
+                     (os.path.join(runner.pyi_dir, 'bar.pyi'),))
+    self.assertEqual(
+        [(s.action, s.imports, s.output) for s in cycle.bootstrap_statements],
+        [(Action.INFER, os.path.join(runner.imports_dir, 'bar.imports-1'),
+          os.path.join(runner.pyi_dir, 'bar.pyi')),
+         (Action.INFER, os.path.join(runner.imports_dir, 'foo.imports-1'),
+          os.path.join(runner.pyi_dir, 'foo.pyi'))])
+    self.assertEqual(cycle_imports,
+                     ['bar %s' % os.path.join(runner.pyi_dir, 'bar.pyi'),
+                      'foo %s' % os.path.join(runner.pyi_dir, 'foo.pyi')])
     self.assertBuildStatementMatches(body[:3], ExpectedBuildStatement(
         output=os.path.join(runner.pyi_dir, 'bar.pyi-1'),
         action=Action.INFER,
@@ -633,5 +736,50 @@ class TestImports(TestBase):
                      {'foo': '/dir/foo.pyi', 'bar': '/dir/bar.pyi'})
 
 
+class TestBuild(TestBase):
+  """Test choosing an executor in PytypeRunner.build."""
+
+  def setUp(self):
+    super(TestBuild, self).setUp()
+    self.conf = self.parser.config_from_defaults()
+    self.conf.jobs = 2
+    self.conf.job_timeout = 10
+
+  def get_pool(self, executor):
+    self.conf.executor = executor
+    runner = make_runner([], [], self.conf)
+    pools = []
+    runner.build_with_pool = pools.append
+    runner.build_with_ninja = lambda: pools.append(None)
+    runner.build()
+    pool, = pools
+    return pool
+
+  def test_default(self):
+    pool = self.get_pool(self.parser.config_from_defaults().executor)
+    self.assertIsInstance(pool, worker_pool.WorkerPool)
+    self.assertEqual(pool.timeout, 10)
+    self.assertEqual(pool.max_jobs_per_worker, 100)
+
+  def test_unlimited_jobs_per_worker(self):
+    self.conf.max_jobs_per_worker = 0
+    pool = self.get_pool(pytype_runner.Executor.WORKER)
+    self.assertIsNone(pool.max_jobs_per_worker)
+
+  def test_process(self):
+    pool = self.get_pool(pytype_runner.Executor.PROCESS)
+    self.assertIsInstance(pool, worker_pool.SubprocessPool)
+    self.assertEqual(pool.command, pytype_runner.PYTYPE_SINGLE)
+    self.assertEqual((pool.num_workers, pool.timeout), (2, 10))
+
+  def test_fork(self):
+    pool = self.get_pool(pytype_runner.Executor.FORK)
+    self.assertIsInstance(pool, worker_pool.ForkServerPool)
+    self.assertEqual((pool.num_workers, pool.timeout), (2, 10))
+
+  def test_ninja(self):
+    self.assertIsNone(self.get_pool(pytype_runner.Executor.NINJA))
+
+
 if __name__ == '__main__':
   unittest.main()
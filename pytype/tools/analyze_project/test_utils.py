@@ -0,0 +1,63 @@
+"""Utility classes and functions for analyze_project tests."""
+
+import os
+
+from pytype import module_utils
+from pytype.tests import test_utils
+from pytype.tools.analyze_project import pytype_runner
+
+
+# Gives each test a temporary directory, self.d.
+TempdirMixin = test_utils.TempdirMixin
+
+
+class BuildStatementMixin(TempdirMixin):
+  """Mixin providing a way to make build statements in self.d."""
+
+  def make_statement(self, name, deps=(), contents='', imports=''):
+    """Make a build statement that checks <name>.py.
+
+    Args:
+      name: The module name. <name>.py is created with the given contents.
+      deps: The names of the modules whose interfaces the statement depends on.
+      contents: The contents of <name>.py.
+      imports: The imports map file.
+
+    Returns:
+      A pytype_runner.BuildStatement whose output is <name>.pyi.
+    """
+    self.d.create_file(name + '.py', contents)
+    module = module_utils.Module(self.d.path, name + '.py', name)
+    return pytype_runner.BuildStatement(
+        module, pytype_runner.Action.CHECK,
+        tuple(os.path.join(self.d.path, dep + '.pyi') for dep in deps),
+        imports, os.path.join(self.d.path, name + '.pyi'))
+
+
+class FakeChecker(object):
+  """Just enough of the IncrementalChecker interface to run tests."""
+
+  def __init__(self, sources):
+    self._sources = set(sources)
+    self.analyzed = []
+    self.setups = 0
+    self.reloads = 0
+    self.runner = None
+
+  def setup(self):
+    self.setups += 1
+
+  def reload(self, runner):
+    self.runner = runner
+    self.reloads += 1
+    self.setup()
+
+  def has_source(self, filename):
+    return filename in self._sources
+
+  def sources(self):
+    return set(self._sources)
+
+  def check(self, filenames):
+    self.analyzed = [os.path.basename(f) for f in filenames]
+    return 0, {f: [] for f in filenames}
@@ -0,0 +1,97 @@
+"""Per-module analysis times, recorded across runs for scheduling."""
+
+import json
+import logging
+import os
+
+
+# Used to estimate the analysis time of a module that has no history, when no
+# other module's history is available to calibrate against.
+_DEFAULT_SECONDS_PER_BYTE = 1e-4
+
+
+class Timings(object):
+  """Analysis times of build statements, keyed by output file."""
+
+  def __init__(self, filename):
+    self.filename = filename
+    self._times = {}
+
+  def load(self):
+    try:
+      with open(self.filename, 'r') as f:
+        self._times = json.load(f)
+    except (IOError, ValueError):
+      self._times = {}
+    return self
+
+  def save(self):
+    try:
+      with open(self.filename, 'w') as f:
+        json.dump(self._times, f, indent=0, sort_keys=True)
+    except IOError:
+      logging.warning('Could not write timings file: %s', self.filename)
+
+  def record(self, statement, seconds):
+    self._times[statement.output] = seconds
+
+  def _seconds_per_byte(self, statements):
+    """Calibrate source-size estimates against the recorded times."""
+    total_time = total_size = 0
+    for statement in statements:
+      if statement.output in self._times:
+        size = _source_size(statement)
+        if size:
+          total_time += self._times[statement.output]
+          total_size += size
+    if total_size:
+      return total_time / float(total_size)
+    return _DEFAULT_SECONDS_PER_BYTE
+
+  def estimate(self, statements):
+    """Estimate the analysis time of each statement.
+
+    Statements that ran before use their last recorded time. The others are
+    estimated from the size of their source file.
+
+    Args:
+      statements: A sequence of pytype_runner.BuildStatement.
+
+    Returns:
+      A list of estimated times in seconds, parallel to statements.
+    """
+    seconds_per_byte = self._seconds_per_byte(statements)
+    estimates = []
+    for statement in statements:
+      if statement.output in self._times:
+        estimates.append(self._times[statement.output])
+      else:
+        estimates.append(_source_size(statement) * seconds_per_byte)
+    return estimates
+
+
+def _source_size(statement):
+  try:
+    return os.path.getsize(statement.module.full_path)
+  except OSError:
+    return 0
+
+
+def critical_path_priorities(costs, dependents):
+  """Compute the cost of the longest path from each node to the end.
+
+  Starting the nodes with the longest remaining path first keeps the critical
+  path moving, so that cores don't sit idle waiting on it at the end.
+
+  Args:
+    costs: The cost of each node, in topological order.
+    dependents: For each node, the indices of the nodes that depend on it.
+
+  Returns:
+    A list of priorities, parallel to costs.
+  """
+  priorities = [0] * len(costs)
+  for i in reversed(range(len(costs))):
+    priorities[i] = costs[i] + max(
+        [priorities[d] for d in dependents[i]] or [0])
+  return priorities
@@ -0,0 +1,49 @@
+"""Tests for timings.py."""
+
+import os
+
+from pytype.tools.analyze_project import test_utils
+from pytype.tools.analyze_project import timings
+import unittest
+
+
+class TestTimings(test_utils.BuildStatementMixin, unittest.TestCase):
+  """Test Timings."""
+
+  def test_save_and_load(self):
+    statement = self.make_statement('a', contents='x' * 10)
+    t = timings.Timings(os.path.join(self.d.path, '.timings'))
+    t.record(statement, 3.0)
+    t.save()
+    loaded = timings.Timings(t.filename).load()
+    self.assertEqual(loaded.estimate([statement]), [3.0])
+
+  def test_load_missing(self):
+    statement = self.make_statement('a')
+    t = timings.Timings(os.path.join(self.d.path, '.timings')).load()
+    self.assertEqual(t.estimate([statement]), [0])
+
+  def test_estimate_from_size(self):
+    known = self.make_statement('a', contents='x' * 10)
+    unknown = self.make_statement('b', contents='x' * 30)
+    t = timings.Timings(os.path.join(self.d.path, '.timings'))
+    t.record(known, 2.0)
+    self.assertEqual(t.estimate([known, unknown]), [2.0, 6.0])
+
+
+class TestCriticalPath(unittest.TestCase):
+  """Test critical_path_priorities."""
+
+  def test_chain(self):
+    self.assertEqual(
+        timings.critical_path_priorities([1, 2, 3], [[1], [2], []]), [6, 5, 3])
+
+  def test_fork(self):
+    # 0 -> 1 and 0 -> 2; 2 is the more expensive branch.
+    self.assertEqual(
+        timings.critical_path_priorities([1, 2, 5], [[1, 2], [], []]),
+        [6, 2, 5])
+
+
+if __name__ == '__main__':
+  unittest.main()
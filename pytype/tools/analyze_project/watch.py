@@ -0,0 +1,231 @@
+"""Watch a project and re-check it whenever a source file changes.
+
+On Linux, we wait for changes with inotify. Elsewhere, or if inotify is not
+available, we poll the mtimes of the source files.
+"""
+
+from __future__ import print_function
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from pytype import utils
+from pytype.tools.analyze_project import incremental
+
+
+# inotify event masks, from <sys/inotify.h>.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_INOTIFY_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE |
+                 _IN_DELETE)
+
+# struct inotify_event, without the variable-length name that follows it.
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+# Saving a file often generates a burst of events. We wait this long (in
+# seconds) for the burst to end, so that it triggers a single re-check.
+_SETTLE_TIME = 0.1
+
+# How often (in seconds) the polling watcher checks for changes.
+_POLL_INTERVAL = 1.0
+
+
+class PollingWatcher(object):
+  """Waits for changes by polling the mtimes of files."""
+
+  def __init__(self, interval=_POLL_INTERVAL):
+    self.interval = interval
+    self._mtimes = {}
+
+  def _mtime(self, path):
+    try:
+      return os.path.getmtime(path)
+    except OSError:
+      return None
+
+  def add(self, paths):
+    for path in paths:
+      if path not in self._mtimes:
+        self._mtimes[path] = self._mtime(path)
+
+  def wait(self):
+    """Wait until some of the files change, and return the changed files."""
+    while True:
+      time.sleep(self.interval)
+      changed = set()
+      for path, mtime in self._mtimes.items():
+        new_mtime = self._mtime(path)
+        if new_mtime != mtime:
+          self._mtimes[path] = new_mtime
+          changed.add(path)
+      if changed:
+        return changed
+
+  def close(self):
+    pass
+
+
+class InotifyWatcher(object):
+  """Waits for changes to the directories containing files, with inotify."""
+
+  def __init__(self):
+    libc_name = ctypes.util.find_library('c')
+    if not libc_name:
+      raise OSError(errno.ENOSYS, 'Could not find libc')
+    self._libc = ctypes.CDLL(libc_name, use_errno=True)
+    # Raises AttributeError if libc doesn't have inotify.
+    self._fd = self._libc.inotify_init()
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init failed')
+    self._dirs = {}  # watch descriptor -> directory
+    self._watched = set()
+
+  def add(self, paths):
+    for directory in {os.path.dirname(path) for path in paths}:
+      if directory in self._watched:
+        continue
+      wd = self._libc.inotify_add_watch(
+          self._fd, directory.encode(sys.getfilesystemencoding()),
+          _INOTIFY_MASK)
+      if wd < 0:
+        logging.warning('Could not watch %s: %s', directory,
+                        os.strerror(ctypes.get_errno()))
+        continue
+      self._dirs[wd] = directory
+      self._watched.add(directory)
+
+  def _read_events(self):
+    """Read the pending events, and return the files that they affect."""
+    data = os.read(self._fd, 1 << 16)
+    changed = set()
+    offset = 0
+    while offset < len(data):
+      wd, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+      offset += _INOTIFY_EVENT.size
+      name = data[offset:offset + length].rstrip(b'\0')
+      offset += length
+      if wd in self._dirs and name:
+        changed.add(os.path.join(
+            self._dirs[wd], name.decode(sys.getfilesystemencoding())))
+    return changed
+
+  def wait(self):
+    """Wait until some of the files change, and return the changed files."""
+    while True:
+      select.select([self._fd], [], [])
+      changed = self._read_events()
+      while select.select([self._fd], [], [], _SETTLE_TIME)[0]:
+        changed |= self._read_events()
+      changed = {f for f in changed if f.endswith(('.py', '.pyi'))}
+      if changed:
+        return changed
+
+  def close(self):
+    os.close(self._fd)
+
+
+def create_watcher():
+  """Create an inotify watcher, falling back to polling."""
+  try:
+    return InotifyWatcher()
+  except (AttributeError, OSError) as e:
+    logging.info('inotify is not available (%s), polling for changes', e)
+    return PollingWatcher()
+
+
+class Watch(object):
+  """Re-checks a project's inputs whenever a source file changes."""
+
+  def __init__(self, conf, checker, make_runner, import_cache, watcher):
+    """Constructor.
+
+    Args:
+      conf: The analyze_project config.Config.
+      checker: An incremental.IncrementalChecker.
+      make_runner: A function that recomputes the import graph and returns a
+        new pytype_runner.PytypeRunner.
+      import_cache: The import_graph.ImportCache used by make_runner.
+      watcher: A PollingWatcher or InotifyWatcher.
+    """
+    self.conf = conf
+    self.checker = checker
+    self.make_runner = make_runner
+    self.import_cache = import_cache
+    self.watcher = watcher
+    self.python_version = utils.split_version(conf.python_version)
+    # Whether each file outside the project existed when we last saw it.
+    self._outside = {}
+
+  def _watch_sources(self):
+    self.watcher.add(self.checker.sources())
+
+  def check(self):
+    """Check the inputs and print a report of all of their current errors."""
+    inputs = sorted(f for f in self.conf.inputs if self.checker.has_source(f))
+    start = time.time()
+    status, errors = self.checker.check(inputs)
+    print('[%s] Analyzed %d modules in %.1fs' % (
+        time.strftime('%H:%M:%S'), len(self.checker.analyzed),
+        time.time() - start))
+    num_errors = 0
+    for filename in sorted(errors):
+      for error in errors[filename]:
+        print(incremental.format_error(error, filename))
+        num_errors += 1
+    if num_errors:
+      print('%d errors in %d files' % (
+          num_errors, len([f for f in errors if errors[f]])))
+    else:
+      print('Success: no errors found')
+    sys.stdout.flush()
+    return status
+
+  def update(self, changed):
+    """Account for changed files, rebuilding the import graph if needed.
+
+    Args:
+      changed: The changed files.
+
+    Returns:
+      Whether any of the files is part of the project.
+    """
+    rebuild = False
+    relevant = False
+    for f in changed:
+      if self.checker.has_source(f) or f in self.conf.inputs:
+        relevant = True
+        rebuild |= self.import_cache.update(f, self.python_version)
+      elif self._outside.get(f) != os.path.exists(f):
+        # A file was added or removed, which might change what imports resolve
+        # to. Resolving is cheap, since we still know every file's imports.
+        self._outside[f] = os.path.exists(f)
+        relevant = rebuild = True
+    if rebuild:
+      logging.info('Imports changed, recomputing the import graph')
+      self.checker.reload(self.make_runner())
+      self._watch_sources()
+    return relevant
+
+  def run(self):
+    """Check the project, then re-check it after every change."""
+    self.checker.setup()
+    self._watch_sources()
+    self.check()
+    try:
+      while True:
+        if self.update(self.watcher.wait()):
+          self.check()
+    except KeyboardInterrupt:
+      return 0
+    finally:
+      self.watcher.close()
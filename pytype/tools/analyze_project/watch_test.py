@@ -0,0 +1,100 @@
+"""Tests for watch.py."""
+
+import os
+import threading
+
+from pytype import datatypes
+from pytype.tools.analyze_project import test_utils
+from pytype.tools.analyze_project import watch
+import unittest
+
+
+class FakeImportCache(object):
+
+  def __init__(self, changed_imports=()):
+    self.changed_imports = changed_imports
+
+  def update(self, filename, python_version):
+    del python_version  # unused
+    return filename in self.changed_imports
+
+
+class FakeWatcher(object):
+
+  def add(self, paths):
+    pass
+
+
+class TestWatch(test_utils.TempdirMixin, unittest.TestCase):
+  """Test Watch.update."""
+
+  def setUp(self):
+    super(TestWatch, self).setUp()
+    self.foo = self.d.create_file('foo.py')
+    self.conf = datatypes.SimpleNamespace(
+        inputs={self.foo}, python_version='3.6')
+    self.checker = test_utils.FakeChecker({self.foo})
+
+  def make_watch(self, changed_imports=()):
+    return watch.Watch(self.conf, self.checker, lambda: None,
+                       FakeImportCache(changed_imports), FakeWatcher())
+
+  def test_unchanged_imports(self):
+    self.assertTrue(self.make_watch().update({self.foo}))
+    self.assertEqual(self.checker.reloads, 0)
+
+  def test_changed_imports(self):
+    self.assertTrue(self.make_watch({self.foo}).update({self.foo}))
+    self.assertEqual(self.checker.reloads, 1)
+
+  def test_new_file(self):
+    w = self.make_watch()
+    bar = self.d.create_file('bar.py')
+    self.assertTrue(w.update({bar}))
+    self.assertEqual(self.checker.reloads, 1)
+    # Edits to a file outside the project don't matter.
+    self.assertFalse(w.update({bar}))
+    self.assertEqual(self.checker.reloads, 1)
+    os.remove(bar)
+    self.assertTrue(w.update({bar}))
+    self.assertEqual(self.checker.reloads, 2)
+
+
+class WatcherTestBase(test_utils.TempdirMixin):
+  """Tests that both watchers should pass."""
+
+  def test_wait(self):
+    path = self.d.create_file('foo.py')
+    watcher = self.make_watcher()
+    try:
+      watcher.add([path])
+      mtime = os.path.getmtime(path) + 10
+      def touch():
+        with open(path, 'w') as f:
+          f.write('x = 0')
+        os.utime(path, (mtime, mtime))
+      timer = threading.Timer(0.1, touch)
+      timer.start()
+      self.assertEqual(watcher.wait(), {path})
+      timer.join()
+    finally:
+      watcher.close()
+
+
+class TestPollingWatcher(WatcherTestBase, unittest.TestCase):
+
+  def make_watcher(self):
+    return watch.PollingWatcher(interval=0.05)
+
+
+class TestInotifyWatcher(WatcherTestBase, unittest.TestCase):
+
+  def make_watcher(self):
+    try:
+      return watch.InotifyWatcher()
+    except (AttributeError, OSError):
+      self.skipTest('inotify is not available')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,917 @@
+"""Run pytype-single jobs in dependency order, without ninja.
+
+Jobs run in a pool of long-lived worker processes, as one subprocess per job,
+or in processes forked from a warm server. Starting a fresh pytype-single
+process for every module means re-importing pytype and re-parsing builtins and
+typing each time. A worker instead pays these costs once and then keeps its
+warm state across all of the jobs it runs. A fork server also pays them once,
+but every job still starts from the same clean, warm state.
+"""
+
+from __future__ import print_function
+
+import collections
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+from pytype import config as pytype_config
+from pytype import io
+from pytype import load_pytd
+from pytype import metrics
+from pytype import utils
+from pytype.pytd.parse import builtins
+from pytype.pytd.parse import node
+from pytype.tools.analyze_project import timings as timings_lib
+
+import six
+
+try:
+  from multiprocessing import connection  # pylint: disable=g-import-not-at-top
+  _wait_for_connections = connection.wait
+except AttributeError:
+  # Python 2 has no multiprocessing.connection.wait.
+  import select  # pylint: disable=g-import-not-at-top
+
+  def _wait_for_connections(connections, timeout):
+    return select.select(connections, [], [], timeout)[0]
+
+try:
+  import resource  # pylint: disable=g-import-not-at-top
+except ImportError:
+  resource = None
+
+try:
+  import signal  # pylint: disable=g-import-not-at-top
+except ImportError:
+  signal = None
+
+
+# How often (in seconds) to check for crashed workers while waiting for results.
+_POLL_INTERVAL = 1.0
+
+# How often (in seconds) to check on running subprocesses.
+_SUBPROCESS_POLL_INTERVAL = 0.05
+
+# Stubs that most modules import, which the fork server parses up front.
+_PRELOADED_MODULES = (
+    'abc', 'collections', 'functools', 'itertools', 'json', 'logging', 'os',
+    're', 'subprocess', 'sys', 'time',
+)
+
+# Exit status reported for a job whose worker died while running it.
+CRASHED = -1
+
+# Exit status reported for a job that was killed for taking too long.
+TIMED_OUT = -2
+
+# The first line of each error that pytype-single prints.
+_ERROR_RE = re.compile(r'^(File "[^"]*", line \d+|Line \d+)', re.MULTILINE)
+
+
+# The outcome of a pytype-single job.
+# Args:
+#   status: The exit status, CRASHED or TIMED_OUT.
+#   errors: What the job printed to stderr.
+#   peak_rss: The peak resident set size of the job in KiB, or None if unknown.
+JobResult = collections.namedtuple('JobResult', ['status', 'errors', 'peak_rss'])
+
+
+# An import cycle, analyzed in passes until the members' outputs stop changing.
+# Args:
+#   statements: The pytype_runner.BuildStatement of each member. Their imports
+#     map every member to its final output, and their deps include the outputs
+#     of the other members.
+#   bootstrap_statements: For each member, a statement for the first pass over
+#     a cycle whose members have no outputs yet. These leave the cycle out of
+#     the imports and don't report errors.
+Cycle = collections.namedtuple('Cycle', ['statements', 'bootstrap_statements'])
+
+
+def _warm_up(python_version):
+  """Pay the fixed per-process costs before the first job arrives."""
+  try:
+    builtins.GetBuiltinsAndTyping(utils.split_version(python_version))
+  except Exception:  # pylint: disable=broad-except
+    # A broken installation will make every job fail with a better error.
+    logging.info('Could not warm up worker:\n%s', traceback.format_exc())
+
+
+def run_pytype_single(args):
+  """Run pytype-single in this process.
+
+  Args:
+    args: The pytype-single command-line arguments.
+
+  Returns:
+    The exit status.
+  """
+  try:
+    options = pytype_config.Options(args)
+    node.SetCheckPreconditions(options.check_preconditions)
+    # Like pytype-single's main(), so that --metrics reports the same numbers.
+    with metrics.MetricsContext(options.metrics):
+      with metrics.get_metric('total_time', metrics.StopWatch):
+        return io.process_one_file(options)
+  except SystemExit as e:
+    # Raised by the argument parser.
+    return e.code if isinstance(e.code, int) else 1
+  except Exception:  # pylint: disable=broad-except
+    logging.error('Uncaught exception in pytype worker:\n%s',
+                  traceback.format_exc())
+    return 1
+
+
+def _run_and_capture_errors(args):
+  """Run pytype-single, returning its exit status and what it printed."""
+  stderr = sys.stderr
+  sys.stderr = six.StringIO()
+  try:
+    status = run_pytype_single(args)
+    return status, sys.stderr.getvalue()
+  finally:
+    sys.stderr = stderr
+
+
+def _reset_peak_rss():
+  """Reset the peak RSS of this process, if the OS supports it."""
+  try:
+    # Writing 5 resets the peak RSS reported in /proc/self/status (Linux 4.0+).
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+  except (IOError, OSError):
+    pass
+
+
+def _peak_rss():
+  """Get the peak RSS of this process in KiB, or None if unknown."""
+  try:
+    with open('/proc/self/status', 'r') as f:
+      for line in f:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1])
+  except (IOError, OSError, ValueError):
+    pass
+  if resource:
+    # The peak over the worker's whole life, so it may overestimate.
+    return _rusage_to_kib(resource.getrusage(resource.RUSAGE_SELF))
+  return None
+
+
+def _rusage_to_kib(rusage):
+  # ru_maxrss is in bytes on macOS and in KiB everywhere else.
+  if sys.platform == 'darwin':
+    return rusage.ru_maxrss // 1024
+  return rusage.ru_maxrss
+
+
+def count_errors(errors):
+  """Count the errors in the stderr output of pytype-single."""
+  return len(_ERROR_RE.findall(errors))
+
+
+def _worker_main(python_version, tasks, results, max_jobs):
+  _warm_up(python_version)
+  # After max_jobs jobs, the worker exits and the pool starts a fresh one, so
+  # that whatever the jobs leave behind, e.g. caches and leaks, can't pile up.
+  for args in itertools.islice(iter(tasks.get, None), max_jobs):
+    _reset_peak_rss()
+    status, errors = _run_and_capture_errors(args)
+    results.send(JobResult(status, errors, _peak_rss()))
+
+
+class _Worker(object):
+  """A worker process and the job it is currently running.
+
+  Each worker sends its results through a pipe of its own, so a result can
+  only ever belong to the worker's current job, and a worker that is killed
+  halfway through sending one can't corrupt the results of the others.
+  """
+
+  def __init__(self, python_version, max_jobs):
+    self.tasks = multiprocessing.Queue()
+    self.results, results = multiprocessing.Pipe(duplex=False)
+    self.process = multiprocessing.Process(
+        target=_worker_main,
+        args=(python_version, self.tasks, results, max_jobs))
+    self.process.daemon = True
+    self.process.start()
+    # Only the worker writes to the pipe, so that reading from it fails once
+    # the worker is gone.
+    results.close()
+    self.job = None
+    self.start_time = None
+    self.max_jobs = max_jobs
+    self.num_jobs = 0
+
+  def is_used_up(self):
+    return bool(self.max_jobs) and self.num_jobs >= self.max_jobs
+
+  def close(self):
+    self.results.close()
+    self.tasks.close()
+
+
+class WorkerPool(object):
+  """A fixed-size pool of long-lived pytype-single workers."""
+
+  def __init__(self, num_workers, python_version, timeout=None,
+               max_jobs_per_worker=None):
+    """Constructor.
+
+    Args:
+      num_workers: The number of workers.
+      python_version: The target Python version, for warming up the workers.
+      timeout: Optionally, the number of seconds after which a job is killed.
+      max_jobs_per_worker: Optionally, the number of jobs after which a worker
+        is replaced by a new one.
+    """
+    self.num_workers = max(num_workers, 1)
+    self.python_version = python_version
+    self.timeout = timeout
+    self.max_jobs_per_worker = max_jobs_per_worker
+    self._workers = []
+
+  def __enter__(self):
+    self._workers = [self._start_worker() for _ in range(self.num_workers)]
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):  # pylint: disable=redefined-outer-name
+    for worker in self._workers:
+      worker.tasks.put(None)
+    for worker in self._workers:
+      worker.process.join(_POLL_INTERVAL)
+      if worker.process.is_alive():
+        worker.process.terminate()
+      worker.close()
+    self._workers = []
+
+  def _start_worker(self):
+    return _Worker(self.python_version, self.max_jobs_per_worker)
+
+  def _retire_worker(self, index):
+    """Replace a worker that has run its last job."""
+    worker = self._workers[index]
+    worker.process.join(_POLL_INTERVAL)
+    if worker.process.is_alive():
+      worker.process.terminate()
+    worker.close()
+    self._workers[index] = self._start_worker()
+
+  def has_idle_worker(self):
+    return any(worker.job is None for worker in self._workers)
+
+  def has_running_jobs(self):
+    return any(worker.job is not None for worker in self._workers)
+
+  def submit(self, job, args):
+    """Send a job to an idle worker."""
+    worker = next(w for w in self._workers if w.job is None)
+    worker.job = job
+    worker.start_time = time.time()
+    worker.num_jobs += 1
+    worker.tasks.put(args)
+
+  def wait(self):
+    """Wait for a job to finish.
+
+    Returns:
+      A (job, JobResult) tuple. If a worker crashes or runs out of time, its
+      job is reported with an exit status of CRASHED or TIMED_OUT, and the
+      worker is replaced. A worker that has run max_jobs_per_worker jobs is
+      replaced, too.
+    """
+    while True:
+      busy = [(index, worker) for index, worker in enumerate(self._workers)
+              if worker.job is not None]
+      ready = _wait_for_connections(
+          [worker.results for _, worker in busy], _POLL_INTERVAL)
+      for index, worker in busy:
+        if worker.results not in ready:
+          continue
+        try:
+          result = worker.results.recv()
+        except (EOFError, IOError, OSError):
+          # The worker died. Give it a moment to exit, so that the check
+          # below reports the crash.
+          worker.process.join(_POLL_INTERVAL)
+          continue
+        job, worker.job = worker.job, None
+        if worker.is_used_up():
+          self._retire_worker(index)
+        return job, result
+      for index, worker in enumerate(self._workers):
+        if worker.job is None:
+          continue
+        if not worker.process.is_alive():
+          logging.error('pytype worker died with exit code %s',
+                        worker.process.exitcode)
+          status = CRASHED
+        elif (self.timeout and
+              time.time() - worker.start_time > self.timeout):
+          worker.process.terminate()
+          worker.process.join()
+          status = TIMED_OUT
+        else:
+          continue
+        job = worker.job
+        worker.close()
+        self._workers[index] = self._start_worker()
+        return job, JobResult(status, '', None)
+
+
+def _warm_up_fork_server(python_version):
+  """Warm up the state that the fork server's children will share."""
+  _warm_up(python_version)
+  # Children parse the same stubs from memory instead of from disk.
+  load_pytd.enable_parsed_pyi_cache()
+  try:
+    loader = load_pytd.Loader(None, utils.split_version(python_version))
+    for module in _PRELOADED_MODULES:
+      loader.import_name(module)
+  except Exception:  # pylint: disable=broad-except
+    logging.info('Could not warm up fork server:\n%s', traceback.format_exc())
+
+
+def _run_forked_job(args, errors_file):
+  """Run a job in a forked child. Never returns."""
+  status = 1
+  try:
+    status, errors = _run_and_capture_errors(args)
+    if isinstance(errors, six.text_type):
+      errors = errors.encode('utf-8')
+    with open(errors_file, 'wb') as f:
+      f.write(errors)
+  finally:
+    # Skip the parent's cleanup handlers, which would e.g. close its pipes.
+    os._exit(status if isinstance(status, int) else 1)  # pylint: disable=protected-access
+
+
+def _read_errors_file(errors_file):
+  """Read and delete the file that a forked job wrote its errors to."""
+  try:
+    with open(errors_file, 'rb') as f:
+      return f.read().decode('utf-8', 'replace')
+  except (IOError, OSError):
+    return ''
+  finally:
+    try:
+      os.remove(errors_file)
+    except OSError:
+      pass
+
+
+def _fork_server_main(python_version, conn, timeout):
+  """Fork a child for every job that arrives on conn, and report its result."""
+  _warm_up_fork_server(python_version)
+  children = {}  # pid -> (job id, errors file, start time)
+  while True:
+    try:
+      if conn.poll(_SUBPROCESS_POLL_INTERVAL if children else _POLL_INTERVAL):
+        task = conn.recv()
+        if task is None:
+          break
+        job_id, args = task
+        fd, errors_file = tempfile.mkstemp(prefix='pytype-errors-')
+        os.close(fd)
+        pid = os.fork()
+        if not pid:
+          conn.close()
+          _run_forked_job(args, errors_file)
+        children[pid] = (job_id, errors_file, time.time())
+    except EOFError:
+      break  # The pool went away.
+    for pid, (job_id, errors_file, start_time) in list(children.items()):
+      reaped, status, rusage = os.wait4(pid, os.WNOHANG)
+      if reaped:
+        if os.WIFEXITED(status):
+          status = os.WEXITSTATUS(status)
+        else:
+          status = CRASHED
+        peak_rss = _rusage_to_kib(rusage)
+      elif timeout and time.time() - start_time > timeout:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        status, peak_rss = TIMED_OUT, None
+      else:
+        continue
+      del children[pid]
+      conn.send(
+          (job_id, JobResult(status, _read_errors_file(errors_file), peak_rss)))
+  for pid, (_, errors_file, _) in children.items():
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    _read_errors_file(errors_file)
+
+
+class ForkServerPool(object):
+  """Runs each pytype-single job in a child forked from a warm server.
+
+  The server imports pytype, loads builtins and typing and parses common stubs
+  once. Every child starts from a copy-on-write copy of that state, so it skips
+  the startup costs that a new process pays, yet runs in isolation, and we can
+  measure its exact peak RSS. Needs os.fork, i.e. a POSIX system.
+  """
+
+  def __init__(self, num_workers, python_version, timeout=None):
+    """Constructor.
+
+    Args:
+      num_workers: The maximum number of jobs to run at once.
+      python_version: The target Python version, for warming up the server.
+      timeout: Optionally, the number of seconds after which a job is killed.
+    """
+    self.num_workers = max(num_workers, 1)
+    self.python_version = python_version
+    self.timeout = timeout
+    self._server = None
+    self._conn = None
+    self._jobs = {}  # job id -> job
+    self._next_job_id = 0
+    self._lost = []  # jobs whose server died
+
+  def __enter__(self):
+    self._start_server()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):  # pylint: disable=redefined-outer-name
+    try:
+      self._conn.send(None)
+    except (IOError, OSError):
+      pass
+    self._server.join(_POLL_INTERVAL)
+    if self._server.is_alive():
+      self._server.terminate()
+    self._conn.close()
+    self._server = self._conn = None
+    self._jobs = {}
+
+  def _start_server(self):
+    self._conn, server_conn = multiprocessing.Pipe()
+    self._server = multiprocessing.Process(
+        target=_fork_server_main,
+        args=(self.python_version, server_conn, self.timeout))
+    self._server.daemon = True
+    self._server.start()
+    server_conn.close()
+
+  def has_idle_worker(self):
+    return len(self._jobs) + len(self._lost) < self.num_workers
+
+  def has_running_jobs(self):
+    return bool(self._jobs or self._lost)
+
+  def submit(self, job, args):
+    job_id = self._next_job_id
+    self._next_job_id += 1
+    self._jobs[job_id] = job
+    self._conn.send((job_id, args))
+
+  def wait(self):
+    """Wait for a job to finish.
+
+    Returns:
+      A (job, JobResult) tuple. If the server dies, its running jobs are
+      reported with an exit status of CRASHED, and the server is restarted.
+    """
+    while True:
+      if self._lost:
+        return self._lost.pop(), JobResult(CRASHED, '', None)
+      try:
+        if self._conn.poll(_POLL_INTERVAL):
+          job_id, result = self._conn.recv()
+          return self._jobs.pop(job_id), result
+      except (EOFError, IOError, OSError):
+        self._server.join(_POLL_INTERVAL)
+      if not self._server.is_alive():
+        logging.error('pytype fork server died with exit code %s',
+                      self._server.exitcode)
+        self._lost = list(self._jobs.values())
+        self._jobs = {}
+        self._conn.close()
+        self._start_server()
+
+
+class _Process(object):
+  """A pytype-single subprocess and the job it is running."""
+
+  def __init__(self, job, command):
+    self.job = job
+    # A file rather than a pipe, so that a chatty job can't block on a full
+    # pipe while we're waiting for it.
+    self.stderr = tempfile.TemporaryFile()
+    self.popen = subprocess.Popen(command, stderr=self.stderr)
+    self.start_time = time.time()
+
+  def poll(self):
+    """Get the exit status and rusage, or None if still running."""
+    pid, status, rusage = os.wait4(self.popen.pid, os.WNOHANG)
+    if not pid:
+      return None
+    if os.WIFEXITED(status):
+      status = os.WEXITSTATUS(status)
+    else:
+      status = CRASHED
+    # We reaped the process ourselves, so tell Popen not to.
+    self.popen.returncode = status
+    return status, rusage
+
+  def read_errors(self):
+    self.stderr.seek(0)
+    errors = self.stderr.read().decode('utf-8', 'replace')
+    self.stderr.close()
+    return errors
+
+
+class SubprocessPool(object):
+  """Runs each pytype-single job in a new process.
+
+  Slower than a WorkerPool, but every job starts from a clean slate, and we can
+  measure the exact peak RSS of each job.
+  """
+
+  def __init__(self, num_workers, command, timeout=None):
+    """Constructor.
+
+    Args:
+      num_workers: The maximum number of jobs to run at once.
+      command: The command that runs pytype-single, without arguments.
+      timeout: Optionally, the number of seconds after which a job is killed.
+    """
+    self.num_workers = max(num_workers, 1)
+    self.command = command
+    self.timeout = timeout
+    self._processes = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):  # pylint: disable=redefined-outer-name
+    for process in self._processes:
+      process.popen.kill()
+      process.popen.wait()
+      process.stderr.close()
+    self._processes = []
+
+  def has_idle_worker(self):
+    return len(self._processes) < self.num_workers
+
+  def has_running_jobs(self):
+    return bool(self._processes)
+
+  def submit(self, job, args):
+    self._processes.append(_Process(job, self.command + args))
+
+  def wait(self):
+    """Wait for a job to finish.
+
+    Returns:
+      A (job, JobResult) tuple.
+    """
+    while True:
+      for process in self._processes:
+        ret = process.poll()
+        if ret:
+          status, rusage = ret
+          peak_rss = _rusage_to_kib(rusage)
+        elif (self.timeout and
+              time.time() - process.start_time > self.timeout):
+          process.popen.kill()
+          process.popen.wait()
+          status, peak_rss = TIMED_OUT, None
+        else:
+          continue
+        self._processes.remove(process)
+        return process.job, JobResult(status, process.read_errors(), peak_rss)
+      time.sleep(_SUBPROCESS_POLL_INTERVAL)
+
+
+def _hash_command(args):
+  return hashlib.md5(' '.join(args).encode('utf-8')).hexdigest()
+
+
+def _read_log(log_file):
+  try:
+    with open(log_file, 'r') as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return {}
+
+
+def _write_log(log_file, log):
+  with open(log_file, 'w') as f:
+    json.dump(log, f, indent=0, sort_keys=True)
+
+
+def _newest_mtime(statement):
+  inputs = (statement.module.full_path,) + tuple(statement.deps)
+  return max(os.path.getmtime(f) for f in inputs)
+
+
+def _is_up_to_date(statement, command_hash, log):
+  """Whether a build statement's output is newer than all of its inputs.
+
+  Like ninja, we also consider the output out of date if it was produced by a
+  different command or if the command that produced it failed. Since pytype
+  does not rewrite an unchanged pyi, the output may be older than its inputs,
+  so we compare against the time recorded in the log (ninja's "restat").
+
+  Args:
+    statement: A pytype_runner.BuildStatement.
+    command_hash: A hash of the statement's pytype-single command.
+    log: A map from output to the (command hash, mtime) that last built it.
+
+  Returns:
+    True if the statement does not need to be run.
+  """
+  entry = log.get(statement.output)
+  if not entry or entry[0] != command_hash:
+    return False
+  try:
+    os.path.getmtime(statement.output)
+    return _newest_mtime(statement) <= entry[1]
+  except OSError:
+    return False
+
+
+def _log_entry(statement, command_hash):
+  return [command_hash, max(_newest_mtime(statement),
+                            os.path.getmtime(statement.output))]
+
+
+def _read_output(statement):
+  try:
+    with open(statement.output, 'rb') as f:
+      return f.read()
+  except IOError:
+    return None
+
+
+class _CycleState(object):
+  """Progress of the fixed-point analysis of an import cycle."""
+
+  def __init__(self, cycle):
+    self.cycle = cycle
+    # If every member has an output from an earlier run, the first pass can use
+    # those outputs instead of ignoring the cycle, and may already converge.
+    self.warm = all(_read_output(s) is not None for s in cycle.statements)
+    self.old_output = None
+    self.passes = 1
+    self.member = 0
+    self.changed = False
+    self.statuses = [0] * len(cycle.statements)
+    self.errors = [''] * len(cycle.statements)
+
+  def get_statement(self):
+    """Get the statement to run next."""
+    if self.passes == 1 and not self.warm:
+      return self.cycle.bootstrap_statements[self.member]
+    return self.cycle.statements[self.member]
+
+
+class _Build(object):
+  """Runs build statements and import cycles in dependency order."""
+
+  def __init__(self, nodes, get_args, pool, keep_going, log, timings,
+               max_cycle_passes):
+    self.nodes = nodes
+    self.get_args = get_args
+    self.pool = pool
+    self.keep_going = keep_going
+    self.log = log
+    self.timings = timings
+    # The first pass over a cold cycle only bootstraps the outputs.
+    self.max_cycle_passes = max(max_cycle_passes, 2)
+    self.ready = []
+    self.start_times = {}
+    self.results = {}  # output -> the result of the job that produced it
+    self.finished = 0
+    self.failed = False
+    self.num_pending_deps = []
+    self.dependents = [[] for _ in nodes]
+    producers = {}
+    for i, n in enumerate(nodes):
+      for statement in _get_statements(n):
+        producers[statement.output] = i
+    for i, n in enumerate(nodes):
+      deps = {producers[d] for statement in _get_statements(n)
+              for d in statement.deps if producers.get(d, i) != i}
+      self.num_pending_deps.append(len(deps))
+      for d in deps:
+        self.dependents[d].append(i)
+    if timings:
+      self.priorities = timings_lib.critical_path_priorities(
+          [sum(timings.estimate(_get_statements(n))) for n in nodes],
+          self.dependents)
+    else:
+      self.priorities = [0] * len(nodes)
+
+  def _make_ready(self, indices):
+    for i in indices:
+      # Ties are broken by dependency order.
+      heapq.heappush(self.ready, (-self.priorities[i], i))
+
+  def _release(self, i):
+    """Mark node i as done and make ready the dependents that we can run."""
+    released = []
+    for d in self.dependents[i]:
+      self.num_pending_deps[d] -= 1
+      if not self.num_pending_deps[d]:
+        released.append(d)
+    self._make_ready(released)
+
+  def _is_up_to_date(self, statements):
+    return all(_is_up_to_date(s, _hash_command(self.get_args(s)), self.log)
+               for s in statements)
+
+  def _submit(self, i, statement, state=None):
+    args = self.get_args(statement)
+    if state:
+      state.old_output = _read_output(statement)
+    self.log.pop(statement.output, None)
+    self.start_times[statement.output] = time.time()
+    self.pool.submit((i, state), args)
+
+  def _record_result(self, statement, outcome, result=None, duration=None):
+    self.results[statement.output] = {
+        'module': statement.module.name,
+        'source': statement.module.full_path,
+        'output': statement.output,
+        'action': statement.action,
+        'result': outcome,
+        'exit_status': result and result.status,
+        'duration': duration,
+        'errors': result and count_errors(result.errors),
+        'peak_rss_kib': result and result.peak_rss,
+    }
+
+  def _start(self, i):
+    n = self.nodes[i]
+    if self._is_up_to_date(_get_statements(n)):
+      for statement in _get_statements(n):
+        self._record_result(statement, 'up_to_date')
+      self.finished += 1
+      self._release(i)
+    elif isinstance(n, Cycle):
+      state = _CycleState(n)
+      self._submit(i, state.get_statement(), state)
+    else:
+      self._submit(i, n)
+
+  def _finish(self, i, statuses, errors, description):
+    """Report a finished node, and release its dependents if it succeeded."""
+    self.finished += 1
+    print('[%d/%d] %s' % (self.finished, len(self.nodes), description))
+    for e in errors:
+      sys.stderr.write(e)
+    if any(statuses):
+      # As with ninja, dependents of a failed job are never run.
+      self.failed = True
+      return
+    for statement in _get_statements(self.nodes[i]):
+      self.log[statement.output] = _log_entry(
+          statement, _hash_command(self.get_args(statement)))
+    self._release(i)
+
+  def _continue_cycle(self, i, state, status, errors):
+    """Record a cycle member's result and run the next member or pass."""
+    statement = state.cycle.statements[state.member]
+    state.statuses[state.member] = status
+    state.errors[state.member] = errors
+    state.changed |= (status in (CRASHED, TIMED_OUT) or
+                      _read_output(statement) != state.old_output)
+    state.member += 1
+    if state.member == len(state.cycle.statements):
+      bootstrap = state.passes == 1 and not state.warm
+      if (state.changed or bootstrap) and state.passes < self.max_cycle_passes:
+        state.passes += 1
+        state.member = 0
+        state.changed = False
+      else:
+        if state.changed or bootstrap:
+          logging.warning('Import cycle did not converge after %d passes: %s',
+                          state.passes, _describe_cycle(state.cycle))
+        self._finish(i, state.statuses, state.errors, '%s (cycle, %d passes)' %
+                     (_describe_cycle(state.cycle), state.passes))
+        return
+    self._submit(i, state.get_statement(), state)
+
+  def run(self):
+    """Run all nodes.
+
+    Returns:
+      0 if all jobs succeeded, else 1.
+    """
+    self._make_ready(i for i, n in enumerate(self.num_pending_deps) if not n)
+    while self.ready or self.pool.has_running_jobs():
+      while (self.ready and self.pool.has_idle_worker() and
+             (self.keep_going or not self.failed)):
+        _, i = heapq.heappop(self.ready)
+        self._start(i)
+      if not self.pool.has_running_jobs():
+        break
+      (i, state), result = self.pool.wait()
+      n = self.nodes[i]
+      statement = state.cycle.statements[state.member] if state else n
+      duration = time.time() - self.start_times[statement.output]
+      status, errors = result.status, result.errors
+      if status == TIMED_OUT:
+        errors += 'Analysis of %s timed out after %.0f seconds\n' % (
+            statement.module.full_path, duration)
+      # Of a cycle, we keep the result of each member's last pass.
+      self._record_result(statement, _describe_status(status), result,
+                          duration)
+      if self.timings and status != TIMED_OUT:
+        self.timings.record(statement, duration)
+      if state:
+        self._continue_cycle(i, state, status, errors)
+      else:
+        self._finish(i, [status], [errors],
+                     '%s %s' % (statement.action, statement.module.name))
+    if self.failed or self.finished < len(self.nodes):
+      return 1
+    return 0
+
+  def get_results(self):
+    """Get the result of each statement, in dependency order."""
+    results = []
+    for n in self.nodes:
+      for statement in _get_statements(n):
+        if statement.output not in self.results:
+          self._record_result(statement, 'not_run')
+        results.append(self.results[statement.output])
+    return results
+
+
+def _describe_status(status):
+  if status == CRASHED:
+    return 'crashed'
+  elif status == TIMED_OUT:
+    return 'timed_out'
+  elif status:
+    return 'failed'
+  return 'ok'
+
+
+def _get_statements(n):
+  if isinstance(n, Cycle):
+    return n.statements
+  return (n,)
+
+
+def _describe_cycle(cycle):
+  return ', '.join('%s %s' % (s.action, s.module.name)
+                   for s in cycle.statements)
+
+
+def build(nodes, get_args, pool, keep_going, log_file, timings=None,
+          max_cycle_passes=2, results_file=None):
+  """Run build statements in dependency order.
+
+  A statement is started as soon as all of the statements producing its deps
+  have finished, so independent modules are analyzed in parallel. If timings
+  are given, ready statements are started in order of the longest remaining
+  path through the build, weighted by their estimated analysis time.
+
+  The members of an import cycle are analyzed one after the other, in passes,
+  until a pass leaves all of their outputs unchanged or max_cycle_passes is
+  reached. Only the errors from the last pass are reported.
+
+  Args:
+    nodes: A sequence of pytype_runner.BuildStatement and Cycle objects in
+      dependency order.
+    get_args: A function mapping a statement to its pytype-single arguments.
+    pool: A WorkerPool or SubprocessPool.
+    keep_going: Whether to keep going after a job fails.
+    log_file: Where to record how each output was produced.
+    timings: Optionally, a timings.Timings object. It is used to prioritize
+      statements and is updated with the time each job took.
+    max_cycle_passes: The maximum number of passes over an import cycle.
+    results_file: Optionally, where to write a JSON list with the result of
+      each statement: its outcome, exit status, duration, error count and peak
+      RSS.
+
+  Returns:
+    0 if all jobs succeeded, else 1.
+  """
+  log = _read_log(log_file)
+  b = _Build(nodes, get_args, pool, keep_going, log, timings, max_cycle_passes)
+  try:
+    return b.run()
+  finally:
+    _write_log(log_file, log)
+    if timings:
+      timings.save()
+    if results_file:
+      with open(results_file, 'w') as f:
+        json.dump(b.get_results(), f, indent=2, sort_keys=True)
@@ -0,0 +1,331 @@
+"""Tests for worker_pool.py."""
+
+import json
+import os
+import signal
+import sys
+import time
+
+from pytype.tools.analyze_project import pytype_runner
+from pytype.tools.analyze_project import test_utils
+from pytype.tools.analyze_project import timings
+from pytype.tools.analyze_project import worker_pool
+import unittest
+
+
+class FakePool(object):
+  """Just enough of the WorkerPool interface to run tests."""
+
+  def __init__(self, failures=(), num_workers=1, contents=None, timeouts=()):
+    self.failures = failures
+    self.timeouts = timeouts
+    self.num_workers = num_workers
+    # Maps the command-line arguments of a job to its output.
+    self.contents = contents or (lambda args: args[-1])
+    self.running = []
+    self.started = []
+
+  def has_idle_worker(self):
+    return len(self.running) < self.num_workers
+
+  def has_running_jobs(self):
+    return bool(self.running)
+
+  def submit(self, job, args):
+    self.running.append((job, args))
+    self.started.append(args[-1])
+
+  def wait(self):
+    job, args = self.running.pop(0)
+    if args[-1] in self.timeouts:
+      return job, worker_pool.JobResult(worker_pool.TIMED_OUT, '', None)
+    if args[-1] in self.failures:
+      return job, worker_pool.JobResult(
+          1, 'File "%s", line 1: error [name-error]\n' % args[-1], 1024)
+    # Like pytype-single with --no-rewrite-unchanged.
+    contents = self.contents(args)
+    if not os.path.exists(args[0]) or open(args[0]).read() != contents:
+      with open(args[0], 'w') as f:
+        f.write(contents)
+    return job, worker_pool.JobResult(0, '', 1024)
+
+
+class TestBuild(test_utils.BuildStatementMixin, unittest.TestCase):
+  """Test worker_pool.build."""
+
+  def make_cycle(self, names):
+    statements = [self.make_statement(name, [n for n in names if n != name])
+                  for name in names]
+    bootstrap_statements = [
+        s._replace(action=pytype_runner.Action.INFER, imports='-1', deps=())
+        for s in statements]
+    return worker_pool.Cycle(tuple(statements), tuple(bootstrap_statements))
+
+  def build(self, statements, pool, keep_going=False, module_timings=None,
+            max_cycle_passes=3):
+    get_args = lambda s: [s.output, s.imports, s.module.full_path]
+    log_file = os.path.join(self.d.path, '.worker_log')
+    return worker_pool.build(statements, get_args, pool, keep_going, log_file,
+                             module_timings, max_cycle_passes,
+                             self.results_file)
+
+  @property
+  def results_file(self):
+    return os.path.join(self.d.path, 'results.json')
+
+  def read_results(self):
+    with open(self.results_file) as f:
+      return {r['module']: r for r in json.load(f)}
+
+  def test_dependency_order(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a']),
+                  self.make_statement('c', ['b'])]
+    pool = FakePool(num_workers=3)
+    self.assertEqual(self.build(statements, pool), 0)
+    self.assertEqual(pool.started, [s.module.full_path for s in statements])
+
+  def test_critical_path_first(self):
+    statements = [self.make_statement('a'), self.make_statement('b'),
+                  self.make_statement('c', ['b'])]
+    module_timings = timings.Timings(os.path.join(self.d.path, '.timings'))
+    for statement, seconds in zip(statements, [2, 1, 5]):
+      module_timings.record(statement, seconds)
+    pool = FakePool()
+    self.assertEqual(self.build(statements, pool, module_timings=module_timings),
+                     0)
+    self.assertEqual(pool.started, [statements[i].module.full_path
+                                    for i in (1, 2, 0)])
+    self.assertTrue(os.path.exists(module_timings.filename))
+
+  def test_up_to_date(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a'])]
+    self.assertEqual(self.build(statements, FakePool()), 0)
+    pool = FakePool()
+    self.assertEqual(self.build(statements, pool), 0)
+    self.assertFalse(pool.started)
+
+  def test_early_cutoff(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a'])]
+    self.assertEqual(self.build(statements, FakePool()), 0)
+    path = statements[0].module.full_path
+    future = os.path.getmtime(path) + 10
+    os.utime(path, (future, future))
+    pool = FakePool()
+    self.assertEqual(self.build(statements, pool), 0)
+    self.assertEqual(pool.started, [path])
+    # The unchanged output is not rebuilt again.
+    pool = FakePool()
+    self.assertEqual(self.build(statements, pool), 0)
+    self.assertFalse(pool.started)
+
+  def test_failure(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a']),
+                  self.make_statement('c')]
+    pool = FakePool(failures={statements[0].module.full_path})
+    self.assertEqual(self.build(statements, pool), 1)
+    self.assertEqual(pool.started, [statements[0].module.full_path])
+
+  def test_keep_going(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a']),
+                  self.make_statement('c')]
+    pool = FakePool(failures={statements[0].module.full_path})
+    self.assertEqual(self.build(statements, pool, keep_going=True), 1)
+    self.assertEqual(pool.started, [statements[0].module.full_path,
+                                    statements[2].module.full_path])
+
+  def test_cycle(self):
+    cycle = self.make_cycle(['a', 'b'])
+    c = self.make_statement('c', ['a', 'b'])
+    pool = FakePool()
+    self.assertEqual(self.build([cycle, c], pool), 0)
+    # A bootstrap pass, then a pass that changes nothing.
+    a, b = [s.module.full_path for s in cycle.statements]
+    self.assertEqual(pool.started, [a, b, a, b, c.module.full_path])
+
+  def test_warm_cycle(self):
+    cycle = self.make_cycle(['a', 'b'])
+    self.assertEqual(self.build([cycle], FakePool()), 0)
+    a, b = [s.module.full_path for s in cycle.statements]
+    future = os.path.getmtime(a) + 10
+    os.utime(a, (future, future))
+    pool = FakePool()
+    self.assertEqual(self.build([cycle], pool), 0)
+    # The outputs from the previous run are a fixed point.
+    self.assertEqual(pool.started, [a, b])
+
+  def test_cycle_pass_limit(self):
+    cycle = self.make_cycle(['a', 'b'])
+    counter = iter(range(100))
+    pool = FakePool(contents=lambda args: str(next(counter)))
+    self.assertEqual(self.build([cycle], pool, max_cycle_passes=3), 0)
+    self.assertEqual(len(pool.started), 6)
+
+  def test_cycle_failure(self):
+    cycle = self.make_cycle(['a', 'b'])
+    c = self.make_statement('c', ['a'])
+    pool = FakePool(failures={cycle.statements[1].module.full_path})
+    self.assertEqual(self.build([cycle, c], pool, keep_going=True), 1)
+    self.assertNotIn(c.module.full_path, pool.started)
+
+  def test_results(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a']),
+                  self.make_statement('c')]
+    self.assertEqual(self.build(statements[2:], FakePool()), 0)
+    pool = FakePool(failures={statements[0].module.full_path})
+    self.assertEqual(self.build(statements, pool, keep_going=True), 1)
+    results = self.read_results()
+    self.assertEqual({k: v['result'] for k, v in results.items()},
+                     {'a': 'failed', 'b': 'not_run', 'c': 'up_to_date'})
+    self.assertEqual(results['a']['exit_status'], 1)
+    self.assertEqual(results['a']['errors'], 1)
+    self.assertEqual(results['a']['peak_rss_kib'], 1024)
+    self.assertGreaterEqual(results['a']['duration'], 0)
+
+  def test_timeout(self):
+    statements = [self.make_statement('a'), self.make_statement('b', ['a'])]
+    pool = FakePool(timeouts={statements[0].module.full_path})
+    self.assertEqual(self.build(statements, pool), 1)
+    self.assertEqual(self.read_results()['a']['result'], 'timed_out')
+
+  def test_rerun_failure(self):
+    statements = [self.make_statement('a')]
+    path = statements[0].module.full_path
+    self.assertEqual(self.build(statements, FakePool(failures={path})), 1)
+    pool = FakePool()
+    self.assertEqual(self.build(statements, pool), 0)
+    self.assertEqual(pool.started, [path])
+
+
+class TestSubprocessPool(unittest.TestCase):
+  """Test SubprocessPool."""
+
+  def run_job(self, code, timeout=None):
+    with worker_pool.SubprocessPool(
+        1, [sys.executable, '-c', code], timeout) as pool:
+      pool.submit('job', [])
+      self.assertFalse(pool.has_idle_worker())
+      job, result = pool.wait()
+      self.assertEqual(job, 'job')
+      self.assertFalse(pool.has_running_jobs())
+      return result
+
+  def test_status(self):
+    result = self.run_job('import sys; sys.stderr.write("oops"); sys.exit(3)')
+    self.assertEqual(result.status, 3)
+    self.assertEqual(result.errors, 'oops')
+    self.assertGreater(result.peak_rss, 0)
+
+  def test_timeout(self):
+    result = self.run_job('import time; time.sleep(10)', timeout=0.1)
+    self.assertEqual(result.status, worker_pool.TIMED_OUT)
+
+
+def fake_pytype_single(args):
+  """Stands in for pytype-single in forked jobs. args is [action, status]."""
+  action, status = args
+  if action == 'crash':
+    os.kill(os.getpid(), signal.SIGKILL)
+  elif action == 'sleep':
+    time.sleep(10)
+  elif action == 'pid':
+    sys.stderr.write(str(os.getpid()))
+    return int(status)
+  sys.stderr.write('oops')
+  return int(status)
+
+
+class PoolTestBase(object):
+  """Tests that both pools of pytype-single workers should pass."""
+
+  def setUp(self):
+    super(PoolTestBase, self).setUp()
+    self.run_pytype_single = worker_pool.run_pytype_single
+    worker_pool.run_pytype_single = fake_pytype_single
+
+  def tearDown(self):
+    super(PoolTestBase, self).tearDown()
+    worker_pool.run_pytype_single = self.run_pytype_single
+
+  def run_jobs(self, jobs, num_workers=1, timeout=None, **kwargs):
+    results = {}
+    jobs = list(jobs)
+    python_version = '%d.%d' % sys.version_info[:2]
+    with self.make_pool(num_workers, python_version, timeout, **kwargs) as pool:
+      while jobs or pool.has_running_jobs():
+        while jobs and pool.has_idle_worker():
+          pool.submit(*jobs.pop(0))
+        job, result = pool.wait()
+        self.assertNotIn(job, results)
+        results[job] = result
+      self.assertTrue(pool.has_idle_worker())
+    return results
+
+  def test_status(self):
+    result = self.run_jobs([('job', ['run', '3'])])['job']
+    self.assertEqual(result.status, 3)
+    self.assertEqual(result.errors, 'oops')
+    self.assertGreater(result.peak_rss, 0)
+
+  def test_parallel(self):
+    results = self.run_jobs(
+        [('a', ['run', '0']), ('b', ['run', '1'])], num_workers=2)
+    self.assertEqual({job: r.status for job, r in results.items()},
+                     {'a': 0, 'b': 1})
+
+  def test_crash(self):
+    result = self.run_jobs([('job', ['crash', '0'])])['job']
+    self.assertEqual(result.status, worker_pool.CRASHED)
+
+  def test_timeout(self):
+    result = self.run_jobs([('job', ['sleep', '0'])], timeout=0.1)['job']
+    self.assertEqual(result.status, worker_pool.TIMED_OUT)
+
+  def test_after_crash_and_timeout(self):
+    results = self.run_jobs(
+        [('a', ['crash', '0']), ('b', ['sleep', '0']), ('c', ['run', '2'])],
+        timeout=1)
+    self.assertEqual({job: r.status for job, r in results.items()},
+                     {'a': worker_pool.CRASHED, 'b': worker_pool.TIMED_OUT,
+                      'c': 2})
+
+
+class TestWorkerPool(PoolTestBase, unittest.TestCase):
+  """Test WorkerPool."""
+
+  make_pool = worker_pool.WorkerPool
+
+  def test_max_jobs_per_worker(self):
+    results = self.run_jobs(
+        [(job, ['pid', '0']) for job in 'abcde'], max_jobs_per_worker=2)
+    pids = [results[job].errors for job in 'abcde']
+    self.assertEqual(pids[0], pids[1])
+    self.assertEqual(pids[2], pids[3])
+    self.assertEqual(len(set(pids)), 3)
+
+  def test_reuse_worker(self):
+    results = self.run_jobs([(job, ['pid', '0']) for job in 'abc'])
+    self.assertEqual(len({r.errors for r in results.values()}), 1)
+
+
+class TestForkServerPool(PoolTestBase, unittest.TestCase):
+  """Test ForkServerPool."""
+
+  make_pool = worker_pool.ForkServerPool
+
+
+class TestCountErrors(unittest.TestCase):
+
+  def test_count(self):
+    errors = (
+        'File "foo.py", line 1, in <module>: Name \'x\' is not defined '
+        '[name-error]\n'
+        'File "foo.py", line 2, in f: Invalid\n'
+        '  message [bad-return-type]\n'
+        '  Expected: int\n'
+        '\n'
+        'For more details, see https://example.com\n')
+    self.assertEqual(worker_pool.count_errors(errors), 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,93 @@
+"""Measure how many opcodes per second the VM interprets.
+
+Usage:
+  python -m pytype.tools.benchmark_vm [--repeat N] [--large-literals N] [file.py]
+
+By default, this analyzes pytype/test_data/pytree.py. With --large-literals, it
+instead analyzes a generated module of list, set and dict literals with N items
+each, which stresses the data stack. The first run counts the opcodes that the
+analysis executes and warms up the loader; the following runs are timed, and
+the best one is reported.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+from pytype import config
+from pytype import io
+from pytype import load_pytd
+from pytype import metrics
+from pytype import pytype_source_utils
+
+
+_DEFAULT_FILE = os.path.join("test_data", "pytree.py")
+
+
+def _parse_args(argv):
+  parser = argparse.ArgumentParser(
+      description="Measure the VM's interpreted opcodes per second.")
+  parser.add_argument("input", nargs="?", default=None,
+                      help="The file to analyze (default: test_data/pytree.py)")
+  parser.add_argument("--repeat", type=int, default=5,
+                      help="The number of timed runs.")
+  parser.add_argument("--large-literals", type=int, default=None,
+                      help="Analyze literals with this many items instead.")
+  return parser.parse_args(argv)
+
+
+def _large_literals_source(n):
+  items = range(n)
+  return "\n".join([
+      "LIST = [%s]" % ", ".join("%d" % i for i in items),
+      "SET = {%s}" % ", ".join("'%d'" % i for i in items),
+      "DICT = {%s}" % ", ".join("'%d': [%d]" % (i, i) for i in items),
+      "",
+  ])
+
+
+def _count_opcodes(run):
+  """Run once with metrics enabled, and return the number of opcodes."""
+  fd, path = tempfile.mkstemp()
+  os.close(fd)
+  try:
+    with metrics.MetricsContext(path):
+      run()
+      counter = metrics.get_metric("vm_opcode", metrics.MapCounter)
+      return counter._total  # pylint: disable=protected-access
+  finally:
+    os.remove(path)
+
+
+def main(argv=None):
+  args = _parse_args(argv if argv is not None else sys.argv[1:])
+  if args.large_literals:
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".py", delete=False) as f:
+      f.write(_large_literals_source(args.large_literals))
+    try:
+      _benchmark(f.name, args.repeat)
+    finally:
+      os.remove(f.name)
+  else:
+    _benchmark(args.input or
+               pytype_source_utils.get_full_path(_DEFAULT_FILE), args.repeat)
+
+
+def _benchmark(filename, repeat):
+  """Print the opcodes per second of checking filename."""
+  options = config.Options.create(filename)
+  loader = load_pytd.create_loader(options)
+  run = lambda: io.check_py(filename, options=options, loader=loader)
+  num_opcodes = _count_opcodes(run)
+  best = min(timeit.repeat(run, number=1, repeat=repeat))
+  print("%s: %d opcodes in %.3fs, %.0f opcodes/sec" % (
+      filename, num_opcodes, best, num_opcodes / best))
+
+
+if __name__ == "__main__":
+  main()
@@ -109,6 +109,10 @@ typedef struct {
 typedef struct {
   CACHED_PYOBJECT_HEAD
   typegraph::Variable* u;
+  // A dict from the ids of the counters passed to RegisterChangeCounter to
+  // [weak reference to the counter, registration count] lists, or nullptr if
+  // there are none.
+  PyObject* change_counters;
 } PyVariableObj;
 
 static void DecRefCallback(typegraph::DataType* data) {
@@ -181,6 +185,7 @@ static PyObject* WrapVariable(PyProgramObj* program, typegraph::Variable* u) {
   PyObject* obj = NewCachedPyObject(&PyVariable, program, u);
   PyVariableObj* py_variable = reinterpret_cast<PyVariableObj*>(obj);
   py_variable->u = u;
+  py_variable->change_counters = nullptr;
   return obj;
 }
 
@@ -1038,6 +1043,7 @@ static void VariableDealloc(PyObject* self) {
   CHECK(self && Py_TYPE(self) == &PyVariable);
   PyVariableObj* u = reinterpret_cast<PyVariableObj*>(self);
   RemoveFromCache(self, u->u);
+  Py_XDECREF(u->change_counters);
   PyObject_Del(self);
 }
 
@@ -1195,6 +1201,60 @@ static PyObject* VariableFilteredData(PyVariableObj* self,
   return list;
 }
 
+// Adds delta to the integer at the given index of a list.
+static bool AddToListItem(PyObject* list, Py_ssize_t index, long delta) {
+  long value = PyInt_AsLong(PyList_GET_ITEM(list, index));
+  if (value == -1 && PyErr_Occurred())
+    return false;
+  PyObject* new_value = PyInt_FromLong(value + delta);
+  if (!new_value)
+    return false;
+  // PyList_SetItem steals the reference to new_value.
+  PyList_SetItem(list, index, new_value);
+  return true;
+}
+
+// Increments the change counters of a variable if bindings were added to it,
+// and forgets the counters that no longer exist.
+static bool CountAddedBindings(PyVariableObj* self, size_t old_size) {
+  if (!self->change_counters || self->u->size() == old_size)
+    return true;
+  // The keys of the counters that no longer exist, created when needed.
+  PyObject* dead = nullptr;
+  Py_ssize_t pos = 0;
+  PyObject* key;
+  PyObject* entry;
+  bool ok = true;
+  while (ok && PyDict_Next(self->change_counters, &pos, &key, &entry)) {
+    PyObject* counter = PyWeakref_GET_OBJECT(PyList_GET_ITEM(entry, 0));
+    if (counter != Py_None) {
+      ok = AddToListItem(counter, 0, 1);
+    } else {
+      if (!dead)
+        dead = PyList_New(0);
+      ok = dead && PyList_Append(dead, key) == 0;
+    }
+  }
+  if (ok && dead) {
+    Py_ssize_t n = PyList_GET_SIZE(dead);
+    for (Py_ssize_t i = 0; ok && i < n; ++i)
+      ok = PyDict_DelItem(self->change_counters, PyList_GET_ITEM(dead, i)) == 0;
+  }
+  Py_XDECREF(dead);
+  return ok;
+}
+
+// Returns the (borrowed) entry of a registered counter, or nullptr.
+static PyObject* FindChangeCounter(PyVariableObj* self, PyObject* key,
+                                   PyObject* counter) {
+  if (!self->change_counters)
+    return nullptr;
+  PyObject* entry = PyDict_GetItem(self->change_counters, key);
+  if (entry && PyWeakref_GET_OBJECT(PyList_GET_ITEM(entry, 0)) == counter)
+    return entry;
+  return nullptr;
+}
+
 PyDoc_STRVAR(variable_add_choice_doc,
              "AddBinding(data, source_set, where)\n\n"
              "Adds another option to this variable.\n\n"
@@ -1233,12 +1293,15 @@ static PyObject* VariableAddBinding(PyVariableObj* self, PyObject* args,
     return nullptr;
 
   Py_INCREF(data);
+  size_t old_size = self->u->size();
   typegraph::Binding* attr = self->u->AddBinding(MakeBindingData(data));
   if (where && source_set) {
     typegraph::Origin* origin = attr->AddOrigin(where);
     origin->AddSourceSet(ParseBindingList(source_set));
   }
   Py_XDECREF(source_set);
+  if (!CountAddedBindings(self, old_size))
+    return nullptr;
   return WrapBinding(program, attr);
 }
 
@@ -1255,10 +1318,13 @@ static PyObject* VariableAddBindings(PyVariableObj* self, PyObject* args,
                                  &variable, &PyCFGNode, &where)) {
     return nullptr;
   }
+  size_t old_size = self->u->size();
   for (const auto& binding : variable->u->bindings()) {
     typegraph::Binding* copy = self->u->AddBinding(binding->data());
     copy->CopyOrigins(binding.get(), where->cfg_node);
   }
+  if (!CountAddedBindings(self, old_size))
+    return nullptr;
   Py_RETURN_NONE;
 }
 
@@ -1322,7 +1388,10 @@ static PyObject* VariablePasteVariable(PyVariableObj* self, PyObject* args,
         additional_list.begin(), additional_list.end());
   }
   Py_XDECREF(additional);
+  size_t old_size = self->u->size();
   self->u->PasteVariable(variable->u, where, additional_sources);
+  if (!CountAddedBindings(self, old_size))
+    return nullptr;
   Py_RETURN_NONE;
 }
 
@@ -1358,7 +1427,89 @@ static PyObject* VariablePasteBinding(PyVariableObj* self, PyObject* args,
         additional_list.begin(), additional_list.end());
   }
   Py_XDECREF(additional);
+  size_t old_size = self->u->size();
   self->u->PasteBinding(binding->attr, where, additional_sources);
+  if (!CountAddedBindings(self, old_size))
+    return nullptr;
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(
+    variable_register_change_counter_doc,
+    "RegisterChangeCounter(counter)\n\n"
+    "Count the bindings added to this variable from now on.\n\n"
+    "Only a weak reference to the counter is kept. A counter can be "
+    "registered several times, and then counts until it has been "
+    "unregistered as often.\n\n"
+    "counter is a one-element list that supports weak references. Its "
+    "element is incremented every time a new binding is added to this "
+    "variable.");
+
+static PyObject* VariableRegisterChangeCounter(PyVariableObj* self,
+                                               PyObject* args,
+                                               PyObject* kwargs) {
+  static const char* kwlist[] = {"counter", nullptr};
+  PyObject* counter;
+  if (!SafeParseTupleAndKeywords(args, kwargs, "O!", kwlist, &PyList_Type,
+                                 &counter))
+    return nullptr;
+  if (PyList_GET_SIZE(counter) != 1) {
+    PyErr_SetString(PyExc_ValueError, "counter must be a one-element list.");
+    return nullptr;
+  }
+  if (!self->change_counters) {
+    self->change_counters = PyDict_New();
+    if (!self->change_counters)
+      return nullptr;
+  }
+  PyObject* key = PyLong_FromVoidPtr(counter);
+  if (!key)
+    return nullptr;
+  PyObject* entry = FindChangeCounter(self, key, counter);
+  bool ok;
+  if (entry) {
+    ok = AddToListItem(entry, 1, 1);
+  } else {
+    PyObject* ref = PyWeakref_NewRef(counter, nullptr);
+    // "N" steals the reference to ref.
+    entry = ref ? Py_BuildValue("[Ni]", ref, 1) : nullptr;
+    ok = entry && PyDict_SetItem(self->change_counters, key, entry) == 0;
+    Py_XDECREF(entry);
+  }
+  Py_DECREF(key);
+  if (!ok)
+    return nullptr;
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(variable_unregister_change_counter_doc,
+             "UnregisterChangeCounter(counter)\n\n"
+             "Undo one RegisterChangeCounter(counter).");
+
+static PyObject* VariableUnregisterChangeCounter(PyVariableObj* self,
+                                                 PyObject* args,
+                                                 PyObject* kwargs) {
+  static const char* kwlist[] = {"counter", nullptr};
+  PyObject* counter;
+  if (!SafeParseTupleAndKeywords(args, kwargs, "O", kwlist, &counter))
+    return nullptr;
+  PyObject* key = PyLong_FromVoidPtr(counter);
+  if (!key)
+    return nullptr;
+  PyObject* entry = FindChangeCounter(self, key, counter);
+  bool ok = true;
+  if (entry) {
+    long count = PyInt_AsLong(PyList_GET_ITEM(entry, 1));
+    if (count == -1 && PyErr_Occurred())
+      ok = false;
+    else if (count <= 1)
+      ok = PyDict_DelItem(self->change_counters, key) == 0;
+    else
+      ok = AddToListItem(entry, 1, -1);
+  }
+  Py_DECREF(key);
+  if (!ok)
+    return nullptr;
   Py_RETURN_NONE;
 }
 
@@ -1382,6 +1533,12 @@ static PyMethodDef variable_methods[] = {
       METH_VARARGS | METH_KEYWORDS, variable_paste_variable_doc},
     {"PasteBinding", reinterpret_cast<PyCFunction>(VariablePasteBinding),
       METH_VARARGS | METH_KEYWORDS, variable_paste_binding_doc},
+    {"RegisterChangeCounter",
+     reinterpret_cast<PyCFunction>(VariableRegisterChangeCounter),
+     METH_VARARGS | METH_KEYWORDS, variable_register_change_counter_doc},
+    {"UnregisterChangeCounter",
+     reinterpret_cast<PyCFunction>(VariableUnregisterChangeCounter),
+     METH_VARARGS | METH_KEYWORDS, variable_unregister_change_counter_doc},
     {0, 0, 0, nullptr},  // sentinel
 };
 
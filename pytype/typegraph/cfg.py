@@ -6,6 +6,7 @@ and to model path-specific visibility of nested data structures.
 
 import collections
 import logging
+import weakref
 
 from pytype import metrics
 
@@ -328,7 +329,7 @@ class Variable(object):
   the OrderedDict takes 2-3x as long as adding it to both the list and the dict.
   """
   __slots__ = ("program", "id", "bindings", "_data_id_to_binding",
-               "_cfgnode_to_bindings")
+               "_cfgnode_to_bindings", "_change_counters")
 
   def __init__(self, program, variable_id):
     """Initialize a new Variable. Called through Program.NewVariable."""
@@ -337,6 +338,7 @@ class Variable(object):
     self.bindings = []
     self._data_id_to_binding = {}
     self._cfgnode_to_bindings = {}
+    self._change_counters = None
 
   def __repr__(self):
     return "<Variable v%d: %d choices>" % (
@@ -424,8 +426,48 @@ class Variable(object):
       self.bindings.append(binding)
       self._data_id_to_binding[id(data)] = binding
       _variable_size_metric.add(len(self.bindings))
+      if self._change_counters:
+        self._CountAddedBinding()
     return binding
 
+  def _CountAddedBinding(self):
+    dead = []
+    for key, (ref, _) in self._change_counters.items():
+      counter = ref()
+      if counter is None:
+        dead.append(key)
+      else:
+        counter[0] += 1
+    for key in dead:
+      del self._change_counters[key]
+
+  def RegisterChangeCounter(self, counter):
+    """Count the bindings added to this variable from now on.
+
+    Only a weak reference to the counter is kept. A counter can be registered
+    several times, e.g. by a dictionary that stores this variable under several
+    keys, and then counts until it has been unregistered as often.
+
+    Arguments:
+      counter: A one-element list that supports weak references. Its element is
+        incremented every time a new binding is added to this variable.
+    """
+    if self._change_counters is None:
+      self._change_counters = {}
+    entry = self._change_counters.get(id(counter))
+    if entry and entry[0]() is counter:
+      entry[1] += 1
+    else:
+      self._change_counters[id(counter)] = [weakref.ref(counter), 1]
+
+  def UnregisterChangeCounter(self, counter):
+    """Undo one RegisterChangeCounter(counter)."""
+    entry = self._change_counters and self._change_counters.get(id(counter))
+    if entry and entry[0]() is counter:
+      entry[1] -= 1
+      if not entry[1]:
+        del self._change_counters[id(counter)]
+
   def AddBinding(self, data, source_set=None, where=None):
     """Add another choice to this variable.
 
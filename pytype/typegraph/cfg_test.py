@@ -1,5 +1,7 @@
 """Test for the cfg Python extension module."""
 
+import weakref
+
 from pytype.typegraph import cfg
 
 import six
@@ -7,6 +9,10 @@ import six
 import unittest
 
 
+class ChangeCounter(list):
+  """A one-element list that supports weak references."""
+
+
 class CFGTest(unittest.TestCase):
   """Test control flow graph creation."""
 
@@ -719,6 +725,51 @@ class CFGTest(unittest.TestCase):
     y.PasteBinding(ax)
     self.assertEqual(x.data, y.data)
 
+  def testChangeCounter(self):
+    p = cfg.Program()
+    counter = ChangeCounter([0])
+    x = p.NewVariable()
+    x.RegisterChangeCounter(counter)
+    x.RegisterChangeCounter(counter)  # Registering twice counts once.
+    ax = x.AddBinding("a")
+    x.AddBinding("a")  # Existing data doesn't add a binding.
+    self.assertEqual(counter, [1])
+    y = p.NewVariable()
+    y.AddBinding("b")
+    y.AddBinding("c")
+    x.PasteVariable(y)
+    self.assertEqual(counter, [3])
+    x.PasteBinding(ax)
+    self.assertEqual(counter, [3])
+
+  def testUnregisterChangeCounter(self):
+    p = cfg.Program()
+    counter = ChangeCounter([0])
+    x = p.NewVariable()
+    x.RegisterChangeCounter(counter)
+    x.RegisterChangeCounter(counter)
+    x.UnregisterChangeCounter(counter)
+    x.AddBinding("a")
+    self.assertEqual(counter, [1])
+    x.UnregisterChangeCounter(counter)
+    x.AddBinding("b")
+    self.assertEqual(counter, [1])
+    x.UnregisterChangeCounter(counter)  # Unregistered counters are ignored.
+
+  def testChangeCounterIsWeak(self):
+    p = cfg.Program()
+    counter = ChangeCounter([0])
+    ref = weakref.ref(counter)
+    x = p.NewVariable()
+    x.RegisterChangeCounter(counter)
+    del counter
+    self.assertIsNone(ref())
+    x.AddBinding("a")  # Forgets the dead counter.
+    counter = ChangeCounter([0])
+    x.RegisterChangeCounter(counter)
+    x.AddBinding("b")
+    self.assertEqual(counter, [1])
+
   def testId(self):
     p = cfg.Program()
     n1 = p.NewCFGNode("n1")
@@ -27,6 +27,7 @@ from pytype import convert
 from pytype import datatypes
 from pytype import directors
 from pytype import function
+from pytype import function_summaries
 from pytype import overlay_dict
 from pytype import load_pytd
 from pytype import matcher
@@ -78,6 +79,7 @@ Local = collections.namedtuple("Local", ["value", "orig"])
 
 
 _opcode_counter = metrics.MapCounter("vm_opcode")
+_compile_timer = metrics.ReentrantStopWatch("compile_time")
 
 
 class VirtualMachineError(Exception):
@@ -159,6 +161,12 @@ class VirtualMachine(object):
     self.director = None
     self._analyzing = False  # Are we in self.analyze()?
     self.opcode_traces = []
+    # Summaries of the function calls of earlier runs, or None.
+    if options.function_summary_cache:
+      self.function_summaries = function_summaries.SummaryCache(
+          options.function_summary_cache, self).load()
+    else:
+      self.function_summaries = None
     self._importing = False  # Are we importing another file?
     self._trace_opcodes = True  # whether to trace opcodes
     # If set, we will generate LateAnnotations with this stack rather than
@@ -260,6 +268,11 @@ class VirtualMachine(object):
   def is_at_maximum_depth(self):
     return len(self.frames) > self.maximum_depth
 
+  @classmethod
+  def get_bytecode_fn(cls, op_class):
+    """Get the (unbound) method that runs opcodes of the given class."""
+    return getattr(cls, "byte_%s" % op_class.__name__, None)
+
   def run_instruction(self, op, state):
     """Run a single bytecode instruction.
 
@@ -275,16 +288,30 @@ class VirtualMachine(object):
     Raises:
       VirtualMachineError: if a fatal error occurs.
     """
-    _opcode_counter.inc(op.name)
+    return self.run_decoded_instruction(blocks.decode_instruction(
+        op, self.get_bytecode_fn(op.__class__)), state)
+
+  def run_decoded_instruction(self, insn, state):
+    """Run a single instruction from blocks.OrderedCode.get_instruction_table.
+
+    Args:
+      insn: A blocks.Instruction.
+      state: An instance of state.FrameState.
+    Returns:
+      The FrameState after the instruction, as for run_instruction.
+    Raises:
+      VirtualMachineError: if a fatal error occurs.
+    """
+    op = insn.op
+    _opcode_counter.inc(insn.name)
     self.frame.current_opcode = op
-    self._importing = "IMPORT" in op.__class__.__name__
+    self._importing = insn.is_import
     if log.isEnabledFor(logging.INFO):
       self.log_opcode(op, state)
     # dispatch
-    bytecode_fn = getattr(self, "byte_%s" % op.name, None)
-    if bytecode_fn is None:
-      raise VirtualMachineError("Unknown opcode: %s" % op.name)
-    state = bytecode_fn(state, op)
+    if insn.handler is None:
+      raise VirtualMachineError("Unknown opcode: %s" % insn.name)
+    state = insn.handler(self, state, op)
     if state.why in ("reraise", "NoReturn"):
       state = state.set_why("exception")
     self.frame.current_opcode = None
@@ -310,16 +337,20 @@ class VirtualMachine(object):
                                                                         self)
     can_return = False
     return_nodes = []
-    for block in frame.f_code.order:
+    run_instruction = self.run_decoded_instruction
+    # The opcodes are decoded, and their bytecode functions looked up, once
+    # per code object rather than every time they run.
+    for block, instructions in frame.f_code.get_instruction_table(
+        self.get_bytecode_fn):
       state = frame.states.get(block[0])
       if not state:
         log.warning("Skipping block %d,"
                     " we don't have any non-erroneous code that goes here.",
                     block.id)
         continue
-      op = None
-      for op in block:
-        state = self.run_instruction(op, state)
+      insn = None
+      for insn in instructions:
+        state = run_instruction(insn, state)
         if state.why:
           # we can't process this block any further
           break
@@ -327,9 +358,10 @@ class VirtualMachine(object):
         # return, raise, or yield. Leave the current frame.
         can_return |= state.why in ("return", "yield")
         return_nodes.append(state.node)
-      elif op.carry_on_to_next():
+      elif insn.carry_on:
         # We're starting a new block, so start a new CFG node. We don't want
         # nodes to overlap the boundary of blocks.
+        op = insn.op
         state = state.forward_cfg_node()
         frame.states[op.next] = state.merge_into(frame.states.get(op.next))
     self.pop_frame(frame)
@@ -690,12 +722,13 @@ class VirtualMachine(object):
     return node, val
 
   def compile_src(self, src, filename=None, mode="exec"):
-    code = pyc.compile_src(
-        src, python_version=self.python_version,
-        python_exe=self.options.python_exe,
-        filename=filename, mode=mode)
-    return blocks.process_code(code, self.director.type_comments,
-                               self.director.docstrings)
+    with _compile_timer:
+      code = pyc.compile_src(
+          src, python_version=self.python_version,
+          python_exe=self.options.python_exe,
+          filename=filename, mode=mode)
+      return blocks.process_code(code, self.director.type_comments,
+                                 self.director.docstrings)
 
   def run_bytecode(self, node, code, f_globals=None, f_locals=None):
     """Run the given bytecode."""
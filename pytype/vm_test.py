@@ -29,9 +29,9 @@ class TraceVM(vm.VirtualMachine):
     self._classes = set()
     self._unknowns = []
 
-  def run_instruction(self, op, state):
-    self.instructions_executed.add(op.index)
-    return super(TraceVM, self).run_instruction(op, state)
+  def run_decoded_instruction(self, insn, state):
+    self.instructions_executed.add(insn.op.index)
+    return super(TraceVM, self).run_decoded_instruction(insn, state)
 
 
 class BytecodeTest(test_base.BaseTest, test_utils.MakeCodeMixin):